@@ -0,0 +1,93 @@
+"""Микробенчмарк разбора пакетов журнала КЛ.
+
+Сравнивает прежний разбор через строки из нулей и единиц с разбором
+через struct и numpy (modbus.decoding). Запуск из корня проекта:
+
+    python -m benchmarks.decode_events
+"""
+import random
+from timeit import repeat
+
+from modbus import decoding
+
+EVENTS_IN_BURST = 62  # максимальный пакет журнала: 124 регистра
+BURSTS = 200
+LONG_BUFFER_BURSTS = 16  # для numpy: пакеты 16 КЛ, разобранные одним буфером
+
+
+def legacy_registers_values_to_bin(registers_values):
+    """Прежнее преобразование регистров в список байтов-строк."""
+    bin_value_list = []
+    for value in registers_values:
+        value = str(bin(value))[2:]
+        if len(value) < 16:
+            value = '0' * (16-len(value)) + value
+        bin_value_list.append(value[:8])
+        bin_value_list.append(value[8:])
+    return bin_value_list
+
+
+def legacy_bin_str_to_dec(bin_str):
+    """Прежнее преобразование строки из нулей и единиц в число."""
+    sum = 0
+    for i in range(0, len(bin_str)):
+        sum += int(bin_str[i]) * (2**(len(bin_str) - 1 - i))
+    return sum
+
+
+def legacy_decode_events(registers_values):
+    """Прежний разбор событий журнала."""
+    registers = legacy_registers_values_to_bin(registers_values)
+    events = []
+    for i in range(0, len(registers), 4):
+        event_bin = registers[i:i+4]
+        events.append((
+            legacy_bin_str_to_dec(event_bin[0]), legacy_bin_str_to_dec(event_bin[1]),
+            legacy_bin_str_to_dec(event_bin[3]), legacy_bin_str_to_dec(event_bin[2])))
+    return events
+
+
+def struct_decode_events(registers_values):
+    """Разбор через struct без numpy."""
+    numpy, decoding.numpy = decoding.numpy, None
+    try:
+        return decoding.decode_events(registers_values)
+    finally:
+        decoding.numpy = numpy
+
+
+def measure(decoder, buffers):
+    """Возвращает количество разобранных событий в секунду (лучший из 5 прогонов)."""
+    events_count = sum(len(buffer) for buffer in buffers) // 2
+    best_time = min(repeat(lambda: [decoder(buffer) for buffer in buffers], number=1, repeat=5))
+    return events_count / best_time
+
+
+def main():
+    bursts = [
+        [random.randrange(0x10000) for _ in range(EVENTS_IN_BURST * 2)] for _ in range(BURSTS)]
+    for burst in bursts:
+        assert legacy_decode_events(burst) == struct_decode_events(burst)
+        if decoding.numpy is not None:
+            assert legacy_decode_events(burst) == decoding.decode_events_numpy(burst)
+
+    decoders = [('строки (прежний)', legacy_decode_events), ('struct', struct_decode_events)]
+    if decoding.numpy is not None:
+        decoders.append(('numpy', decoding.decode_events_numpy))
+    print(f'Пакеты по {EVENTS_IN_BURST} событий:')
+    baseline = None
+    for name, decoder in decoders:
+        events_per_second = measure(decoder, bursts)
+        baseline = baseline or events_per_second
+        print(f'  {name:<18} {events_per_second:>12,.0f} событий/с  x{events_per_second / baseline:.1f}')
+
+    long_buffers = [
+        sum(bursts[i:i + LONG_BUFFER_BURSTS], []) for i in range(0, BURSTS, LONG_BUFFER_BURSTS)]
+    print(f'Буферы по {EVENTS_IN_BURST * LONG_BUFFER_BURSTS} событий:')
+    for name, decoder in decoders[1:]:
+        events_per_second = measure(decoder, long_buffers)
+        print(f'  {name:<18} {events_per_second:>12,.0f} событий/с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Бенчмарк записи событий журнала: объекты ORM против executemany.
+
+Во временную БД последней схемы записываются пакеты событий, как они
+приходят из журнала КЛ (по --burst событий с одним временем чтения), двумя
+способами, каждый --duration секунд:
+- orm - прежняя запись: объект Event на каждое событие, session.add и
+  фиксация, сохраненные объекты возвращаются в таблицу журнала;
+- bulk - события EventRecord и insert_events (db/utils.py): одна команда
+  executemany без объектов ORM, возвращаются номера.
+Оба способа проверяются на транзакции из одного пакета (save_events_to_db)
+и из группы пакетов до --batch событий (поток записи в БД). Время создания
+событий входит в замер. Запуск из корня проекта:
+
+    python -m benchmarks.event_insert --duration 5 --output result.json
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+from datetime import datetime
+from time import perf_counter
+
+
+def make_packets(burst, batch):
+    """Пакеты событий EventRecord на одну транзакцию: batch событий, по burst с одним временем."""
+    from db.models import EventRecord
+    events = []
+    while len(events) < batch:
+        now = datetime.now()
+        events.extend(
+            EventRecord(None, now, i % 32 + 1, i % 62, i % 256, i % 40, 0, f'событие {i % 40}')
+            for i in range(min(burst, batch - len(events))))
+    return events
+
+
+def save_orm(records):
+    """Прежняя запись событий: объект ORM на каждое событие."""
+    from db.models import Event
+    from db.sequences import event_numbers
+    from db.utils import numbered_session_scope
+    events = [Event(**record._asdict()) for record in records]
+    with numbered_session_scope(event_numbers) as session:
+        current_number = event_numbers.allocate(len(events), session)
+        for event in events:
+            event.number = current_number
+            session.add(event)
+            current_number += 1
+    return events
+
+
+def save_bulk(records):
+    from db.utils import save_events_to_db
+    return save_events_to_db(records)
+
+
+def measure(save, burst, batch, duration):
+    """Записывает транзакции по batch событий duration секунд. Возвращает событий в секунду."""
+    from db.utils import clear_events_db
+    clear_events_db()
+    saved = 0
+    elapsed = 0
+    while elapsed < duration:
+        start = perf_counter()
+        saved += len(save(make_packets(burst, batch)))
+        elapsed += perf_counter() - start
+    return round(saved / elapsed, 1)
+
+
+def run_benchmark(args):
+    result = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'events_per_s': {},
+    }
+    for batch in (args.burst, args.batch):
+        orm = measure(save_orm, args.burst, batch, args.duration)
+        bulk = measure(save_bulk, args.burst, batch, args.duration)
+        result['events_per_s'][f'batch_{batch}'] = {'orm': orm, 'bulk': bulk, 'speedup': round(bulk / orm, 1)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк записи событий журнала')
+    parser.add_argument('--burst', type=int, default=62, help='событий в пакете журнала КЛ')
+    parser.add_argument('--batch', type=int, default=500, help='событий в транзакции потока записи')
+    parser.add_argument('--duration', type=float, default=5, help='сек, длительность каждого замера')
+    parser.add_argument('--output', help='файл для результата в формате JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        # БД подключается при импорте модулей db, поэтому адрес задается до первого импорта
+        os.environ['STAND_DB_URL'] = f'sqlite:///{os.path.join(db_dir, "event_insert.db")}'
+        result = run_benchmark(args)
+        from db.session import engine
+        engine.dispose()
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
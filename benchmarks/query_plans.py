@@ -0,0 +1,160 @@
+"""Проверка планов частых запросов к БД: каждый запрос должен использовать свой индекс.
+
+Создается временная БД со схемой последней версии (db/migrations.py) и
+тестовыми данными. Запросы выполняются теми же функциями, что и в программе
+(db/utils.py), и так же, как фильтры таблиц главного окна; их SQL
+перехватывается и разбирается через EXPLAIN QUERY PLAN. Если запрос не
+использует ожидаемый индекс (например, после изменения запроса или схемы),
+проверка завершается с кодом 1. Запуск из корня проекта:
+
+    python -m benchmarks.query_plans
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# (название, функция с запросом, начало перехватываемого SQL, индекс);
+# журнал событий без индексов ради скорости записи (миграция 1 в db/migrations.py)
+CHECKS = (
+    ('тесты за период', 'tests_for_period', 'SELECT', 'ix_test_time'),
+    ('тесты с ошибкой за период', 'error_tests_for_period', 'SELECT', 'ix_test_error_time'),
+    ('тесты главной таблицы', 'unarchived_tests', 'SELECT', 'ix_test_unarchived'),
+    ('количество тестов в таблице', 'count_of_tests', 'SELECT', 'ix_test_unarchived'),
+    ('номер следующего теста', 'next_test_number', 'SELECT', 'ix_test_unarchived'),
+    ('фильтр тестов по КЛ', 'tests_by_kl', 'SELECT', 'ix_test_unarchived'),
+    ('фильтр тестов по КЛ и коду', 'tests_by_kl_and_code', 'SELECT', 'ix_test_unarchived'),
+    ('удаление тестов за период', 'clear_tests_for_period', 'DELETE', 'ix_test_time'),
+    ('отчеты за период', 'reports_for_period', 'SELECT', 'ix_report_date_time'),
+    ('последний отчет', 'latest_report', 'SELECT', 'ix_report_date_time'),
+    ('замена отчета за день', 'save_report', 'DELETE', 'ix_report_day'),
+)
+
+
+def fill_db(rows):
+    """Заполняет журнал, тесты и отчеты тестовыми данными."""
+    from sqlalchemy import insert
+
+    from db.models import Event, Report, Test
+    from db.session import session_scope
+    now = datetime.now()
+    with session_scope() as session:
+        session.execute(insert(Event), [
+            {'number': i + 1, 'date_time': now, 'kl': i % 32 + 1, 'entry_number': i % 62, 'au_address': i % 256,
+             'event_code': i % 40, 'addit_param': 0, 'description': f'событие {i % 40}'} for i in range(rows)])
+        session.execute(insert(Test), [
+            {'number': i + 1, 'time': now - timedelta(minutes=i), 'kl': i % 32 + 1, 'device_type': 'ИП',
+             'exit_code_1': i % 120, 'exit_code_2': 0, 'exit_code_3': 0, 'is_archived': i % 10 != 0}
+            for i in range(rows)])
+        session.execute(insert(Report), [{'date_time': now - timedelta(days=i)} for i in range(rows // 100 + 1)])
+
+
+def get_queries():
+    """Функции, выполняющие проверяемые запросы, по именам из CHECKS."""
+    from sqlalchemy import not_
+    from sqlalchemy.orm import Query
+
+    from db import utils
+    from db.models import Report, Test
+    from db.sequences import test_numbers
+    from db.session import session_scope
+    now = datetime.now()
+    period = (now - timedelta(days=1), now)
+
+    def query(statement):
+        with session_scope() as session:
+            return statement.with_session(session).all()
+
+    def next_test_number():
+        test_numbers.invalidate()
+        with session_scope() as session:
+            return test_numbers.allocate(0, session)
+
+    return {
+        'tests_for_period': lambda: utils.get_tests_for_period(period),
+        'error_tests_for_period': lambda: utils.get_error_tests_for_period(period),
+        'unarchived_tests': utils.get_unarchived_tests,
+        'count_of_tests': utils.get_count_of_tests_in_db,
+        'next_test_number': next_test_number,
+        'tests_by_kl': lambda: query(
+            Query(Test).filter(not_(Test.is_archived)).filter(Test.kl == 1).order_by(Test.number)),
+        'tests_by_kl_and_code': lambda: query(Query(Test).filter(not_(Test.is_archived)).filter(
+            Test.kl == 1).filter(Test.exit_code_1 == 5).order_by(Test.number)),
+        'clear_tests_for_period': lambda: utils.clear_tests_db_for_period((now, now)),
+        'reports_for_period': lambda: utils.get_reports_for_period(period),
+        'latest_report': utils.get_latest_report,
+        'save_report': lambda: utils.save_report_to_db(Report()),
+    }
+
+
+def capture_statement(function, prefix):
+    """Выполняет function и возвращает первый SQL, начинающийся с prefix, и его параметры."""
+    from sqlalchemy import event
+
+    from db.session import engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        function()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    for statement, parameters in statements:
+        if statement.lstrip().upper().startswith(prefix):
+            return statement, parameters
+    raise LookupError(f'запрос {prefix} не выполнялся')
+
+
+def explain(statement, parameters):
+    """Возвращает строки EXPLAIN QUERY PLAN для запроса."""
+    from db.session import engine
+    with engine.connect() as connection:
+        return [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+
+
+def uses_index(plan, index):
+    return any(f'INDEX {index} ' in f'{line} ' for line in plan)
+
+
+def run_checks(rows):
+    """Проверяет планы всех запросов из CHECKS. Возвращает список непрошедших проверок."""
+    from db.migrations import MIGRATIONS, get_schema_version
+    from db.session import engine
+    with engine.connect() as connection:
+        version = get_schema_version(connection)
+    print(f'Версия схемы БД: {version} из {len(MIGRATIONS)}')
+    fill_db(rows)
+    queries = get_queries()
+    failed = []
+    for title, name, prefix, index in CHECKS:
+        statement, parameters = capture_statement(queries[name], prefix)
+        plan = explain(statement, parameters)
+        passed = uses_index(plan, index)
+        print(f'{"OK  " if passed else "FAIL"} {title}: {"; ".join(plan)}')
+        if not passed:
+            failed.append(f'{title}: нет {index}\n    {statement}')
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Проверка планов частых запросов к БД')
+    parser.add_argument('--rows', type=int, default=1000, help='строк в журнале и тестах временной БД')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        # БД подключается при импорте модулей db, поэтому адрес задается до первого импорта
+        os.environ['STAND_DB_URL'] = f'sqlite:///{os.path.join(db_dir, "query_plans.db")}'
+        failed = run_checks(args.rows)
+        from db.session import engine
+        engine.dispose()
+    if failed:
+        print('\nЗапросы без ожидаемого индекса:\n' + '\n'.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
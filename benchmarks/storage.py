@@ -0,0 +1,162 @@
+"""Бенчмарк профилей хранения SQLite: запись пакетов событий во время экспорта.
+
+Для каждого профиля (db/session.py) создается временная БД с --rows
+событиями. Поток записи сохраняет пакеты по --batch событий через
+save_batch_to_db, как поток записи в БД, сначала без помех, затем вместе с
+потоком экспорта, который раз за разом читает весь журнал, как экспорт в
+файл. Профиль применяется при подключении модулей БД, поэтому каждый профиль
+прогоняется в отдельном процессе. Запуск из корня проекта:
+
+    python -m benchmarks.storage --rows 100000 --duration 10 --output result.json
+
+Результат - JSON по профилям: скорость записи без экспорта и с экспортом,
+задержки фиксации (мс, перцентили p50/p95/p99), количество и длительность
+экспортов, ошибки блокировки и размер журнала WAL до и после переноса в файл БД.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import datetime
+from time import perf_counter
+
+from benchmarks.throughput import StageTimer
+
+PROFILES = ('legacy', 'durable', 'fast')  # как SQLITE_PROFILES в db/session.py
+PREFILL_CHUNK = 10000  # событий в одной вставке при заполнении БД
+
+
+def make_events(count, start=0):
+    from db.models import EventRecord
+    now = datetime.now()
+    return [
+        EventRecord(None, now, i % 32 + 1, i % 62, i % 256, i % 40, 0, 'событие') for i in range(start, start + count)]
+
+
+def prefill(rows):
+    """Заполняет журнал событиями одной транзакцией на PREFILL_CHUNK строк."""
+    from sqlalchemy import insert
+
+    from db.models import Event
+    from db.session import session_scope
+    now = datetime.now()
+    for start in range(0, rows, PREFILL_CHUNK):
+        with session_scope() as session:
+            session.execute(insert(Event), [
+                {'number': i + 1, 'date_time': now, 'kl': i % 32 + 1, 'entry_number': i % 62,
+                 'au_address': i % 256, 'event_code': i % 40, 'addit_param': 0, 'description': 'событие'}
+                for i in range(start, min(start + PREFILL_CHUNK, rows))])
+
+
+def ingest(duration, batch, timer, stage):
+    """Записывает пакеты событий duration секунд. Возвращает количество записанных событий и ошибок."""
+    from db.utils import save_batch_to_db
+    saved = errors = 0
+    end = perf_counter() + duration
+    while perf_counter() < end:
+        events = make_events(batch)
+        start = perf_counter()
+        try:
+            save_batch_to_db(events, [])
+        except Exception:
+            errors += 1
+            continue
+        finally:
+            timer.add(stage, perf_counter() - start)
+        saved += batch
+    return saved, errors
+
+
+def export_journal(stop, timer):
+    """Читает весь журнал, как экспорт в файл, пока не установлен stop."""
+    from db.models import Event
+    from db.session import session_scope
+    while not stop.is_set():
+        start = perf_counter()
+        with session_scope() as session:
+            session.query(Event).all()
+        timer.add('export', perf_counter() - start)
+
+
+def get_wal_size(db_path):
+    wal_path = db_path + '-wal'
+    return os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+
+
+def run_profile(args, db_path):
+    """Прогон одного профиля в текущем процессе, профиль и БД заданы переменными окружения."""
+    from db.session import TRUNCATE_CHECKPOINT, checkpoint_db
+    prefill(args.rows)
+    timer = StageTimer()
+
+    saved_alone, errors_alone = ingest(args.duration, args.batch, timer, 'commit_alone')
+
+    stop = threading.Event()
+    exporter = threading.Thread(target=export_journal, args=(stop, timer))
+    exporter.start()
+    saved_shared, errors_shared = ingest(args.duration, args.batch, timer, 'commit_with_export')
+    stop.set()
+    exporter.join()
+
+    wal_size = get_wal_size(db_path)
+    checkpoint_db(TRUNCATE_CHECKPOINT)
+    return {
+        'ingest_events_per_s': round(saved_alone / args.duration, 1),
+        'ingest_with_export_events_per_s': round(saved_shared / args.duration, 1),
+        'ingest_errors': errors_alone + errors_shared,
+        'exports': len(timer.samples.get('export', [])),
+        'wal_bytes': wal_size,
+        'wal_bytes_after_checkpoint': get_wal_size(db_path),
+        'stages': timer.get_summary(),
+    }
+
+
+def run_benchmark(args):
+    """Прогоняет каждый профиль в отдельном процессе и возвращает результаты в виде словаря."""
+    result = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'profile', 'db_path')},
+        'profiles': {},
+    }
+    for profile in args.profiles:
+        with tempfile.TemporaryDirectory() as db_dir:
+            db_path = os.path.join(db_dir, 'benchmark.db')
+            env = dict(os.environ, STAND_DB_URL=f'sqlite:///{db_path}', STAND_DB_PROFILE=profile)
+            child = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.storage', '--profile', profile, '--rows', str(args.rows),
+                 '--batch', str(args.batch), '--duration', str(args.duration), '--db-path', db_path],
+                env=env, capture_output=True, text=True, check=True)
+            result['profiles'][profile] = json.loads(child.stdout)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк профилей хранения SQLite')
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=PROFILES, help='профили для сравнения')
+    parser.add_argument('--rows', type=int, default=100000, help='событий в БД перед прогоном')
+    parser.add_argument('--batch', type=int, default=62, help='событий в одной транзакции')
+    parser.add_argument('--duration', type=float, default=5, help='сек, длительность каждой фазы записи')
+    parser.add_argument('--output', help='файл для результата в формате JSON')
+    parser.add_argument('--profile', help=argparse.SUPPRESS)  # прогон одного профиля в дочернем процессе
+    parser.add_argument('--db-path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(run_profile(args, args.db_path)))
+        return
+    result = run_benchmark(args)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
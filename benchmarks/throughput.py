@@ -0,0 +1,291 @@
+"""Сквозной бенчмарк стенда: линия RS-485 -> разбор -> БД -> таблицы.
+
+Опрос идет через ReadingWorker в отдельном потоке, как в программе, по
+имитируемым линиям КЛ (modbus/simulator.py). События и результаты тестов
+ставятся в очередь потока записи в БД (DbWriterWorker, db/writer.py) и после
+сохранения, по сигналам events_saved/tests_saved, выводятся в таблицы
+add_rows_journal_table/add_rows_main_table в главном потоке. Окно не
+показывается, БД создается во временном каталоге. Запуск из корня проекта:
+
+    python -m benchmarks.throughput --kl 16 --event-rate 5 --duration 30 --output result.json
+    python -m benchmarks.throughput --compare result.json
+
+Результат - JSON: задержки этапов (мс, перцентили p50/p95/p99), пропускная
+способность и остаток событий в журналах КЛ к концу прогона. Этапы queue и
+saved - время от чтения пакета до его передачи в главный поток и до прихода
+сигнала о сохранении, db_commit - транзакция группы пакетов в потоке записи.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime
+from time import perf_counter
+
+from modbus.constants import (JOURNAL_CAPACITY, JOURNAL_DRAIN_MODES,
+                              KL_ADDRESSES, SEPARATE_DRAIN,
+                              SIMULATOR_EVENT_RATE, SIMULATOR_LATENCY,
+                              SIMULATOR_TEST_RATE)
+
+PERCENTILES = (50, 95, 99)
+JOURNAL_TABLE_MAX_ROWS = 10000  # как в MainWindow.save_events
+REGRESSION_THRESHOLD = 0.1  # доля ухудшения, при которой --compare отмечает регрессию
+
+
+def get_percentile(sorted_values, percentile):
+    """Возвращает перцентиль по методу ближайшего ранга."""
+    if not sorted_values:
+        return 0
+    rank = max(int(round(percentile / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[rank]
+
+
+class StageTimer:
+    """Накапливает длительности этапов обработки."""
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, stage, function):
+        """Возвращает функцию, замеряющую время каждого вызова function."""
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(stage, perf_counter() - start)
+        return timed
+
+    def get_summary(self):
+        summary = {}
+        for stage, samples in self.samples.items():
+            values = sorted(samples)
+            summary[stage] = {
+                'count': len(values),
+                'mean_ms': round(sum(values) / len(values) * 1000, 3),
+                **{f'p{p}_ms': round(get_percentile(values, p) * 1000, 3) for p in PERCENTILES},
+                'max_ms': round(values[-1] * 1000, 3),
+            }
+        return summary
+
+
+def run_benchmark(args):
+    """Выполняет прогон и возвращает результаты в виде словаря."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    db_dir = tempfile.TemporaryDirectory()
+    os.environ['STAND_DB_URL'] = f'sqlite:///{os.path.join(db_dir.name, "benchmark.db")}'
+
+    # модули БД и интерфейса подключаются после выбора временной БД
+    from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSlot
+    from PyQt5.QtWidgets import QApplication
+
+    import modbus.poller
+    from gui.threads import DbWriterWorker, ReadingWorker
+    from gui.utils import add_rows_journal_table, add_rows_main_table
+    from gui.widgets import JournalTable, MainTable
+    from modbus.simulator import create_line, register_line
+
+    timer = StageTimer()
+    # разбор пакетов замеряется по месту вызова, сами функции не меняются
+    modbus.poller.get_events_from_registers = timer.wrap('decode_events', modbus.poller.get_events_from_registers)
+    modbus.poller.get_test_results_from_registers = timer.wrap(
+        'decode_tests', modbus.poller.get_test_results_from_registers)
+
+    class TimedReadingWorker(ReadingWorker):
+        def read(self, address, client):
+            start = perf_counter()
+            result = ReadingWorker.read(self, address, client)
+            timer.add('poll', perf_counter() - start)
+            return result
+
+    class TimedDbWriter(DbWriterWorker):
+        def commit(self, events, tests, report):
+            start = perf_counter()
+            DbWriterWorker.commit(self, events, tests, report)
+            if events or tests:
+                timer.add('db_commit', perf_counter() - start)
+
+    class Sink(QObject):
+        """Повторяет обработку пакетов главным окном."""
+        def __init__(self, db_writer):
+            super().__init__()
+            self.journal_table = JournalTable()
+            self.main_table = MainTable()
+            self.is_journal_clearing = False
+            self.events_saved = 0
+            self.tests_saved = 0
+            self.db_writer = db_writer
+            db_writer.events_saved.connect(self.show_saved_events)
+            db_writer.tests_saved.connect(self.show_saved_tests)
+            db_writer.events_cleared.connect(self.show_cleared_journal)
+
+        @pyqtSlot(object)
+        def save_events(self, events):
+            if events:
+                timer.add('queue', (datetime.now() - events[0].date_time).total_seconds())
+            if self.journal_table.rowCount() > JOURNAL_TABLE_MAX_ROWS and not self.is_journal_clearing:
+                self.is_journal_clearing = True
+                self.db_writer.clear_events()
+            start = perf_counter()
+            self.db_writer.save_events(events)
+            timer.add('enqueue', perf_counter() - start)
+
+        @pyqtSlot(object)
+        def save_tests(self, test):
+            timer.add('queue', (datetime.now() - test.time).total_seconds())
+            start = perf_counter()
+            self.db_writer.save_tests(test)
+            timer.add('enqueue', perf_counter() - start)
+
+        @pyqtSlot(object)
+        def show_saved_events(self, events):
+            now = datetime.now()
+            for packet_time in {event.date_time for event in events}:
+                timer.add('saved', (now - packet_time).total_seconds())
+            start = perf_counter()
+            self.journal_table.setSortingEnabled(False)
+            add_rows_journal_table(self.journal_table, events)
+            self.journal_table.setSortingEnabled(True)
+            timer.add('table_events', perf_counter() - start)
+            self.events_saved += len(events)
+
+        @pyqtSlot(object)
+        def show_saved_tests(self, tests):
+            now = datetime.now()
+            for test in tests:
+                timer.add('saved', (now - test.time).total_seconds())
+            start = perf_counter()
+            self.main_table.setSortingEnabled(False)
+            add_rows_main_table(self.main_table, tests)
+            self.main_table.setSortingEnabled(True)
+            timer.add('table_tests', perf_counter() - start)
+            self.tests_saved += len(tests)
+
+        @pyqtSlot()
+        def show_cleared_journal(self):
+            self.journal_table.setRowCount(0)
+            self.is_journal_clearing = False
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    db_writer = TimedDbWriter()
+    db_writer.start()
+    sink = Sink(db_writer)
+    lines = []
+    threads = []
+    workers = []
+    for i in range(args.ports):
+        port = f'SIM-BENCH{i + 1}'
+        line = create_line(
+            args.kl, event_rate=args.event_rate, test_rate=args.test_rate, journal_capacity=args.journal_capacity,
+            latency=args.latency, timeout_rate=args.timeout_rate, crc_error_rate=args.crc_error_rate,
+            realtime=not args.no_realtime)
+        register_line(port, line)
+        lines.append(line)
+        worker = TimedReadingWorker(port, None, None, journal_drain=args.journal_drain)
+        thread = QThread()
+        worker.moveToThread(thread)
+        worker.save_events.connect(sink.save_events)
+        worker.save_tests.connect(sink.save_tests)
+        thread.started.connect(worker.run)
+        workers.append(worker)
+        threads.append(thread)
+
+    def stop():
+        for worker in workers:
+            worker.is_cancelled = True
+        for thread in threads:
+            thread.quit()
+            while not thread.wait(10):  # пока воркер завершает цикл опроса, пакеты продолжают обрабатываться
+                app.processEvents()
+        app.processEvents()  # пакеты, отправленные до остановки воркеров
+        db_writer.stop()  # дописываем в БД данные из очереди
+        app.quit()
+
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    QTimer.singleShot(int(args.duration * 1000), stop)
+    app.exec_()
+    app.processEvents()  # сигналы о последних сохраненных строках
+    elapsed = perf_counter() - start
+
+    devices = [device for line in lines for device in line.devices.values()]
+    result = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'elapsed_s': round(elapsed, 3),
+        'throughput': {
+            'events_per_s': round(sink.events_saved / elapsed, 2),
+            'tests_per_s': round(sink.tests_saved / elapsed, 2),
+            'polls_per_s': round(len(timer.samples.get('poll', [])) / elapsed, 2),
+            'requests_per_s': round(sum(
+                worker.get_telemetry(worker.port).snapshot().requests for worker in workers) / elapsed, 2),
+            'events_offered_per_s': round(sum(device.events_generated for device in devices) / elapsed, 2),
+        },
+        'backlog': {
+            'events_generated': sum(device.events_generated for device in devices),
+            'events_saved': sink.events_saved,
+            'events_in_kl_journals': sum(len(device.journal) for device in devices),
+            'events_lost': sum(device.events_lost for device in devices),
+            'tests_completed': sum(device.tests_completed for device in devices),
+            'tests_saved': sink.tests_saved,
+        },
+        'stages': timer.get_summary(),
+    }
+    db_dir.cleanup()
+    return result
+
+
+def compare(result, baseline):
+    """Печатает изменения относительно прошлого прогона."""
+    print('Сравнение с прошлым прогоном:')
+    for key, value in result['throughput'].items():
+        old = baseline['throughput'].get(key)
+        if old:
+            mark = ' РЕГРЕССИЯ' if value < old * (1 - REGRESSION_THRESHOLD) else ''
+            print(f'  {key:<22} {old:>10} -> {value:<10}{mark}')
+    for stage, summary in result['stages'].items():
+        old = baseline['stages'].get(stage, {}).get('p95_ms')
+        if old:
+            mark = ' РЕГРЕССИЯ' if summary['p95_ms'] > old * (1 + REGRESSION_THRESHOLD) else ''
+            print(f'  {stage + " p95, мс":<22} {old:>10} -> {summary["p95_ms"]:<10}{mark}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сквозной бенчмарк опроса КЛ')
+    parser.add_argument('--ports', type=int, default=1, help='количество линий, каждая в своем потоке')
+    parser.add_argument('--kl', type=int, default=len(KL_ADDRESSES), help='количество КЛ на линии')
+    parser.add_argument('--event-rate', type=float, default=SIMULATOR_EVENT_RATE, help='событий в секунду на КЛ')
+    parser.add_argument('--test-rate', type=float, default=SIMULATOR_TEST_RATE, help='тестов в секунду на КЛ')
+    parser.add_argument('--journal-capacity', type=int, default=JOURNAL_CAPACITY, help='размер журнала КЛ')
+    parser.add_argument('--latency', type=float, default=SIMULATOR_LATENCY, help='сек, время ответа КЛ')
+    parser.add_argument('--timeout-rate', type=float, default=0, help='вероятность потери ответа')
+    parser.add_argument('--crc-error-rate', type=float, default=0, help='вероятность поврежденного ответа')
+    parser.add_argument('--no-realtime', action='store_true',
+                        help='не имитировать время передачи по линии (только накладные расходы программы)')
+    parser.add_argument('--journal-drain', choices=JOURNAL_DRAIN_MODES, default=SEPARATE_DRAIN,
+                        help='способ чтения журнала КЛ')
+    parser.add_argument('--duration', type=float, default=10, help='сек, длительность прогона')
+    parser.add_argument('--output', help='файл для результата в формате JSON')
+    parser.add_argument('--compare', help='JSON прошлого прогона для сравнения')
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text)
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            compare(result, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
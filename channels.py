@@ -0,0 +1,18 @@
+"""Сигналы без Qt для опроса (modbus/poller.py) и записи в БД (db/writer.py).
+
+Channel повторяет connect/emit сигнала Qt, поэтому те же классы работают и в
+программе с сигналами Qt (gui/threads.py), и в сборщике без интерфейса.
+"""
+
+
+class Channel:
+    """Сигнал без Qt: обработчики вызываются сразу в потоке, отправившем сигнал."""
+    def __init__(self):
+        self.callbacks = []
+
+    def connect(self, callback):
+        self.callbacks.append(callback)
+
+    def emit(self, *args):
+        for callback in self.callbacks:
+            callback(*args)
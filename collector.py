@@ -0,0 +1,194 @@
+"""Сбор данных с КЛ без графического интерфейса.
+
+Опрашивает КЛ выбранным движком и сохраняет события, результаты тестов и
+суточный отчет в ту же базу данных, что и программа с интерфейсом. PyQt5 и
+openpyxl не загружаются. Сигналы опроса приходят из потоков опроса и
+передаются через очередь в главный поток, как в главное окно программы с
+интерфейсом, запись в базу данных идет в потоке записи (db/writer.py).
+Счетчики выводятся в журнал раз в --stats-interval секунд.
+"""
+import argparse
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+from datetime import datetime
+from time import monotonic
+
+from db.models import Report
+from db.writer import DbWriter
+from logs_config import config_logs
+from modbus.constants import (ASYNC_ENGINE, JOURNAL_DRAIN_MODES,
+                              POLLING_ENGINES, PROCESS_ENGINE,
+                              PYMODBUS_TRANSPORT, SEPARATE_DRAIN,
+                              SERIAL_TRANSPORTS, SYNC_ENGINE)
+from modbus.poller import AsyncPoller, Poller
+from modbus.ports import is_port_free, port_registry
+from modbus.process_poller import ProcessPoller
+
+STATS_INTERVAL = 60  # период вывода счетчиков, с
+QUEUE_WAIT = 0.5  # ожидание сигнала опроса главным потоком, с
+# поля отчета, которые суммируются по всем КЛ, как в окне общей статистики
+REPORT_TOTAL_FIELDS = (
+    'success_all', 'error_all', 'interrupted_all',
+    'success_ipt', 'success_ipt_s', 'success_mks', 'success_ipd', 'success_ipr',
+    'error_ipt', 'error_ipt_s', 'error_mks', 'error_ipd', 'error_ipr')
+
+
+def get_empty_report():
+    """Возвращает отчет с нулевой статистикой."""
+    return Report(date_time=datetime.now(), **{field: 0 for field in REPORT_TOTAL_FIELDS})
+
+
+class Collector:
+    """Опрос портов и сохранение результатов в базу данных без интерфейса."""
+    def __init__(self, ports, engine=SYNC_ENGINE, transport=PYMODBUS_TRANSPORT, journal_drain=SEPARATE_DRAIN,
+                 stats_interval=STATS_INTERVAL):
+        self.ports = ports
+        self.stats_interval = stats_interval
+        self.signals = queue.Queue()
+        self.telemetry = {}  # порт -> LinkTelemetry, общий для всех опросчиков
+        if engine == ASYNC_ENGINE:
+            self.pollers = [AsyncPoller(ports, self.telemetry, journal_drain)]
+        elif engine == PROCESS_ENGINE:
+            self.pollers = [ProcessPoller(ports, self.telemetry, transport, journal_drain)]
+        else:
+            self.pollers = [Poller(port, self.telemetry, transport, journal_drain) for port in ports]
+        for poller in self.pollers:
+            self.connect(poller)
+        self.db_writer = DbWriter()
+        self.db_writer.events_saved.connect(self.count_events)
+        self.db_writer.tests_saved.connect(self.count_tests)
+        self.threads = []
+        self.snapshots = {}  # порт -> последняя сводка обмена
+        self.kl_states = {}  # (порт, адрес) -> состояние КЛ ('w', 'p', 'd')
+        self.kl_statistics = {}  # (порт, адрес) -> последняя статистика КЛ
+        self.total_statistics = get_empty_report()
+        self.events_count = 0
+        self.tests_count = 0
+        self.is_stopped = threading.Event()
+
+    def connect(self, poller):
+        """Подключает сигналы опросчика к очереди главного потока."""
+        for name in ('save_events', 'save_tests', 'update_kl_tests_results', 'update_timer',
+                     'link_telemetry', 'port_connection_error'):
+            getattr(poller, name).connect(lambda *args, name=name: self.signals.put((name, args)))
+
+    def save_events(self, events):
+        self.db_writer.save_events(events)
+
+    def save_tests(self, test):
+        self.db_writer.save_tests(test)
+
+    def count_events(self, events):
+        self.events_count += len(events)
+
+    def count_tests(self, tests):
+        self.tests_count += len(tests)
+
+    def update_kl_tests_results(self, port, address, statistics):
+        """Добавляет к суточному отчету прирост статистики КЛ.
+        Уменьшение счетчиков (перезапуск КЛ) прироста не дает, как в главном окне."""
+        previous = self.kl_statistics.get((port, address)) or get_empty_report()
+        self.kl_statistics[(port, address)] = statistics
+        differences = [getattr(statistics, field) - getattr(previous, field) for field in REPORT_TOTAL_FIELDS]
+        if any(difference < 0 for difference in differences) or not any(differences):
+            return
+        for field, difference in zip(REPORT_TOTAL_FIELDS, differences):
+            setattr(self.total_statistics, field, getattr(self.total_statistics, field) + difference)
+        self.db_writer.save_report(self.total_statistics)
+
+    def update_timer(self, port, address, state):
+        self.kl_states[(port, address)] = state
+
+    def link_telemetry(self, port, snapshot):
+        self.snapshots[port] = snapshot
+
+    def port_connection_error(self, port):
+        logging.error(f'Нет связи с портом {port}, опрос порта остановлен')
+
+    def log_stats(self):
+        """Выводит в журнал счетчики сохраненных данных и обмена по портам."""
+        active = sum(state != 'd' for state in self.kl_states.values())
+        logging.info(f'Активных КЛ: {active}, сохранено событий: {self.events_count}, '
+                     f'тестов: {self.tests_count}, всего тестов за сеанс: '
+                     f'{sum(getattr(self.total_statistics, field) for field in REPORT_TOTAL_FIELDS[:3])}')
+        for port, snapshot in sorted(self.snapshots.items()):
+            logging.info(f'{port}: запросов {snapshot.requests}, ответов {snapshot.responses}, '
+                         f'таймаутов {snapshot.timeouts}, ошибок CRC {snapshot.crc_errors}, '
+                         f'некорректных ответов {snapshot.illegal_responses}, ошибок {snapshot.errors}')
+
+    def process_signals(self):
+        """Обрабатывает сигналы опроса, пока все опросчики не завершатся."""
+        stats_time = monotonic()
+        while any(thread.is_alive() for thread in self.threads) or not self.signals.empty():
+            try:
+                name, args = self.signals.get(timeout=QUEUE_WAIT)
+            except queue.Empty:
+                pass
+            else:
+                try:
+                    getattr(self, name)(*args)
+                except Exception as error:
+                    logging.error(f'Ошибка при обработке данных опроса ({name}). Код ошибки: {error}')
+            if monotonic() - stats_time >= self.stats_interval:
+                stats_time = monotonic()
+                self.log_stats()
+
+    def stop(self, *args):
+        """Останавливает опрос. Подходит как обработчик сигналов ОС."""
+        if not self.is_stopped.is_set():
+            logging.info('Остановка опроса')
+        self.is_stopped.set()
+        for poller in self.pollers:
+            poller.is_cancelled = True
+
+    def run(self):
+        """Опрашивает порты, пока опрос не остановлен или все порты не отключены."""
+        self.db_writer.start()
+        for poller in self.pollers:
+            thread = threading.Thread(target=poller.run, name='poller')
+            thread.start()
+            self.threads.append(thread)
+        self.process_signals()
+        for thread in self.threads:
+            thread.join()
+        self.db_writer.stop()
+        self.log_stats()
+
+
+def get_free_ports():
+    """Возвращает свободные порты системы, линии за шлюзами и имитируемые линии."""
+    return [port for port in port_registry.get_ports() if is_port_free(port)]
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()  # процесс опроса движка process в собранной программе
+
+    parser = argparse.ArgumentParser(description='Сбор данных с КЛ без графического интерфейса')
+    parser.add_argument(
+        'ports', nargs='*',
+        help='порты для опроса (COM-порты, tcp://, rtu+tcp://, имитируемые линии); по умолчанию все свободные')
+    parser.add_argument('--engine', choices=POLLING_ENGINES, default=SYNC_ENGINE, help='движок опроса КЛ')
+    parser.add_argument(
+        '--transport', choices=SERIAL_TRANSPORTS, default=PYMODBUS_TRANSPORT,
+        help='клиент Modbus RTU движков sync и process')
+    parser.add_argument('--journal-drain', choices=JOURNAL_DRAIN_MODES, default=SEPARATE_DRAIN,
+                        help='чтение журнала КЛ')
+    parser.add_argument('--stats-interval', type=float, default=STATS_INTERVAL,
+                        help='период вывода счетчиков в журнал, с')
+    args = parser.parse_args()
+
+    config_logs('collector.log')
+    ports = args.ports or get_free_ports()
+    if not ports:
+        parser.exit(1, 'Нет портов для опроса\n')
+    logging.info(f'Старт сбора данных без интерфейса, порты: {", ".join(ports)}, движок опроса: {args.engine}, '
+                 f'транспорт: {args.transport}, чтение журнала: {args.journal_drain}')
+
+    collector = Collector(ports, args.engine, args.transport, args.journal_drain, args.stats_interval)
+    signal.signal(signal.SIGINT, collector.stop)
+    signal.signal(signal.SIGTERM, collector.stop)
+    collector.run()
+    logging.info('Сбор данных завершен')
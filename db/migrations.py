@@ -0,0 +1,52 @@
+"""Версии схемы БД SQLite.
+
+Таблицы создаются по моделям (версия 0), дальнейшие изменения схемы - это
+миграции из MIGRATIONS. Номер последней примененной миграции хранится в
+PRAGMA user_version файла БД, поэтому существующие файлы sqlite.db
+догоняют схему при первом запуске новой версии программы. Миграции только
+добавляются в конец списка, уже выпущенные не меняются. Команды миграции
+должны быть повторяемыми (IF NOT EXISTS): если миграция прервалась, она
+выполняется заново целиком.
+"""
+import logging
+
+# миграция - кортеж команд SQL, номер миграции - ее позиция в списке начиная с 1
+MIGRATIONS = (
+    # 1: индексы запросов главного окна, экспорта и отчетов.
+    # Журнал событий (event) намеренно без индексов: события записываются пакетами непрерывно,
+    # и каждый индекс event замедляет запись в 1,5-2 раза. Журнал в окне программы очищается
+    # после 10000 событий и фильтруется полным просмотром за несколько мс, а сборщик без
+    # интерфейса журнал не фильтрует.
+    (
+        # тесты за период (экспорт, отчет за месяц)
+        'CREATE INDEX IF NOT EXISTS ix_test_time ON test (time)',
+        # тесты с ошибкой за период; условие совпадает с ERROR_TEST_CONDITION (db/utils.py)
+        'CREATE INDEX IF NOT EXISTS ix_test_error_time ON test (time) '
+        'WHERE test.exit_code_1 BETWEEN 1 AND 19 OR test.exit_code_1 >= 100',
+        # тесты главной таблицы по порядку, их фильтры и номер следующего теста
+        'CREATE INDEX IF NOT EXISTS ix_test_unarchived ON test (number) WHERE is_archived = 0',
+        # отчеты за период и последний отчет
+        'CREATE INDEX IF NOT EXISTS ix_report_date_time ON report (date_time)',
+        # отчет за день, заменяемый при сохранении
+        'CREATE INDEX IF NOT EXISTS ix_report_day ON report (DATE(date_time))',
+    ),
+)
+
+
+def get_schema_version(connection):
+    return connection.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def migrate(engine):
+    """Применяет к БД миграции, которых в ней еще нет. Возвращает номер версии схемы."""
+    if engine.dialect.name != 'sqlite':
+        return None
+    with engine.begin() as connection:
+        version = get_schema_version(connection)
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            logging.info(f'Обновление схемы БД до версии {number}')
+            for statement in statements:
+                connection.exec_driver_sql(statement)
+            connection.exec_driver_sql(f'PRAGMA user_version = {number}')
+            version = number
+    return version
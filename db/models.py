@@ -1,8 +1,8 @@
-from sqlalchemy import (Boolean, Column, DateTime, Float, Integer, String,
-                        create_engine)
-from sqlalchemy.orm import Session, declarative_base
+from collections import namedtuple
+
+from sqlalchemy import Boolean, Column, DateTime, Float, Integer, String
+from sqlalchemy.orm import declarative_base
 
-engine = create_engine('sqlite:///sqlite.db')
 Base = declarative_base()
 
 
@@ -23,6 +23,12 @@ class Event(Base):
         return str(self.event_code)
 
 
+# событие журнала без объекта ORM: так события передаются от опроса до записи в БД
+# и в таблицу журнала; поля - столбцы event по порядку, number - None до записи
+EventRecord = namedtuple('EventRecord', (
+    'number', 'date_time', 'kl', 'entry_number', 'au_address', 'event_code', 'addit_param', 'description'))
+
+
 class Test(Base):
     """Модель теста КЛ."""
     __tablename__ = 'test'
@@ -117,6 +123,3 @@ class StatisticSaved(Base):
     year = Column(Integer)
     month = Column(Integer)
 
-
-Base.metadata.create_all(engine)
-session = Session(engine)
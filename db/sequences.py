@@ -0,0 +1,44 @@
+"""Нумерация событий журнала и тестов без подсчета строк при каждой записи.
+
+Следующий номер хранится в памяти. При первом обращении и после неудачной
+записи он читается из БД как max(number) + 1 по нумеруемым строкам, после
+удаления всех событий или архивирования всех тестов нумерация начинается с 1.
+"""
+import threading
+
+from sqlalchemy import func, not_
+
+from db.models import Event, Test
+
+
+class NumberSequence:
+    """Номера строк таблицы по порядку. criteria - условия нумеруемых строк."""
+    def __init__(self, column, *criteria):
+        self.column = column
+        self.criteria = criteria
+        self.next_number = None  # None - номер еще не прочитан из БД
+        self.lock = threading.Lock()
+
+    def allocate(self, count, session):
+        """Выделяет count номеров подряд. Возвращает первый из них."""
+        with self.lock:
+            if self.next_number is None:
+                last_number = session.query(func.max(self.column)).filter(*self.criteria).scalar()
+                self.next_number = (last_number or 0) + 1
+            first_number = self.next_number
+            self.next_number += count
+            return first_number
+
+    def restart(self):
+        """Начинает нумерацию с 1, когда нумеруемых строк не осталось."""
+        with self.lock:
+            self.next_number = 1
+
+    def invalidate(self):
+        """Перечитывает номер из БД при следующем выделении, например после отката записи."""
+        with self.lock:
+            self.next_number = None
+
+
+event_numbers = NumberSequence(Event.number)
+test_numbers = NumberSequence(Test.number, not_(Test.is_archived))
@@ -0,0 +1,113 @@
+"""Подключение к базе данных и сессии.
+
+Движок один на процесс. Сессии привязаны к потоку (scoped_session): главное
+окно, поток записи в БД и другие потоки работают каждый со своей сессией и
+берут соединения из общего пула. Изменения выполняются в session_scope -
+транзакции, которая фиксируется при выходе из блока и откатывается при ошибке.
+
+Каждое соединение SQLite настраивается профилем хранения (PRAGMA), профиль
+выбирается переменной окружения STAND_DB_PROFILE:
+- legacy - прежние настройки SQLite: журнал отката, синхронная запись FULL;
+  чтение при экспорте блокирует запись;
+- durable - журнал WAL: чтение и запись не блокируют друг друга, каждая
+  фиксация по-прежнему ждет записи на диск;
+- fast (по умолчанию) - WAL и synchronous=NORMAL: на диск журнал
+  сбрасывается при переносе в файл БД (checkpoint), а не при каждой фиксации.
+  При сбое программы данные не теряются, при отключении питания могут
+  потеряться последние транзакции.
+"""
+import os
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from db.migrations import migrate
+from db.models import Base
+
+DB_URL_ENV = 'STAND_DB_URL'  # переменная окружения для другой БД (например, в бенчмарках)
+DB_URL = os.environ.get(DB_URL_ENV, 'sqlite:///sqlite.db')
+# соединения SQLite открываются заранее и переиспользуются потоками: главное окно, запись в БД, экспорт
+SQLITE_POOL_SIZE = 4
+SQLITE_POOL_OVERFLOW = 4
+
+DB_PROFILE_ENV = 'STAND_DB_PROFILE'  # переменная окружения с профилем хранения SQLite
+LEGACY_PROFILE = 'legacy'
+DURABLE_PROFILE = 'durable'
+FAST_PROFILE = 'fast'
+DB_PROFILE = os.environ.get(DB_PROFILE_ENV, FAST_PROFILE)
+SQLITE_BUSY_TIMEOUT = 5000  # мс ожидания блокировки другим соединением
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # байт файла БД, читаемых через отображение в память
+SQLITE_CACHE_SIZE = -64 * 1024  # кэш страниц соединения, отрицательное значение - в КиБ
+# PRAGMA, выполняемые при открытии каждого соединения SQLite
+SQLITE_PROFILES = {
+    LEGACY_PROFILE: {
+        'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': SQLITE_BUSY_TIMEOUT},
+    DURABLE_PROFILE: {
+        'journal_mode': 'WAL', 'synchronous': 'FULL', 'mmap_size': SQLITE_MMAP_SIZE,
+        'cache_size': SQLITE_CACHE_SIZE, 'temp_store': 'MEMORY', 'busy_timeout': SQLITE_BUSY_TIMEOUT},
+    FAST_PROFILE: {
+        'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'mmap_size': SQLITE_MMAP_SIZE,
+        'cache_size': SQLITE_CACHE_SIZE, 'temp_store': 'MEMORY', 'busy_timeout': SQLITE_BUSY_TIMEOUT},
+}
+PASSIVE_CHECKPOINT = 'PASSIVE'  # переносит журнал WAL в файл БД, не дожидаясь читателей
+TRUNCATE_CHECKPOINT = 'TRUNCATE'  # переносит весь журнал WAL и обнуляет его файл
+
+
+def create_db_engine(url=DB_URL, profile=DB_PROFILE):
+    """Создает движок БД. Соединения с файлом SQLite хранятся в пуле, передаются между потоками
+    и при открытии настраиваются профилем хранения profile."""
+    if not url.startswith('sqlite'):
+        return create_engine(url)
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f'Неизвестный профиль хранения "{profile}", доступны: {", ".join(SQLITE_PROFILES)}')
+    db_engine = create_engine(
+        url, poolclass=QueuePool, pool_size=SQLITE_POOL_SIZE, max_overflow=SQLITE_POOL_OVERFLOW,
+        connect_args={'check_same_thread': False})
+
+    @event.listens_for(db_engine, 'connect')
+    def apply_profile(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PROFILES[profile].items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    return db_engine
+
+
+engine = create_db_engine()
+Base.metadata.create_all(engine)  # версия схемы 0, остальное - миграции (db/migrations.py)
+migrate(engine)
+Session = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
+
+
+def checkpoint_db(mode=PASSIVE_CHECKPOINT):
+    """Переносит страницы журнала WAL в файл БД, чтобы журнал не рос при долгих чтениях.
+    Возвращает (занято, страниц в журнале, перенесено страниц), без WAL - None."""
+    if engine.dialect.name != 'sqlite':
+        return None
+    with engine.connect() as connection:
+        if connection.exec_driver_sql('PRAGMA journal_mode').scalar().lower() != 'wal':
+            return None
+        return tuple(connection.exec_driver_sql(f'PRAGMA wal_checkpoint({mode})').one())
+
+
+def get_session():
+    """Возвращает сессию текущего потока."""
+    return Session()
+
+
+@contextmanager
+def session_scope():
+    """Транзакция в сессии текущего потока. Фиксируется при выходе из блока,
+    при ошибке откатывается. Загруженные объекты остаются доступны после выхода."""
+    session = Session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        Session.remove()
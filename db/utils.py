@@ -1,233 +1,239 @@
+from contextlib import contextmanager
 from copy import deepcopy
 from datetime import datetime
 
-from sqlalchemy import create_engine, func, not_, or_
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import func, literal_column, not_, or_
 
-from db.models import (CheckBox, Event, RememberedCombobox, Report,
-                       SaveFilePath, StatisticSaved, Test)
-from gui.event_codes import get_codes_dictionary
+from db.models import (CheckBox, Event, EventRecord, RememberedCombobox,
+                       Report, SaveFilePath, StatisticSaved, Test)
+from db.sequences import event_numbers, test_numbers
+from db.session import engine, session_scope
 
-engine = create_engine('sqlite:///sqlite.db')
-Session = sessionmaker(bind=engine, expire_on_commit=False)
+# условие теста, завершенного с ошибкой; границы подставляются в SQL числами,
+# иначе SQLite не применит частичный индекс ix_test_error_time (db/migrations.py)
+ERROR_TEST_CONDITION = or_(
+    Test.exit_code_1.between(literal_column('1'), literal_column('19')), Test.exit_code_1 >= literal_column('100'))
+# вставка событий EventRecord одной командой executemany, параметры - поля события по порядку
+EVENT_INSERT = str(Event.__table__.insert().compile(dialect=engine.dialect, column_keys=EventRecord._fields))
+# преобразование времени события в значение для БД, как при записи объекта Event
+process_event_time = Event.__table__.c.date_time.type.dialect_impl(engine.dialect).bind_processor(engine.dialect)
 
-try:
-    codes_dictionary = get_codes_dictionary()
-except Exception:
-    pass
 
-
-def get_session():
-    """Получает объект сессии."""
-    session = Session()
-    return session
-
-
-def get_count_of_events_in_db(session=get_session()):
+def get_count_of_events_in_db():
     """Возвращает количество событий из журнала в базе данных."""
-    events_count = session.query(Event).count()
-    session.close()
-    return events_count
+    with session_scope() as session:
+        return session.query(Event).count()
 
 
-def get_count_of_tests_in_db(session=get_session()):
+def get_count_of_tests_in_db():
     """Возвращает количество тестов из журнала в базе данных."""
-    tests_count = session.query(Test).filter(not_(Test.is_archived)).count()
-    session.close()
-    return tests_count
+    with session_scope() as session:
+        return session.query(Test).filter(not_(Test.is_archived)).count()
 
 
-def get_unarchived_tests(session=get_session()):
+def get_unarchived_tests():
     """Возвращает все незаархивированные тесты."""
-    tests = session.query(Test).filter(not_(Test.is_archived)).all()
-    session.close()
-    return tests
+    with session_scope() as session:
+        return session.query(Test).filter(not_(Test.is_archived)).order_by(Test.number).all()
+
+
+def get_tests_for_period(period):
+    with session_scope() as session:
+        return session.query(Test).filter(Test.time.between(period[0], period[1])).all()
+
+
+def get_error_tests_for_period(period):
+    with session_scope() as session:
+        return session.query(Test).filter(Test.time.between(period[0], period[1])).filter(ERROR_TEST_CONDITION).all()
+
 
+def get_reports_for_period(period):
+    with session_scope() as session:
+        return session.query(Report).filter(Report.date_time.between(period[0], period[1])).all()
 
-def get_tests_for_period(period, session=get_session()):
-    tests = session.query(Test).filter(Test.time.between(period[0], period[1])).all()
-    session.close()
-    return tests
 
+@contextmanager
+def numbered_session_scope(*sequences):
+    """Транзакция записи пронумерованных строк.
+    Если запись не удалась, номера перечитываются из БД при следующей записи."""
+    try:
+        with session_scope() as session:
+            yield session
+    except Exception:
+        for sequence in sequences:
+            sequence.invalidate()
+        raise
 
-def get_error_tests_for_period(period, session=get_session()):
-    tests = session.query(Test).filter(Test.time.between(period[0], period[1])).filter(or_(Test.exit_code_1.between(1, 19), Test.exit_code_1 >= 100)).all()
-    session.close()
-    return tests
 
+def insert_events(session, events):
+    """Вставляет события EventRecord в транзакции session одной командой executemany,
+    без объектов ORM. Время пакета преобразуется для БД один раз.
+    Возвращает номера, присвоенные событиям по порядку."""
+    if not events:
+        return range(0)
+    first_number = event_numbers.allocate(len(events), session)
+    event_times = {}
+    rows = []
+    for number, event in enumerate(events, first_number):
+        event_time = event_times.get(event.date_time)
+        if event_time is None:
+            event_time = event_times[event.date_time] = process_event_time(event.date_time)
+        rows.append((number, event_time, *event[2:]))
+    session.connection().exec_driver_sql(EVENT_INSERT, rows)
+    return range(first_number, first_number + len(events))
 
-def get_reports_for_period(period, session=get_session()):
-    reports = session.query(Report).filter(Report.date_time.between(period[0], period[1])).all()
-    session.close()
-    return reports
 
+def get_numbered_events(events, numbers):
+    """Возвращает события EventRecord с присвоенными номерами."""
+    return [EventRecord._make((number, *event[1:])) for event, number in zip(events, numbers)]
 
-def save_events_to_db(events, session=get_session()):
-    """Сохраняет в БД события из пакета данных."""
-    packet_events = []
-    current_number = get_count_of_events_in_db() + 1
-    for event in events:
-        event.number = current_number
-        session.add(event)
-        packet_events.append(event)
-        current_number += 1
-    session.commit()
-    session.close()
-    return packet_events
 
+def save_events_to_db(events):
+    """Сохраняет в БД события EventRecord из пакета данных. Возвращает события с номерами."""
+    with numbered_session_scope(event_numbers) as session:
+        numbers = insert_events(session, events)
+    return get_numbered_events(events, numbers)
 
-def save_test_to_db(test, session=get_session()):
+
+def save_test_to_db(test):
     """Сохраняет в БД тесты из пакета данных."""
-    test.number = get_count_of_tests_in_db() + 1
-    session.add(test)
-    session.commit()
-    session.close()
+    with numbered_session_scope(test_numbers) as session:
+        test.number = test_numbers.allocate(1, session)
+        session.add(test)
     return test
 
 
-def save_report_to_db(report, session=get_session()):
+def save_report_to_db(report):
     report.date_time = datetime.now()
     new_report = deepcopy(report)
-    session.query(Report).filter(func.DATE(Report.date_time) == report.date_time.date()).delete()
-    session.add(new_report)
-    session.commit()
-    session.close()
-
-
-def clear_events_db(session=get_session()):
+    with session_scope() as session:
+        session.query(Report).filter(func.DATE(Report.date_time) == report.date_time.date()).delete()
+        session.add(new_report)
+
+
+def save_batch_to_db(events, tests, report=None):
+    """Сохраняет события EventRecord и тесты нескольких пакетов и суточный отчет одной транзакцией.
+    Номера событий и тестов продолжают нумерацию в БД. Возвращает события с номерами."""
+    with numbered_session_scope(event_numbers, test_numbers) as session:
+        numbers = insert_events(session, events)
+        if tests:
+            current_number = test_numbers.allocate(len(tests), session)
+            for test in tests:
+                test.number = current_number
+                current_number += 1
+        session.add_all(tests)
+        if report is not None:
+            session.query(Report).filter(func.DATE(Report.date_time) == report.date_time.date()).delete()
+            session.add(report)
+    return get_numbered_events(events, numbers)
+
+
+def clear_events_db():
     """Удаляет все события журнала из базы данных."""
-    session.query(Event).delete()
-    session.commit()
-    session.close()
+    with session_scope() as session:
+        session.query(Event).delete()
+    event_numbers.restart()
 
 
-def clear_tests_db_for_period(period, session=get_session()):
+def clear_tests_db_for_period(period):
     """Удаляет все тесты за указанный период из базы данных."""
-    session.query(Test).filter(Test.time.between(period[0], period[1])).delete()
-    session.commit()
-    session.close()
+    with session_scope() as session:
+        session.query(Test).filter(Test.time.between(period[0], period[1])).delete()
 
 
-def archive_test_db(session=get_session()):
+def archive_test_db():
     """Архивирует результаты тестов находящихся в таблице."""
-    session.query(Test).filter(Test.is_archived is not True).update({'is_archived': True})
-    session.commit()
-    session.close()
+    with session_scope() as session:
+        session.query(Test).filter(not_(Test.is_archived)).update({'is_archived': True})
+    test_numbers.restart()
 
 
-def get_latest_report(session=get_session()):
+def get_latest_report():
     """Возвращает из БД самый последний отчет"""
-    report = session.query(Report).order_by(Report.date_time.desc()).limit(1).first()
-    return report
+    with session_scope() as session:
+        return session.query(Report).order_by(Report.date_time.desc()).limit(1).first()
 
 
-def is_statistic_saved(document, month, year, session=get_session()):
-    saved_statistic = session.query(
-        StatisticSaved).filter(StatisticSaved.document == document).filter(StatisticSaved.year == year).filter(StatisticSaved.month == month).all()
+def is_statistic_saved(document, month, year):
+    with session_scope() as session:
+        saved_statistic = session.query(
+            StatisticSaved).filter(StatisticSaved.document == document).filter(StatisticSaved.year == year).filter(StatisticSaved.month == month).all()
     if not saved_statistic:
         return False
     else:
         return True
 
 
-def create_saved_statistic(document, month, year, session=get_session()):
-    saved_statistic = StatisticSaved(document=document, year=year, month=month)
-    session.add(saved_statistic)
-    session.commit()
-    session.close()
+def create_saved_statistic(document, month, year):
+    with session_scope() as session:
+        session.add(StatisticSaved(document=document, year=year, month=month))
 
 
-def get_events_codes(session=get_session()):
+def get_events_codes():
     """Получает стороку типа 'код события - описание' для
     всех событий в таблице главного окна.
     Применяется для фильтрации по полю код события и описание."""
     codes_list = []
-    result = session.query(Event.event_code.distinct(), Event.description).all()
+    with session_scope() as session:
+        result = session.query(Event.event_code.distinct(), Event.description).all()
     result.sort()
     if result:
         for event in result:
             codes_list.append(f'{event[0]} - {event[1]}')
-    session.close()
     return codes_list
 
 
-def remember_checkbox(is_checked, session=get_session()):
+def remember_checkbox(is_checked):
     """Записывает в БД положение чекбокса выбора порта."""
-    if len(session.query(CheckBox).all()) == 0:
-        checkbox = CheckBox(is_checked=is_checked)
-        session.add(checkbox)
-    else:
+    with session_scope() as session:
         checkbox_to_del = session.query(CheckBox).first()
-        session.delete(checkbox_to_del)
-        checkbox = CheckBox(is_checked=is_checked)
-        session.add(checkbox)
-    session.commit()
-    session.close()
+        if checkbox_to_del:
+            session.delete(checkbox_to_del)
+        session.add(CheckBox(is_checked=is_checked))
 
 
-def is_checked_checkbox(session=get_session()):
+def is_checked_checkbox():
     """Возвращает из БД положение чекбокса выбора порта."""
-    if len(session.query(CheckBox).all()) == 0:
-        session.close()
-        return False
-    else:
-        session.close()
-        return session.query(CheckBox).first().is_checked
+    with session_scope() as session:
+        checkbox = session.query(CheckBox).first()
+        return checkbox.is_checked if checkbox else False
 
 
-def remember_combobox(current_text, session=get_session()):
+def remember_combobox(current_text):
     """Записывает в БД положение комбобокса выбора порта."""
-    if len(session.query(RememberedCombobox).all()) == 0:
-        combobox = RememberedCombobox(current_text=current_text)
-        session.add(combobox)
-    else:
+    with session_scope() as session:
         combobox_to_del = session.query(RememberedCombobox).first()
-        session.delete(combobox_to_del)
-        combobox = RememberedCombobox(current_text=current_text)
-        session.add(combobox)
-    session.commit()
-    session.close()
+        if combobox_to_del:
+            session.delete(combobox_to_del)
+        session.add(RememberedCombobox(current_text=current_text))
 
 
-def delete_remembered_combobox(session=get_session()):
+def delete_remembered_combobox():
     """Удаляет из БД значение комбобокса выбора порта."""
-    if len(session.query(RememberedCombobox).all()) != 0:
+    with session_scope() as session:
         combobox_to_del = session.query(RememberedCombobox).first()
-        session.delete(combobox_to_del)
-        session.commit()
-        session.close()
+        if combobox_to_del:
+            session.delete(combobox_to_del)
 
 
-def combobox_remembered_text(session=get_session()):
+def combobox_remembered_text():
     """Возвращает значение комбобокса выбора порта."""
-    if len(session.query(RememberedCombobox).all()) == 0:
-        session.close()
-        return 'Не выбран'
-    combobox_text = session.query(RememberedCombobox).first().current_text
-    session.close()
-    return combobox_text
+    with session_scope() as session:
+        combobox = session.query(RememberedCombobox).first()
+        return combobox.current_text if combobox else 'Не выбран'
 
 
-def remember_save_file_path(path, table, session=get_session()):
+def remember_save_file_path(path, table):
     """Запоминает путь к сохраненному файлу."""
-    if len(session.query(SaveFilePath).all()) == 0:
-        save_file_path = SaveFilePath(path=path, table=table)
-        session.add(save_file_path)
-    else:
+    with session_scope() as session:
         save_file_path_to_del = session.query(SaveFilePath).filter(SaveFilePath.table == table).first()
         if save_file_path_to_del:
             session.delete(save_file_path_to_del)
-        save_file_path = SaveFilePath(path=path, table=table)
-        session.add(save_file_path)
-    session.commit()
-    session.close()
+        session.add(SaveFilePath(path=path, table=table))
 
 
-def get_save_file_path(table, session=get_session()):
+def get_save_file_path(table):
     """Возвращает путь к сохраненному файлу."""
-    if len(session.query(SaveFilePath).filter(SaveFilePath.table == table).all()) == 0:
-        session.close()
-        return
-    file_path = session.query(SaveFilePath).filter(SaveFilePath.table == table).first().path
-    session.close()
-    return file_path
+    with session_scope() as session:
+        save_file_path = session.query(SaveFilePath).filter(SaveFilePath.table == table).first()
+        return save_file_path.path if save_file_path else None
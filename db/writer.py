@@ -0,0 +1,172 @@
+"""Запись результатов опроса в БД в отдельном потоке.
+
+Пакеты событий (EventRecord) и тесты всех КЛ ставятся в ограниченную очередь и
+сохраняются группами: одна транзакция на все пакеты, пришедшие за
+batch_interval секунд, но не больше batch_rows строк. Поток, передавший
+пакет, не ждет диска, пока очередь не заполнена. Очистка журнала и
+архивирование тестов выполняются той же очередью, поэтому соблюдают порядок
+с записью. Неудачная запись группы повторяется с перечитанными из БД
+номерами, если и она не удалась, в лог пишется, сколько строк каждого КЛ
+потеряно. О сохраненных строках (уже с номерами) и выполненных командах
+сообщают сигналы, в программе это сигналы Qt (gui/threads.py), вне
+интерфейса - Channel с обработчиками, вызываемыми в потоке записи.
+Раз в checkpoint_interval секунд поток переносит журнал WAL в файл БД, при
+остановке - полностью.
+"""
+import logging
+import queue
+import threading
+import traceback
+from collections import Counter
+from copy import deepcopy
+from datetime import datetime
+from time import monotonic
+
+from channels import Channel
+from db.sequences import event_numbers, test_numbers
+from db.session import PASSIVE_CHECKPOINT, TRUNCATE_CHECKPOINT, checkpoint_db
+from db.utils import archive_test_db, clear_events_db, save_batch_to_db
+
+WRITER_QUEUE_SIZE = 1000  # пакетов в очереди, при заполнении передающий поток ждет записи
+WRITER_BATCH_INTERVAL = 0.05  # наибольшая задержка записи пакета, с
+WRITER_BATCH_ROWS = 500  # наибольшее количество строк в одной транзакции
+WRITER_CHECKPOINT_INTERVAL = 60  # период переноса журнала WAL в файл БД, с
+WRITER_COMMIT_ATTEMPTS = 2  # попыток записи группы, перед повтором номера перечитываются из БД
+
+# сигналы записи, у сигналов Qt те же имена (gui/threads.py)
+WRITER_SIGNALS = ('events_saved', 'tests_saved', 'events_cleared', 'tests_archived')
+
+# виды элементов очереди
+EVENTS, TEST, REPORT, CLEAR_EVENTS, ARCHIVE_TESTS, STOP = range(6)
+
+
+def log_lost_rows(events, tests):
+    """Предупреждает, сколько событий и тестов каждого КЛ не удалось записать в БД."""
+    lost_events = Counter(event.kl for event in events)
+    lost_tests = Counter(test.kl for test in tests)
+    for kl in sorted(lost_events.keys() | lost_tests.keys()):
+        logging.warning(f'Не записаны в БД события КЛ{kl}: {lost_events[kl]}, тесты: {lost_tests[kl]}')
+
+
+class DbWriter:
+    """Поток записи в БД с групповой фиксацией.
+    Сигналы, не объявленные в подклассе (как сигналы Qt), создаются как Channel."""
+    def __init__(self, batch_interval=WRITER_BATCH_INTERVAL, batch_rows=WRITER_BATCH_ROWS,
+                 queue_size=WRITER_QUEUE_SIZE, checkpoint_interval=WRITER_CHECKPOINT_INTERVAL):
+        for name in WRITER_SIGNALS:
+            if not hasattr(type(self), name):
+                setattr(self, name, Channel())
+        self.batch_interval = batch_interval
+        self.batch_rows = batch_rows
+        self.queue = queue.Queue(queue_size)
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_time = monotonic()
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self.run, name='db writer', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Записывает все поставленные в очередь данные и останавливает поток."""
+        if self.thread is None:
+            return
+        self.queue.put((STOP, None))
+        self.thread.join()
+        self.thread = None
+
+    def save_events(self, events):
+        self.queue.put((EVENTS, events))
+
+    def save_tests(self, test):
+        self.queue.put((TEST, test))
+
+    def save_report(self, report):
+        """Ставит в очередь суточный отчет. Из нескольких отчетов группы сохраняется последний."""
+        report.date_time = datetime.now()
+        self.queue.put((REPORT, deepcopy(report)))
+
+    def clear_events(self):
+        self.queue.put((CLEAR_EVENTS, None))
+
+    def archive_tests(self):
+        self.queue.put((ARCHIVE_TESTS, None))
+
+    def get_batch(self):
+        """Ждет первый элемент очереди (не дольше checkpoint_interval) и добирает следующие,
+        пока не истек batch_interval или не набралось batch_rows строк. Команда завершает группу.
+        Возвращает события, тесты, отчет и команду (или None)."""
+        events, tests, report = [], [], None
+        try:
+            kind, payload = self.queue.get(timeout=self.checkpoint_interval)
+        except queue.Empty:
+            return events, tests, report, None
+        deadline = monotonic() + self.batch_interval
+        while True:
+            if kind == EVENTS:
+                events.extend(payload)
+            elif kind == TEST:
+                tests.append(payload)
+            elif kind == REPORT:
+                report = payload
+            else:
+                return events, tests, report, kind
+            if len(events) + len(tests) >= self.batch_rows:
+                return events, tests, report, None
+            try:
+                kind, payload = self.queue.get(timeout=max(0, deadline - monotonic()))
+            except queue.Empty:
+                return events, tests, report, None
+
+    def commit(self, events, tests, report):
+        if not events and not tests and report is None:
+            return
+        for attempt in range(1, WRITER_COMMIT_ATTEMPTS + 1):
+            try:
+                saved_events = save_batch_to_db(events, tests, report)
+                break
+            except Exception:
+                logging.error(f'Ошибка при записи в БД {len(events)} событий и {len(tests)} тестов '
+                              f'(попытка {attempt} из {WRITER_COMMIT_ATTEMPTS}).\n{traceback.format_exc()}')
+                # номера могли разойтись с БД, например после записи другой программой
+                event_numbers.invalidate()
+                test_numbers.invalidate()
+        else:
+            log_lost_rows(events, tests)
+            return
+        if saved_events:
+            self.events_saved.emit(saved_events)
+        if tests:
+            self.tests_saved.emit(tests)
+
+    def execute(self, command):
+        try:
+            if command == CLEAR_EVENTS:
+                clear_events_db()
+                self.events_cleared.emit()
+            elif command == ARCHIVE_TESTS:
+                archive_test_db()
+                self.tests_archived.emit()
+        except Exception:
+            logging.error(f'Ошибка при изменении БД.\n{traceback.format_exc()}')
+
+    def checkpoint(self, mode=PASSIVE_CHECKPOINT):
+        self.checkpoint_time = monotonic()
+        try:
+            checkpoint_db(mode)
+        except Exception:
+            logging.error(f'Ошибка при переносе журнала WAL в файл БД.\n{traceback.format_exc()}')
+
+    def run(self):
+        while True:
+            events, tests, report, command = self.get_batch()
+            self.commit(events, tests, report)
+            if command == STOP:
+                self.checkpoint(TRUNCATE_CHECKPOINT)
+                return
+            if command is not None:
+                self.execute(command)
+            if monotonic() - self.checkpoint_time >= self.checkpoint_interval:
+                self.checkpoint()
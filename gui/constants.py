@@ -3,3 +3,13 @@ TESTS = 'Тесты'
 TESTS_FOR_PERIOD = 'Тесты за период'
 REPORT = 'Отчет'
 REPORT_FOR_PERIOD = 'Отчет за период'
+PORTS_SEPARATOR = ', '
+LINK_QUALITY = 'Качество связи'
+
+# столбцы статистики качества связи: заголовок и ключ строки LinkQualityStats.get_rows
+LINK_QUALITY_COLUMNS = [
+    ('Порт', 'port'), ('КЛ', 'kl'), ('Блок регистров', 'block'), ('Успешно', 'successes'),
+    ('Нет ответа', 'timeouts'), ('Поврежден', 'crc_errors'), ('Исключение', 'illegal_responses'),
+    ('Ошибки порта', 'errors'), ('Повторы', 'retries'), ('Среднее, мс', 'mean_ms'),
+    ('p50, мс', 'p50_ms'), ('p95, мс', 'p95_ms'), ('p99, мс', 'p99_ms'), ('Макс., мс', 'max_ms')
+]
@@ -1,39 +1,45 @@
 from datetime import timedelta
 
-from PyQt5.QtCore import QDate, Qt, QTimer
+from PyQt5.QtCore import QDate, Qt
 from PyQt5.QtGui import QIcon, QPixmap
-from PyQt5.QtWidgets import (QCheckBox, QComboBox, QDateEdit, QDialog,
-                             QHBoxLayout, QLabel, QPushButton, QVBoxLayout)
+from PyQt5.QtWidgets import (QAbstractItemView, QCheckBox, QDateEdit,
+                             QDialog, QHBoxLayout, QLabel, QListWidget,
+                             QListWidgetItem, QPushButton, QTableWidget,
+                             QTableWidgetItem, QVBoxLayout)
 
 from db.utils import (combobox_remembered_text, delete_remembered_combobox,
                       is_checked_checkbox, remember_checkbox,
                       remember_combobox)
-from gui.constants import REPORT_FOR_PERIOD, TESTS_FOR_PERIOD
-from modbus.utils import get_ports
+from gui.constants import (LINK_QUALITY, LINK_QUALITY_COLUMNS,
+                           PORTS_SEPARATOR, REPORT_FOR_PERIOD,
+                           TESTS_FOR_PERIOD)
+from gui.ports import PortRegistryNotifier
+from modbus.ports import port_registry
 
 
 class SelectPortDialog(QDialog):
-    """Диалоговое окно для выбора порта."""
+    """Диалоговое окно для выбора портов.
+    Каждый отмеченный порт опрашивается в отдельном потоке."""
     def __init__(self):
         super().__init__()
         self.setModal(True)
         self.setWindowTitle('Выбор порта')
         self.setWindowFlags(Qt.WindowTitleHint)
-        self.setFixedSize(200, 200)
+        self.setFixedSize(200, 250)
         self.layout_dialog = QVBoxLayout()
         self.setLayout(self.layout_dialog)
 
-        # конфигурация комбобокса
-        self.select_port = QComboBox()
-        self.ports_list = get_ports()
-        self.select_port.addItems(self.ports_list)
-        if is_checked_checkbox():
-            if combobox_remembered_text() in self.ports_list:
-                self.select_port.setCurrentIndex(self.ports_list.index(combobox_remembered_text()))
-            else:
-                self.select_port.setCurrentIndex(self.ports_list.index('Не выбран'))
+        # конфигурация списка портов: занятость проверяется в фоне, метки обновляются по мере проверки
+        self.select_port = QListWidget()
+        self.ports_list = port_registry.get_ports()
+        port_registry.request_availability(self.ports_list)
+        self.ports_notifier = PortRegistryNotifier()
+        self.ports_notifier.ports_changed.connect(self.update_ports)
+        if is_checked_checkbox() and combobox_remembered_text() != 'Не выбран':
+            checked_ports = combobox_remembered_text().split(PORTS_SEPARATOR)
         else:
-            self.select_port.setCurrentIndex(self.ports_list.index('Не выбран'))
+            checked_ports = []
+        self.fill_ports(checked_ports)
         self.layout_dialog.addWidget(self.select_port)
 
         # конфигурация чекбокса
@@ -55,25 +61,54 @@ class SelectPortDialog(QDialog):
         self.layout_btn_ok.setAlignment(Qt.AlignHCenter)
         self.layout_dialog.addLayout(self.layout_btn_ok)
 
-        # конфигурация таймеров и флагов
         self.selected_port = 'Не выбран'
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_ports)
-        self.timer.start(1000)
-
-    def update_ports(self):
-        """Обновляет список доступных портов."""
-        new_ports_list = get_ports()
-        if self.ports_list != new_ports_list:
-            self.ports_list = new_ports_list
-            self.select_port.clear()
-            self.select_port.addItems(new_ports_list)
+
+    def fill_ports(self, checked_ports):
+        """Заполняет список портов, отмечая выбранные."""
+        self.select_port.clear()
+        for port in self.ports_list:
+            item = QListWidgetItem(f'{port} (занят)' if port_registry.is_busy(port) else port)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            if port in checked_ports:
+                item.setCheckState(Qt.Checked)
+            else:
+                item.setCheckState(Qt.Unchecked)
+            self.select_port.addItem(item)
+
+    @staticmethod
+    def port_name(item_text):
+        """Возвращает имя порта без пометки '(занят)'."""
+        return item_text.split(' (')[0]
+
+    def get_checked_ports(self):
+        """Возвращает список отмеченных портов."""
+        checked_ports = []
+        for i in range(self.select_port.count()):
+            item = self.select_port.item(i)
+            if item.checkState() == Qt.Checked:
+                checked_ports.append(self.port_name(item.text()))
+        return checked_ports
+
+    def update_ports(self, ports_list):
+        """Обновляет список портов после изменений в PortRegistry."""
+        port_registry.request_availability(ports_list)  # только новые порты и устаревшие проверки
+        checked_ports = self.get_checked_ports()
+        self.ports_list = ports_list
+        self.fill_ports(checked_ports)
+
+    def done(self, result):
+        self.ports_notifier.close()
+        super().done(result)
 
     def ok_click(self):
-        """Применяет выбранный порт и закрывает диалог."""
+        """Применяет выбранные порты и закрывает диалог."""
         is_checked = self.checkbox_remember_port.isChecked()
         remember_checkbox(is_checked)
-        combobox_text = self.select_port.currentText()
+        checked_ports = self.get_checked_ports()
+        if checked_ports:
+            combobox_text = PORTS_SEPARATOR.join(checked_ports)
+        else:
+            combobox_text = 'Не выбран'
         if is_checked:
             remember_combobox(combobox_text)
         else:
@@ -144,6 +179,50 @@ class SelectTestPeriodDialog(SelectReportPeriodDialog):
         self.parent.save_table(table=TESTS_FOR_PERIOD, period=(date_from, date_to), is_error_flag=self.checkbox_error.isChecked())
 
 
+class LinkQualityDialog(QDialog):
+    """Статистика качества связи с КЛ по адресам и блокам регистров."""
+    def __init__(self, parent):
+        super().__init__()
+        self.parent = parent
+        self.setWindowTitle('Качество связи')
+        self.setWindowFlags(Qt.WindowCloseButtonHint)
+        self.resize(1000, 500)
+        self.layout_dialog = QVBoxLayout()
+        self.setLayout(self.layout_dialog)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(LINK_QUALITY_COLUMNS))
+        self.table.setHorizontalHeaderLabels([name for name, _ in LINK_QUALITY_COLUMNS])
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.layout_dialog.addWidget(self.table)
+
+        self.layout_buttons = QHBoxLayout()
+        self.btn_update = QPushButton('Обновить')
+        self.btn_update.clicked.connect(self.fill_table)
+        self.btn_save = QPushButton('Сохранить в файл')
+        self.btn_save.clicked.connect(lambda: self.parent.save_table(LINK_QUALITY))
+        self.btn_close = QPushButton('Закрыть')
+        self.btn_close.clicked.connect(self.close)
+        self.layout_buttons.addWidget(self.btn_update)
+        self.layout_buttons.addWidget(self.btn_save)
+        self.layout_buttons.addWidget(self.btn_close)
+        self.layout_dialog.addLayout(self.layout_buttons)
+        self.fill_table()
+
+    def fill_table(self):
+        rows = self.parent.get_link_quality_rows()
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j, (_, key) in enumerate(LINK_QUALITY_COLUMNS):
+                item = QTableWidgetItem()
+                value = round(row[key], 2) if isinstance(row[key], float) else row[key]
+                item.setData(Qt.EditRole, value)
+                self.table.setItem(i, j, item)
+        self.table.setSortingEnabled(True)
+
+
 class AboutProgramDialog(QDialog):
     """Диалоговое окно для пункта меню 'О программе'"""
     def __init__(self):
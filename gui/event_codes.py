@@ -1,14 +1,24 @@
 import logging
 import traceback
 
-from PyQt5.QtGui import QColorConstants
-
 from gui.exceptions import IncorrectMessageFileException
 
 
-def get_codes_dictionary():
-    """Возвращает словарь с кодами событий для КЛ."""
+def get_svg_color_names():
+    """Возвращает имена цветов, известные Qt, или None без PyQt5.
+    Qt импортируется здесь, чтобы словари событий загружались и в режиме без интерфейса."""
+    try:
+        from PyQt5.QtGui import QColorConstants
+    except ImportError:
+        return None
+    return vars(QColorConstants.Svg).keys()
+
+
+def get_codes_dictionary(check_colors=True):
+    """Возвращает словарь с кодами событий для КЛ.
+    check_colors - проверять цвета по Qt (пропускается без PyQt5)."""
     logging.info('Попытка формирования словаря из файла KL_Messages.txt')
+    color_names = get_svg_color_names() if check_colors else None
     codes_dictionary = {}
     txt_file = 'messages/KL_Messages.txt'
     try:
@@ -35,7 +45,7 @@ def get_codes_dictionary():
                 raise IncorrectMessageFileException(
                     f'В файле "{txt_file}" некорректный код сообщения в строке "{line.strip()}".')
             codes = line.strip().split(' ', 2)  # инд. 0 - код ошибки; инд. 1 - цвет; инд. 2 - описание.
-            if codes[1].lower() not in vars(QColorConstants.Svg).keys():
+            if color_names is not None and codes[1].lower() not in color_names:
                 logging.warning(
                     f'В файле "{txt_file}" rgb-код цвета в строке "{line.strip()}" отсуствует в программе.\n {traceback.format_exc()}')
                 raise IncorrectMessageFileException(
@@ -75,3 +85,10 @@ def get_error_dictionary():
             code = f'{code_1}.{code_2}.{code_3}'
             errors_dictionary[code] = [desc_1_2, desc_3]
         return errors_dictionary
+
+
+try:
+    codes_dictionary = get_codes_dictionary(check_colors=False)
+    errors_dictionary = get_error_dictionary()
+except Exception:
+    print('ошибка')
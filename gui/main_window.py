@@ -15,29 +15,34 @@ from PyQt5.QtWidgets import (QBoxLayout, QFileDialog, QFrame, QHBoxLayout,
                              QSizePolicy, QSplitter, QTabWidget, QVBoxLayout,
                              QWidget)
 from sqlalchemy import not_
+from sqlalchemy.orm import Query
 
 from db.models import Event, Test
+from db.session import session_scope
 from db.utils import (archive_test_db, clear_events_db, get_count_of_tests_in_db,
                       clear_tests_db_for_period, combobox_remembered_text,
                       create_saved_statistic, get_count_of_events_in_db,
                       get_events_codes, get_latest_report, get_save_file_path,
-                      get_session, is_statistic_saved, remember_save_file_path,
-                      save_events_to_db, save_report_to_db, save_test_to_db)
-from gui.constants import (JOURNAL, REPORT_FOR_PERIOD, TESTS,
-                           TESTS_FOR_PERIOD)
-from gui.dialog_windows import (AboutProgramDialog, SelectPortDialog,
-                                SelectReportPeriodDialog,
+                      is_statistic_saved, remember_save_file_path)
+from gui.constants import (JOURNAL, LINK_QUALITY, PORTS_SEPARATOR,
+                           REPORT_FOR_PERIOD, TESTS, TESTS_FOR_PERIOD)
+from gui.dialog_windows import (AboutProgramDialog, LinkQualityDialog,
+                                SelectPortDialog, SelectReportPeriodDialog,
                                 SelectTestPeriodDialog)
 from gui.event_codes import get_codes_dictionary, get_error_dictionary
 from gui.styles import rx_stylesheet, rx_tx_white_stylesheet, tx_stylesheet
-from gui.threads import ReadingWorker
+from gui.threads import (AsyncReadingWorker, DbWriterWorker,
+                         ProcessReadingWorker, ReadingWorker)
 from gui.utils import (add_rows_journal_table, add_rows_main_table,
-                       write_journal_to_file, write_report_for_period_to_file,
-                       write_report_to_file, write_tests_results_to_file)
+                       write_journal_to_file, write_link_quality_to_file,
+                       write_report_for_period_to_file, write_report_to_file,
+                       write_tests_results_to_file)
 from gui.widgets import (GraphWidget, JournalTable, LayoutFilterJournal,
                          LayoutFilterMainTable, LayoutJournalToolBar,
                          LayoutMainTableToolBar, MainTable, StatisticWidget)
-from modbus.utils import get_ports
+from modbus.constants import (ASYNC_ENGINE, PROCESS_ENGINE, PYMODBUS_TRANSPORT,
+                              SEPARATE_DRAIN, SYNC_ENGINE)
+from modbus.ports import port_registry
 
 
 class MainWindow(QMainWindow):
@@ -52,10 +57,15 @@ class MainWindow(QMainWindow):
                 dialog = AboutProgramDialog()
                 dialog.show()
                 dialog.exec()
+        elif msg.message == win32con.WM_DEVICECHANGE:  # подключено или отключено устройство
+            port_registry.refresh()
         return retval, result
 
-    def __init__(self):
+    def __init__(self, engine=SYNC_ENGINE, transport=PYMODBUS_TRANSPORT, journal_drain=SEPARATE_DRAIN):
         super().__init__()
+        self.engine = engine  # движок опроса КЛ, выбирается при запуске программы
+        self.transport = transport  # клиент Modbus RTU синхронного движка
+        self.journal_drain = journal_drain  # способ чтения журнала КЛ
         # конфигурация главного окна и центрального виджета
         self.central_widget = QWidget(self)
         self.setGeometry(50, 50, 1300, 700)
@@ -150,12 +160,16 @@ class MainWindow(QMainWindow):
         self.layout_status_bar = QHBoxLayout()
         self.layout_status_bar.addStretch(0)
         self.layout_status_bar.setDirection(QBoxLayout.RightToLeft)
-        ports_list = get_ports()
+        ports_list = port_registry.get_ports()
+        port_registry.start()
         self.btn_select_port = QPushButton('Выбрать порт')
         self.btn_select_port.clicked.connect(self.select_port)
         self.label_current_port = QLabel()
-        if combobox_remembered_text() in ports_list:
-            self.label_current_port.setText(f': {combobox_remembered_text()}')
+        # запомненные порты подключаются при старте, поэтому занятые другой программой отбрасываются сразу
+        remembered_ports = port_registry.get_free_ports(
+            [port for port in combobox_remembered_text().split(PORTS_SEPARATOR) if port in ports_list])
+        if remembered_ports:
+            self.label_current_port.setText(f': {PORTS_SEPARATOR.join(remembered_ports)}')
         else:
             self.label_current_port.setText(': Не выбран')
 
@@ -168,10 +182,16 @@ class MainWindow(QMainWindow):
 
         self.label_trans_packets = QLabel('Передано: 0  ')
         self.label_rec_packets = QLabel('Принято: 0  ')
+        self.label_link_errors = QLabel('Ошибки: 0  ')
+        self.btn_link_quality = QPushButton('Качество связи')
+        self.btn_link_quality.clicked.connect(self.show_link_quality)
         self.label_session_time = QLabel('00:00:00')
 
         self.layout_status_bar.addWidget(self.label_session_time)
         self.layout_status_bar.addSpacing(30)
+        self.layout_status_bar.addWidget(self.btn_link_quality)
+        self.layout_status_bar.addWidget(self.label_link_errors)
+        self.layout_status_bar.addSpacing(30)
         self.layout_status_bar.addWidget(self.label_rec_packets)
         self.layout_status_bar.addSpacing(30)
         self.layout_status_bar.addWidget(self.label_trans_packets)
@@ -188,23 +208,16 @@ class MainWindow(QMainWindow):
 
         # переменные
         self.rx_color, self.tx_color = 'w', 'w'  # w - белый, g - зеленый, r - красный
-        self.total_trans_packets_count = 0
-        self.total_rec_packets_count = 0
+        self.link_telemetry = {}  # порт -> LinkTelemetry, счетчики обмена за всю работу программы
+        self.link_snapshots = {}  # порт -> последняя сводка обмена TelemetrySnapshot
         self.timer = QTimer()
         self.timer.timeout.connect(self.set_statusbar_time)
         self.statusbar_time = QTime(0, 0, 0)
         self.is_timer_started = False
         self.is_reading = False
-        self.kl_graph_addresses_dict = {
-            1: self.graph_widget.graph_kl_1, 2: self.graph_widget.graph_kl_2,
-            3: self.graph_widget.graph_kl_3, 4: self.graph_widget.graph_kl_4,
-            5: self.graph_widget.graph_kl_5, 6: self.graph_widget.graph_kl_6,
-            7: self.graph_widget.graph_kl_7, 8: self.graph_widget.graph_kl_8,
-            9: self.graph_widget.graph_kl_9, 10: self.graph_widget.graph_kl_10,
-            11: self.graph_widget.graph_kl_11, 12: self.graph_widget.graph_kl_12,
-            13: self.graph_widget.graph_kl_13, 14: self.graph_widget.graph_kl_14,
-            15: self.graph_widget.graph_kl_15, 16: self.graph_widget.graph_kl_16,
-        }
+        self.reading_threads = {}  # порт (или движок asyncio, process) -> поток чтения
+        self.reading_workers = {}  # порт (или движок asyncio, process) -> воркер чтения
+        self.update_graph_ports()
 
         self.check_messages_files()  # проверяем файл с кодами сообщений на корректность
         self.check_errors_files()  # проверяем файл с описаниеями ошибок на корректность
@@ -213,6 +226,13 @@ class MainWindow(QMainWindow):
         self.save_month_statistic(TESTS_FOR_PERIOD)
         clear_events_db()  # очищаем базу даннных от событий
         archive_test_db()  # архивируем старые тесты в БД
+        self.is_journal_clearing = False  # очистка переполненного журнала поставлена в очередь записи
+        self.db_writer = DbWriterWorker()  # запись результатов опроса в БД в отдельном потоке
+        self.db_writer.events_saved.connect(self.show_saved_events)
+        self.db_writer.tests_saved.connect(self.fill_main_table)
+        self.db_writer.events_cleared.connect(self.show_cleared_journal)
+        self.db_writer.tests_archived.connect(lambda: self.main_table.setRowCount(0))
+        self.db_writer.start()
         self.start_reading()
 
     def closeEvent(self, event):
@@ -230,6 +250,7 @@ class MainWindow(QMainWindow):
                 self.save_statistics_report()
             except Exception:
                 event.ignore()
+            self.db_writer.stop()  # дописываем в БД данные из очереди
             event.accept()
         elif msg.clickedButton() == button_no:
             event.ignore()
@@ -245,8 +266,21 @@ class MainWindow(QMainWindow):
         modal_dialog.exec_()
         selected_port = modal_dialog.selected_port
         self.label_current_port.setText(f': {selected_port}')
+        self.update_graph_ports()
         logging.info(f'Подключение к порту {selected_port}')
 
+    def get_selected_ports(self):
+        """Возвращает список выбранных портов."""
+        ports_text = self.label_current_port.text()[2:]
+        if ports_text == 'Не выбран':
+            return []
+        return ports_text.split(PORTS_SEPARATOR)
+
+    def update_graph_ports(self):
+        """Перестраивает графы КЛ под выбранные порты."""
+        self.graph_widget.set_ports(self.get_selected_ports() or ['Не выбран'])
+        self.kl_graph_addresses_dict = self.graph_widget.graphs
+
     def manage_reading(self):
         if self.is_reading:
             self.stop_reading()
@@ -263,39 +297,62 @@ class MainWindow(QMainWindow):
         self.is_reading = True
         self.statistic_widget.btn_start.setText('Стоп')
 
-        self.reading_thread = QThread(parent=self)
-        self.reading_widget = ReadingWorker(port=self.label_current_port.text()[2:], main=self.main_table, journal=self.table_journal)
-        self.reading_widget.moveToThread(self.reading_thread)
-        self.reading_widget.data_trans_rec.connect(self.set_rec_trans_data)
-        self.reading_widget.tx_rx.connect(self.get_rx_tx_blink)
-        self.reading_widget.manage_table_sortig.connect(self.manage_table_sorting)
-        self.reading_widget.update_kl_graph_color.connect(self.update_kl_graph_color)
-        self.reading_widget.update_timer.connect(self.update_kl_graph_timer)
-        self.reading_widget.update_kl_tests_results.connect(self.update_kl_statistic)
-        self.reading_widget.update_kl_version.connect(self.update_kl_version)
-        self.reading_widget.update_current_test.connect(self.update_kl_current_test)
-        self.reading_widget.save_tests.connect(self.save_tests)
-        self.reading_widget.save_events.connect(self.save_events)
-        self.reading_widget.port_connection_error.connect(self.reading_error)
-        self.reading_thread.started.connect(self.reading_widget.run)
+        if self.engine == ASYNC_ENGINE:
+            self.start_worker(
+                ASYNC_ENGINE, AsyncReadingWorker(
+                    ports=self.get_selected_ports(), main=self.main_table, journal=self.table_journal,
+                    telemetry=self.link_telemetry, journal_drain=self.journal_drain))
+        elif self.engine == PROCESS_ENGINE:
+            self.start_worker(
+                PROCESS_ENGINE, ProcessReadingWorker(
+                    ports=self.get_selected_ports(), main=self.main_table, journal=self.table_journal,
+                    telemetry=self.link_telemetry, transport=self.transport, journal_drain=self.journal_drain))
+        else:
+            for port in self.get_selected_ports():
+                self.start_worker(port, ReadingWorker(
+                    port=port, main=self.main_table, journal=self.table_journal, telemetry=self.link_telemetry,
+                    transport=self.transport, journal_drain=self.journal_drain))
 
         if not self.is_timer_started:  # запускаем таймер если он еще не запущен
             self.timer.start(1000)
             self.is_timer_started = True
-        self.reading_thread.start()
+
+    def start_worker(self, key, reading_widget):
+        """Запускает воркер чтения КЛ в отдельном потоке."""
+        reading_thread = QThread(parent=self)
+        reading_widget.moveToThread(reading_thread)
+        reading_widget.link_telemetry.connect(self.update_link_telemetry)
+        reading_widget.manage_table_sortig.connect(self.manage_table_sorting)
+        reading_widget.update_kl_graph_color.connect(self.update_kl_graph_color)
+        reading_widget.update_timer.connect(self.update_kl_graph_timer)
+        reading_widget.update_kl_tests_results.connect(self.update_kl_statistic)
+        reading_widget.update_kl_version.connect(self.update_kl_version)
+        reading_widget.update_current_test.connect(self.update_kl_current_test)
+        reading_widget.update_poll_rates.connect(self.update_kl_poll_rates)
+        reading_widget.save_tests.connect(self.save_tests)
+        reading_widget.save_events.connect(self.save_events)
+        reading_widget.port_connection_error.connect(self.reading_error)
+        reading_thread.started.connect(reading_widget.run)
+        self.reading_threads[key] = reading_thread
+        self.reading_workers[key] = reading_widget
+        reading_thread.start()
 
     def stop_reading(self):
         self.is_reading = False
         self.statistic_widget.btn_start.setText('Старт')
-        self.reading_widget.is_cancelled = True
-        self.reading_thread.quit()
-
-    @pyqtSlot(bool)
-    def reading_error(self, is_error):
+        for key, reading_widget in self.reading_workers.items():
+            reading_widget.is_cancelled = True
+            self.reading_threads[key].quit()
+        self.reading_workers = {}
+        self.reading_threads = {}
+
+    @pyqtSlot(str)
+    def reading_error(self, port):
         self.stop_reading()
         self.label_current_port.setText(': Не выбран')
-        logging.warning('Ошибка. Потеряно соединение с портом.')
-        QMessageBox.warning(self, 'Ошибка  в работе программы "Стенд проверки ИП"', 'Потеряно соединение с портом. Проверьте подключение и повторно начните чтение.')
+        self.update_graph_ports()
+        logging.warning(f'Ошибка. Потеряно соединение с портом {port}.')
+        QMessageBox.warning(self, 'Ошибка  в работе программы "Стенд проверки ИП"', f'Потеряно соединение с портом {port}. Проверьте подключение и повторно начните чтение.')
 
     def fill_journal_table(self, events, is_filtering=False):
         """Заполняет таблицу журнала данными."""
@@ -313,32 +370,53 @@ class MainWindow(QMainWindow):
 
     @pyqtSlot(object)
     def save_tests(self, test):
-        saved_test = save_test_to_db(test)
-        self.fill_main_table([saved_test])
+        self.db_writer.save_tests(test)
 
     @pyqtSlot(object)
     def save_events(self, events):
-        if self.table_journal.rowCount() > 10000:
+        """Ставит пакет событий в очередь записи. Переполненный журнал очищается раньше записи
+        пакета, чтобы очистка не удалила его. Пока очистка не выполнена, новая не ставится."""
+        if self.table_journal.rowCount() > 10000 and not self.is_journal_clearing:
+            self.is_journal_clearing = True
             self.clear_journal()
-        saved_events = save_events_to_db(events)
-        self.fill_journal_table(saved_events)
+        self.db_writer.save_events(events)
+
+    @pyqtSlot(object)
+    def show_saved_events(self, events):
+        """Добавляет в журнал события, сохраненные в БД."""
+        self.fill_journal_table(events)
+
+    @pyqtSlot()
+    def show_cleared_journal(self):
+        """Очищает таблицу журнала после удаления событий из БД."""
+        self.table_journal.setRowCount(0)
+        self.is_journal_clearing = False
+
+    def get_kl_graph(self, port, address):
+        """Возвращает граф КЛ или None, если графов порта уже нет: сигналы остановленных
+        воркеров могут прийти после того, как графы перестроены для других портов."""
+        return self.kl_graph_addresses_dict.get((port, address))
 
-    @QtCore.pyqtSlot(int, str, str)
-    def update_kl_graph_color(self, address, head, body):
+    @QtCore.pyqtSlot(str, int, str, str)
+    def update_kl_graph_color(self, port, address, head, body):
         """Обновляет цвет графа КЛ."""
-        graph = self.kl_graph_addresses_dict[address]
-        graph.update_color(head, body)
+        graph = self.get_kl_graph(port, address)
+        if graph is not None:
+            graph.update_color(head, body)
 
-    @QtCore.pyqtSlot(int, str)
-    def update_kl_graph_timer(self, address, status):
+    @QtCore.pyqtSlot(str, int, str)
+    def update_kl_graph_timer(self, port, address, status):
         """Запускает или останавливает таймер в графе КЛ в зависимости от состояния КЛ."""
-        kl = self.kl_graph_addresses_dict[address]
-        kl.manage_timer(status)
+        kl = self.get_kl_graph(port, address)
+        if kl is not None:
+            kl.manage_timer(status)
 
-    @QtCore.pyqtSlot(int, object)
-    def update_kl_statistic(self, address, statistics):
+    @QtCore.pyqtSlot(str, int, object)
+    def update_kl_statistic(self, port, address, statistics):
         """Обновляет статистику графа КЛ."""
-        kl = self.kl_graph_addresses_dict[address]
+        kl = self.get_kl_graph(port, address)
+        if kl is None:
+            return
         statistics_difference = kl.get_statistics_difference(statistics)
         kl.statistics = statistics
         kl.update_statistics()
@@ -348,73 +426,77 @@ class MainWindow(QMainWindow):
     def update_total_kl_statistics(self, statistics_difference):
         """Обновляет общую статистику по всем КЛ."""
         self.statistic_widget.update_statistics(statistics_difference)
-        save_report_to_db(self.statistic_widget.statistics)
+        self.db_writer.save_report(self.statistic_widget.statistics)
 
-    @QtCore.pyqtSlot(int, int)
-    def update_kl_version(self, address, version):
+    @QtCore.pyqtSlot(str, int, int)
+    def update_kl_version(self, port, address, version):
         """Обновляет версию КЛ."""
-        kl = self.kl_graph_addresses_dict[address]
-        kl.label_version.setText(f'версия: {version}')
+        kl = self.get_kl_graph(port, address)
+        if kl is not None:
+            kl.label_version.setText(f'версия: {version}')
 
-    @QtCore.pyqtSlot(int, int)
-    def update_kl_current_test(self, address, current_test):
+    @QtCore.pyqtSlot(str, int, int)
+    def update_kl_current_test(self, port, address, current_test):
         """Обновляет текущий тест КЛ."""
-        kl = self.kl_graph_addresses_dict[address]
-        kl.label_current_test.setText(f'Выполняемый тест: {current_test}')
+        kl = self.get_kl_graph(port, address)
+        if kl is not None:
+            kl.label_current_test.setText(f'Выполняемый тест: {current_test}')
+
+    @QtCore.pyqtSlot(str, object)
+    def update_kl_poll_rates(self, port, rates):
+        """Обновляет целевую и фактическую частоту опроса КЛ порта."""
+        for address, (target_rate, achieved_rate) in rates.items():
+            kl = self.get_kl_graph(port, address)
+            if kl is not None:
+                kl.set_poll_rates(target_rate, achieved_rate)
 
     def set_statusbar_time(self):
         """Устанавливает значения таймера на статус-панели."""
         self.statusbar_time = self.statusbar_time.addSecs(1)
         self.label_session_time.setText(self.statusbar_time.toString('HH:mm:ss'))
 
-    @QtCore.pyqtSlot(int, int)
-    def set_rec_trans_data(self, trans, rec):
-        """Обновляет количество переданных и полученных пакетов."""
-        self.total_trans_packets_count += trans
-        self.total_rec_packets_count += rec
-        self.label_trans_packets.setText(f'Передано:  {self.total_trans_packets_count}')
-        self.label_rec_packets.setText(f'Получено:  {self.total_rec_packets_count}')
-
-    @QtCore.pyqtSlot(str)
-    def get_rx_tx_blink(self, text):
-        """Принимает сигнал Rx и Tx."""
-        if text == 'Rx':
-            if self.rx_color == 'w':
-                self.rx_tx_blink('Rx_blink')
-                QtCore.QTimer.singleShot(
-                    500, lambda: self.rx_tx_blink('Rx_white'))
-        elif text == 'Tx':
-            if self.tx_color == 'w':
-                self.rx_tx_blink('Tx_blink')
-                QtCore.QTimer.singleShot(
-                    500, lambda: self.rx_tx_blink('Tx_white'))
-
-    def rx_tx_blink(self, text):
-        """Запускает мигание индикаторов Rx и Tx."""
-        if text == 'Rx_blink':
-            self.rx.setStyleSheet(rx_stylesheet)
-            self.rx_color = 'g'
-        elif text == 'Tx_blink':
-            self.tx.setStyleSheet(tx_stylesheet)
-            self.tx_color = 'r'
-        elif text == 'Rx_white':
-            self.rx.setStyleSheet(rx_tx_white_stylesheet)
-            self.rx_color = 'w'
-        elif text == 'Tx_white':
-            self.tx.setStyleSheet(rx_tx_white_stylesheet)
-            self.tx_color = 'w'
+    @QtCore.pyqtSlot(str, object)
+    def update_link_telemetry(self, port, snapshot):
+        """Обновляет статус-панель по сводке обмена с портом."""
+        self.link_snapshots[port] = snapshot
+        snapshots = self.link_snapshots.values()
+        requests = sum(snapshot.requests for snapshot in snapshots)
+        responses = sum(snapshot.responses for snapshot in snapshots)
+        timeouts = sum(snapshot.timeouts for snapshot in snapshots)
+        crc_errors = sum(snapshot.crc_errors for snapshot in snapshots)
+        illegal_responses = sum(snapshot.illegal_responses for snapshot in snapshots)
+        errors = sum(snapshot.errors for snapshot in snapshots)
+        self.label_trans_packets.setText(f'Передано:  {requests}')
+        self.label_trans_packets.setToolTip(f'{sum(snapshot.bytes_sent for snapshot in snapshots)} байт')
+        self.label_rec_packets.setText(f'Получено:  {responses}')
+        self.label_rec_packets.setToolTip(f'{sum(snapshot.bytes_received for snapshot in snapshots)} байт')
+        self.label_link_errors.setText(f'Ошибки:  {timeouts + crc_errors + illegal_responses + errors}')
+        self.label_link_errors.setToolTip(
+            f'Нет ответа: {timeouts}\nПоврежденный ответ: {crc_errors}\n'
+            f'Ответ-исключение: {illegal_responses}\nОшибки порта: {errors}')
+        self.set_rx_tx_indicators(
+            any(snapshot.tx_active for snapshot in snapshots), any(snapshot.rx_active for snapshot in snapshots))
+
+    def set_rx_tx_indicators(self, tx_active, rx_active):
+        """Включает индикаторы Rx и Tx, если с прошлой сводки был обмен."""
+        rx_color = 'g' if rx_active else 'w'
+        if rx_color != self.rx_color:
+            self.rx.setStyleSheet(rx_stylesheet if rx_active else rx_tx_white_stylesheet)
+            self.rx_color = rx_color
+        tx_color = 'r' if tx_active else 'w'
+        if tx_color != self.tx_color:
+            self.tx.setStyleSheet(tx_stylesheet if tx_active else rx_tx_white_stylesheet)
+            self.tx_color = tx_color
 
     def clear_main_table(self):
         """Очищает главную таблицу и архивирует все тесты."""
         logging.info('Архивирование всех тестов из таблицы')
-        archive_test_db()
-        self.main_table.setRowCount(0)
+        self.db_writer.archive_tests()  # таблица очищается после архивирования (tests_archived)
 
     def clear_journal(self):
         """Очищает таблицу журанала и удаляет все события из БД."""
         logging.info('Удаление всех событий журнала из БД')
-        clear_events_db()
-        self.table_journal.setRowCount(0)
+        self.db_writer.clear_events()  # таблица очищается после удаления (events_cleared)
 
     @pyqtSlot(str, bool)
     def manage_table_sorting(self, table, is_enabled):
@@ -429,6 +511,17 @@ class MainWindow(QMainWindow):
         self.journal_toolbar.layout_filters.filter_event_code.clear()  # обновляем данные в комбобоксе фильтрации кода события
         self.journal_toolbar.layout_filters.filter_event_code.addItems(get_events_codes())
 
+    def show_link_quality(self):
+        modal_dialog = LinkQualityDialog(self)
+        modal_dialog.show()
+        modal_dialog.exec_()
+
+    def get_link_quality_rows(self):
+        """Возвращает статистику качества связи по всем портам."""
+        return [
+            {'port': port, **row}
+            for port, telemetry in sorted(self.link_telemetry.items()) for row in telemetry.quality.get_rows()]
+
     def select_report_period(self, table):
         modal_dialog = SelectReportPeriodDialog(self)
         modal_dialog.show()
@@ -457,6 +550,8 @@ class MainWindow(QMainWindow):
                     write_tests_results_to_file(filename, period, is_error_flag)
                 elif table == REPORT_FOR_PERIOD:
                     write_report_for_period_to_file(filename, period)
+                elif table == LINK_QUALITY:
+                    write_link_quality_to_file(filename, self.get_link_quality_rows())
                 remember_save_file_path(filename, table)
                 logging.info(f'Файл по адресу {filename} успешно создан')
                 QMessageBox.information(self, 'Успешно', f'Файл по адресу {filename} успешно создан')
@@ -482,8 +577,7 @@ class MainWindow(QMainWindow):
         """Фильтрует данные в таблице."""
         logging.info('Старт фильтрации журнала')
         self.table_journal.setSortingEnabled(False)
-        session = get_session()
-        result = session.query(Event)
+        result = Query(Event)  # запрос выполняется в сессии потока после применения фильтров
         if (
             self.journal_toolbar.layout_filters.checkbox_kl.isChecked()
             and self.journal_toolbar.layout_filters.filter_kl.text() != ''
@@ -498,8 +592,10 @@ class MainWindow(QMainWindow):
             code = int(self.journal_toolbar.layout_filters.filter_event_code.currentText().split(' ', 1)[0])
             result = result.filter(Event.event_code == code)
 
+        with session_scope() as session:
+            events = result.with_session(session).all()
         self.table_journal.setRowCount(0)
-        self.fill_journal_table(result.all(), is_filtering=True)
+        self.fill_journal_table(events, is_filtering=True)
         self.journal_toolbar.btn_filter.setEnabled(False)
         self.table_journal.setSortingEnabled(True)
         logging.info('Фильтры журнала успешно применены')
@@ -508,8 +604,7 @@ class MainWindow(QMainWindow):
         """Фильтрует данные в главной таблице."""
         logging.info('Старт фильтрации тестов')
         self.table_journal.setSortingEnabled(False)
-        session = get_session()
-        result = session.query(Test).filter(not_(Test.is_archived))
+        result = Query(Test).filter(not_(Test.is_archived))
 
         if (
             self.main_table_toolbar.layout_filters.checkbox_kl.isChecked()
@@ -531,8 +626,10 @@ class MainWindow(QMainWindow):
         ):
             result = result.filter(Test.device_type == self.main_table_toolbar.layout_filters.filter_device_type.currentText())
 
+        with session_scope() as session:
+            tests = result.order_by(Test.number).with_session(session).all()
         self.main_table.setRowCount(0)
-        self.fill_main_table(result.all())
+        self.fill_main_table(tests)
         self.main_table_toolbar.btn_filter.setEnabled(False)
         self.main_table.setSortingEnabled(True)
         logging.info('Фильтры тестов успешно применены')
@@ -0,0 +1,17 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from modbus.ports import port_registry
+
+
+class PortRegistryNotifier(QObject):
+    """Передает изменения списка портов из фонового потока PortRegistry в главный поток."""
+    ports_changed = pyqtSignal(object)  # список имен портов
+
+    def __init__(self, registry=port_registry):
+        super().__init__()
+        self.registry = registry
+        self.callback = self.ports_changed.emit
+        registry.subscribe(self.callback)
+
+    def close(self):
+        self.registry.unsubscribe(self.callback)
@@ -8,15 +8,12 @@ from PyQt5.QtGui import QColor
 from PyQt5.QtWidgets import QTableWidgetItem
 
 from db.models import Event
+from db.session import session_scope
 from db.utils import (get_error_tests_for_period, get_reports_for_period,
-                      get_session, get_tests_for_period, get_unarchived_tests)
-from gui.event_codes import get_codes_dictionary, get_error_dictionary
-
-try:
-    codes_dictionary = get_codes_dictionary()
-    errors_dictionary = get_error_dictionary()
-except Exception:
-    print('ошибка')
+                      get_tests_for_period, get_unarchived_tests)
+from gui.constants import LINK_QUALITY_COLUMNS
+from gui.event_codes import codes_dictionary
+from modbus.register_maps import format_exit_code_3
 
 
 BASE_DIR = Path(__file__).parent.parent
@@ -58,7 +55,8 @@ def add_rows_main_table(table, tests):
     """Заполняет таблицу результатов тестов."""
     for test in tests:
         params = [
-            test.kl, test.exit_code_1, test.exit_code_2, test.exit_code_3, test.ready_time,
+            test.kl, test.exit_code_1, test.exit_code_2,
+            format_exit_code_3(test.exit_code_1, test.exit_code_2, test.exit_code_3), test.ready_time,
             test.device_version, test.sb_duration, test.electricity_sb, test.average_electricity,
             test.temperature, test.Uv, test.Us, test.Un, test.Cv, test.Cs, test.Cn,
             test.charge_electricity_current, test.discharge_rate_upper_ionistor,
@@ -80,15 +78,6 @@ def add_rows_main_table(table, tests):
             table.setItem(0, i, item)
             i += 1
 
-        # если код 1.2 == 7.3 или 7.4 или 9.2 или 9.3
-        # тогда к значению кода 3 нужно дописать нули, если его длина меньше 3 символов
-        str_code_1_2 = f'{test.exit_code_1}{test.exit_code_2}'
-        if str_code_1_2 in ('73', '74', '92', '93'):
-            str_code_3 = '0' * (3 - len(str(test.exit_code_3))) + str(test.exit_code_3)
-            code_3_item = QTableWidgetItem()
-            code_3_item.setData(Qt.EditRole, QVariant(str_code_3))
-            table.setItem(0, 5, code_3_item)
-
         device_type = QTableWidgetItem()
         device_type.setData(Qt.EditRole, QVariant(test.device_type))
         table.setItem(0, 7, device_type)
@@ -124,7 +113,7 @@ def add_rows_main_table(table, tests):
             table.item(0, j).setBackground(color)
 
 
-def write_journal_to_file(filename, session=get_session()):
+def write_journal_to_file(filename):
     """Записывает журнал событий в эксель-файл."""
     new_workbook = Workbook()
     new_workbook.save(filename)
@@ -132,7 +121,9 @@ def write_journal_to_file(filename, session=get_session()):
     sheet = workbook.worksheets[0]
     columns_names = ['№', 'Дата и время', 'КЛ', 'Номер входа', 'АУ', 'Код события', 'Доп. параметр', 'Описание']
     sheet.append(columns_names)
-    for event in session.query(Event).all():
+    with session_scope() as session:
+        events = session.query(Event).all()
+    for event in events:
         line = [
             event.number, event.date_time.strftime('%Y.%m.%d %H:%M:%S'), event.kl,
             event.entry_number, event.au_address, event.event_code,
@@ -151,6 +142,22 @@ def write_journal_to_file(filename, session=get_session()):
     session.close()
 
 
+def write_link_quality_to_file(filename, rows):
+    """Записывает статистику качества связи с КЛ в эксель-файл."""
+    workbook = Workbook()
+    sheet = workbook.worksheets[0]
+    sheet.append([name for name, _ in LINK_QUALITY_COLUMNS])
+    for row in rows:
+        sheet.append([
+            round(row[key], 2) if isinstance(row[key], float) else row[key] for _, key in LINK_QUALITY_COLUMNS])
+    sheet.column_dimensions['C'].width = 22
+    for row in list(sheet.rows):
+        for cell in row:
+            cell.alignment = Alignment(horizontal='center')
+    workbook.save(filename)
+    workbook.close()
+
+
 def write_tests_results_to_file(filename, period=None, is_error_flag=False):
     """Записывает результаты тестов в 'эксель-файл."""
     new_workbook = Workbook()
@@ -199,11 +206,7 @@ def write_tests_results_to_file(filename, period=None, is_error_flag=False):
             tests = get_tests_for_period(period)
 
     for test in tests:
-        str_code_1_2 = f'{test.exit_code_1}{test.exit_code_2}'
-        if str_code_1_2 in ('73', '74', '92', '93'):
-            str_code_3 = '0' * (3 - len(str(test.exit_code_3))) + str(test.exit_code_3)
-        else:
-            str_code_3 = test.exit_code_3
+        str_code_3 = format_exit_code_3(test.exit_code_1, test.exit_code_2, test.exit_code_3)
         params = [
             test.kl, test.exit_code_1, test.exit_code_2, str_code_3, test.ready_time,
             test.device_type, test.device_version, test.sb_duration, test.electricity_sb,
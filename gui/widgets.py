@@ -9,6 +9,7 @@ from PyQt5.QtWidgets import (QAbstractItemView, QBoxLayout, QCheckBox,
 from db.models import Report
 from gui.styles import (AlignCenterDelegate, AlignLeftDelegate, font_bold_11,
                         kl_adress_font)
+from modbus.constants import KL_ADDRESSES
 
 
 class StatisticWidget(QWidget):
@@ -312,33 +313,31 @@ class GraphWidget(QWidget):
         self.central_widget.setLayout(self.layout_graph)
         self.scrolled_area.setWidget(self.central_widget)
         self.main_layout.addWidget(self.scrolled_area)
-
-        # конфигрурация виджета графа
-        self.graph_kl_1 = KLGraphWidget(1)
-        self.graph_kl_2 = KLGraphWidget(2)
-        self.graph_kl_3 = KLGraphWidget(3)
-        self.graph_kl_4 = KLGraphWidget(4)
-        self.graph_kl_5 = KLGraphWidget(5)
-        self.graph_kl_6 = KLGraphWidget(6)
-        self.graph_kl_7 = KLGraphWidget(7)
-        self.graph_kl_8 = KLGraphWidget(8)
-        self.graph_kl_9 = KLGraphWidget(9)
-        self.graph_kl_10 = KLGraphWidget(10)
-        self.graph_kl_11 = KLGraphWidget(11)
-        self.graph_kl_12 = KLGraphWidget(12)
-        self.graph_kl_13 = KLGraphWidget(13)
-        self.graph_kl_14 = KLGraphWidget(14)
-        self.graph_kl_15 = KLGraphWidget(15)
-        self.graph_kl_16 = KLGraphWidget(16)
-        graphs = [
-            self.graph_kl_1, self.graph_kl_2, self.graph_kl_3, self.graph_kl_4,
-            self.graph_kl_5, self.graph_kl_6, self.graph_kl_7, self.graph_kl_8,
-            self.graph_kl_9, self.graph_kl_10, self.graph_kl_11, self.graph_kl_12,
-            self.graph_kl_13, self.graph_kl_14, self.graph_kl_15, self.graph_kl_16
-        ]
-        positions = [(i, j) for i in range(1, 5) for j in range(1, 5)]
-        for position, graph in zip(positions, graphs):
-            self.layout_graph.addWidget(graph, *position)
+        self.graphs = {}  # (порт, адрес КЛ) -> граф КЛ
+        self.port_labels = []
+
+    def set_ports(self, ports):
+        """Создает графы КЛ с адресами 1-16 для каждого порта (линии RS-485).
+        Если порт один, заголовок линии не выводится."""
+        for widget in list(self.graphs.values()) + self.port_labels:
+            self.layout_graph.removeWidget(widget)
+            widget.deleteLater()
+        self.graphs = {}
+        self.port_labels = []
+
+        row = 1
+        for port in ports:
+            if len(ports) > 1:
+                label_port = QLabel(f'Порт: {port}')
+                label_port.setStyleSheet(kl_adress_font)
+                self.layout_graph.addWidget(label_port, row, 1, 1, 4)
+                self.port_labels.append(label_port)
+                row += 1
+            for i, address in enumerate(KL_ADDRESSES):
+                graph = KLGraphWidget(address)
+                self.graphs[(port, address)] = graph
+                self.layout_graph.addWidget(graph, row + i // 4, 1 + i % 4)
+            row += (len(KL_ADDRESSES) + 3) // 4
 
 
 class KLGraphWidget(QWidget):
@@ -511,6 +510,10 @@ class KLGraphWidget(QWidget):
         self.time = self.time.addSecs(1)
         self.label_time.setText(self.time.toString('HH:mm:ss'))
 
+    def set_poll_rates(self, target_rate, achieved_rate):
+        """Выводит в подсказке графа целевую и фактическую частоту опроса КЛ."""
+        self.setToolTip(f'Частота опроса: целевая {target_rate:.1f} Гц, фактическая {achieved_rate:.1f} Гц')
+
     def update_color(self, head, body):
         self.setStyleSheet(f'background-color: {body}')
         self.name_version_widget.setStyleSheet(f'background-color: {head}')
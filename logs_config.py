@@ -7,11 +7,11 @@ LOG_FORMAT = '"%(asctime)s - [%(levelname)s] - %(message)s"'
 DT_FORMAT = '%d.%m.%Y %H:%M:%S'
 
 
-def config_logs():
-    """Конфигурирует логирование."""
+def config_logs(file_name='kl.log'):
+    """Конфигурирует логирование. file_name - имя файла журнала в каталоге logs."""
     log_dir = BASE_DIR / 'logs'
     log_dir.mkdir(exist_ok=True)
-    log_file = log_dir / 'kl.log'
+    log_file = log_dir / file_name
 
     rotating_handler = RotatingFileHandler(
         log_file,
@@ -23,5 +23,6 @@ def config_logs():
         datefmt=DT_FORMAT,
         format=LOG_FORMAT,
         level=logging.INFO,
-        handlers=(rotating_handler, logging.StreamHandler())
+        handlers=(rotating_handler, logging.StreamHandler()),
+        force=True  # словари событий загружаются при импорте и уже пишут в журнал
     )
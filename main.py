@@ -1,4 +1,6 @@
+import argparse
 import logging
+import multiprocessing
 import sys
 
 from PyQt5.QtCore import QLocale, QTranslator
@@ -6,10 +8,15 @@ from PyQt5.QtWidgets import QApplication, QMessageBox
 
 from gui.main_window import MainWindow
 from logs_config import config_logs
+from modbus.constants import (JOURNAL_DRAIN_MODES, POLLING_ENGINES,
+                              PYMODBUS_TRANSPORT, SEPARATE_DRAIN,
+                              SERIAL_TRANSPORTS, SYNC_ENGINE)
 
 if __name__ == '__main__':
     import traceback
 
+    multiprocessing.freeze_support()  # процесс опроса движка process в собранной программе
+
     def excepthook(exc_type, exc_value, exc_tb):
         """Выводит сообщение об ошибке в случае краша главного окна."""
         tb = "".join(traceback.format_exception(exc_type, exc_value, exc_tb))
@@ -20,12 +27,27 @@ if __name__ == '__main__':
         )
         QApplication.quit()
 
+    parser = argparse.ArgumentParser(description='Стенд проверки ИП')
+    parser.add_argument(
+        '--engine', choices=POLLING_ENGINES, default=SYNC_ENGINE,
+        help='движок опроса КЛ: sync - поток на каждый порт, asyncio - один цикл событий на все порты, '
+             'process - опрос в отдельном процессе, не зависящий от загрузки интерфейса')
+    parser.add_argument(
+        '--transport', choices=SERIAL_TRANSPORTS, default=PYMODBUS_TRANSPORT,
+        help='клиент Modbus RTU движков sync и process: pymodbus или rtu - конец ответа по длине кадра и паузе 3.5 символа')
+    parser.add_argument(
+        '--journal-drain', choices=JOURNAL_DRAIN_MODES, default=SEPARATE_DRAIN,
+        help='чтение журнала КЛ: separate - количество записей и пакет отдельными запросами, '
+             'combined - одним запросом с регистра 0 (вдвое меньше запросов при большом журнале)')
+    args, qt_args = parser.parse_known_args()
+
     config_logs()
-    logging.info('Старт работы программы')
+    logging.info(f'Старт работы программы, движок опроса: {args.engine}, транспорт: {args.transport}, '
+                 f'чтение журнала: {args.journal_drain}')
 
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setStyle('Fusion')
     sys.excepthook = excepthook
-    main_window = MainWindow()
+    main_window = MainWindow(engine=args.engine, transport=args.transport, journal_drain=args.journal_drain)
     main_window.show()
     sys.exit(app.exec_())
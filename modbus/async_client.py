@@ -0,0 +1,102 @@
+import asyncio
+from time import monotonic
+
+from modbus.exceptions import NoResponseException
+from modbus.rtu import (ReadRegistersResponse, build_read_registers_request,
+                        get_expected_length, get_silent_interval,
+                        parse_read_registers_response)
+
+try:
+    import serial_asyncio
+except ImportError:
+    serial_asyncio = None
+
+
+class RtuClientProtocol(asyncio.Protocol):
+    """Протокол asyncio, собирающий кадр ответа Modbus RTU ожидаемой длины."""
+    def __init__(self):
+        self.transport = None
+        self.buffer = bytearray()
+        self.waiter = None
+        self.count = 0
+        self.is_connected = False
+        self.connection_made_event = asyncio.Event()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.is_connected = True
+        self.connection_made_event.set()
+
+    def connection_lost(self, exc):
+        self.is_connected = False
+        if self.waiter and not self.waiter.done():
+            self.waiter.set_exception(ConnectionError(f'Соединение с портом потеряно: {exc}'))
+
+    def data_received(self, data):
+        if not self.waiter or self.waiter.done():
+            return  # опоздавший ответ на запрос, по которому истек таймаут
+        self.buffer.extend(data)
+        if len(self.buffer) >= 2 and len(self.buffer) >= get_expected_length(self.buffer, self.count):
+            self.waiter.set_result(bytes(self.buffer))
+
+    def expect_response(self, count):
+        """Готовит ожидание ответа на чтение count регистров."""
+        self.buffer.clear()
+        self.count = count
+        self.waiter = asyncio.get_running_loop().create_future()
+        return self.waiter
+
+
+class AsyncRtuClient:
+    """Асинхронный клиент Modbus RTU для одного последовательного порта.
+    Запросы на одной линии RS-485 выполняются строго по очереди."""
+    def __init__(self, port, baudrate, bytesize, parity, stopbits, timeout):
+        self.port = port
+        self.serial_settings = dict(baudrate=baudrate, bytesize=bytesize, parity=parity, stopbits=stopbits)
+        self.timeout = timeout
+        self.protocol = None
+        self.lock = asyncio.Lock()
+        self.silent_interval = get_silent_interval(baudrate, bytesize, parity, stopbits)
+        self.last_frame_end = 0
+
+    @property
+    def is_connected(self):
+        return self.protocol is not None and self.protocol.is_connected
+
+    async def connect(self):
+        """Открывает порт. Возвращает True при успешном подключении."""
+        if serial_asyncio is None:
+            raise ImportError('Для асинхронного опроса требуется пакет pyserial-asyncio')
+        if self.is_connected:
+            return True
+        try:
+            _, self.protocol = await serial_asyncio.create_serial_connection(
+                asyncio.get_running_loop(), RtuClientProtocol, self.port, **self.serial_settings)
+            await self.protocol.connection_made_event.wait()
+        except Exception:
+            self.protocol = None
+            return False
+        return True
+
+    def close(self):
+        if self.is_connected:
+            self.protocol.transport.close()
+        self.protocol = None
+
+    async def read_holding_registers(self, address, count, unit):
+        """Читает count регистров начиная с address из КЛ с адресом unit."""
+        if not self.is_connected:
+            raise ConnectionError(f'Порт {self.port} не открыт')
+        async with self.lock:
+            pause = self.last_frame_end + self.silent_interval - monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            waiter = self.protocol.expect_response(count)
+            self.protocol.transport.write(build_read_registers_request(unit, address, count))
+            try:
+                frame = await asyncio.wait_for(waiter, self.timeout)
+            except asyncio.TimeoutError:
+                raise NoResponseException(f'КЛ {unit} не ответил за {self.timeout} с')
+            finally:
+                self.last_frame_end = monotonic()
+        return ReadRegistersResponse(parse_read_registers_response(frame, unit, count))
@@ -0,0 +1,84 @@
+KL_ADDRESSES = range(1, 17)  # адреса КЛ на одной линии RS-485
+KL_IDENTIFIER = 101  # значение регистра 976, по которому опознается КЛ
+
+# фоновый поиск КЛ
+DISCOVERY_PROBES_PER_CYCLE = 2  # сколько отсутствующих адресов проверять за цикл опроса
+DISCOVERY_MIN_DELAY = 1  # сек, интервал повторной проверки адреса после первой неудачи
+DISCOVERY_MAX_DELAY = 10  # сек, предельный интервал проверки адреса (время обнаружения нового КЛ)
+
+# параметры линии RS-485
+SERIAL_SETTINGS = dict(stopbits=2, bytesize=8, parity='N', baudrate=19200, timeout=0.1)
+
+# движки опроса
+SYNC_ENGINE = 'sync'  # поток на каждый порт, блокирующий клиент pymodbus
+ASYNC_ENGINE = 'asyncio'  # один поток и цикл событий asyncio на все порты
+PROCESS_ENGINE = 'process'  # опрос в отдельном процессе, результаты через разделяемую память
+POLLING_ENGINES = (SYNC_ENGINE, ASYNC_ENGINE, PROCESS_ENGINE)
+# транспорт синхронного движка
+PYMODBUS_TRANSPORT = 'pymodbus'  # клиент pymodbus, конец ответа может определяться по таймауту
+RTU_TRANSPORT = 'rtu'  # собственный клиент, конец ответа по ожидаемой длине и паузе 3.5 символа
+SERIAL_TRANSPORTS = (PYMODBUS_TRANSPORT, RTU_TRANSPORT)
+# сек, наименьшая пауза внутри ответа, после которой кадр считается оборванным: USB-преобразователи
+# и планировщик ОС передают байты пачками, поэтому паузу в 3.5 символа на высоких скоростях не отличить
+RTU_FRAME_GAP_MIN = 0.005
+PORT_RECONNECT_ATTEMPTS = 10
+PORT_RECONNECT_DELAY = 1  # сек, между попытками открыть порт
+
+# линии за преобразователями RS-485 - Ethernet (modbus/tcp.py)
+MODBUS_TCP_SCHEME = 'tcp'  # tcp://хост:порт - Modbus TCP
+RTU_OVER_TCP_SCHEME = 'rtu+tcp'  # rtu+tcp://хост:порт - кадры Modbus RTU поверх TCP
+MODBUS_TCP_PORT = 502
+TCP_CONNECT_TIMEOUT = 1  # сек
+NETWORK_PORTS_ENV = 'STAND_NETWORK_PORTS'  # адреса линий за шлюзами через запятую для окна выбора портов
+
+PORT_SCAN_INTERVAL = 1  # сек, период перечисления COM-портов в фоне (modbus/ports.py)
+PORT_AVAILABILITY_TTL = 5  # сек, сколько действителен результат проверки занятости порта
+CONNECTION_LOST_TIMEOUTS = 10  # таймаутов подряд от всех КЛ порта, после которых порт переоткрывается
+
+# адаптивный опрос КЛ, интервалы в секундах
+POLL_INTERVAL_RUNNING = 0.2  # идет тест (код состояния 1) или в журнале есть записи
+POLL_INTERVAL_PAUSED = 1  # тест приостановлен (коды состояния 2-5)
+POLL_INTERVAL_IDLE = 3  # КЛ простаивает
+POLL_MAX_INTERVAL = 5  # ни один КЛ не ждет опроса дольше этого времени
+POLL_RATES_PUBLISH_INTERVAL = 1  # как часто передавать частоты опроса в главное окно
+
+# имитатор КЛ (modbus/simulator.py)
+SIMULATOR_PORT_PREFIX = 'SIM'  # порты с таким префиксом обслуживаются имитатором внутри процесса
+SIMULATOR_PORTS_ENV = 'STAND_SIMULATED_PORTS'  # имена имитируемых портов через запятую для окна выбора портов
+SIMULATOR_EVENT_RATE = 1  # событий в секунду на один КЛ
+SIMULATOR_TEST_RATE = 0.05  # завершенных тестов в секунду на один КЛ
+SIMULATOR_ERROR_RATIO = 0.1  # доля тестов, завершенных с ошибкой
+SIMULATOR_LATENCY = 0.005  # сек, время обработки запроса в КЛ
+JOURNAL_CAPACITY = 1000  # событий, при переполнении журнала КЛ старые записи теряются
+JOURNAL_WINDOW_REGISTERS = 124  # регистров журнала в одном пакете (по 2 регистра на событие)
+JOURNAL_COUNT_REGISTER = 0  # количество записей журнала, его чтение подтверждает прошлый пакет
+
+# чтение журнала КЛ
+SEPARATE_DRAIN = 'separate'  # количество записей и пакет событий читаются отдельными запросами
+COMBINED_DRAIN = 'combined'  # количество записей и следующий пакет событий читаются одним запросом с регистра 0
+JOURNAL_DRAIN_MODES = (SEPARATE_DRAIN, COMBINED_DRAIN)
+
+# телеметрия линии
+TELEMETRY_PUBLISH_INTERVAL = 0.1  # сек, частота передачи сводки обмена в главное окно (10 Гц)
+
+# движок process (modbus/process_poller.py)
+PROCESS_RING_CAPACITY = 1024  # записей в кольцевом буфере одного порта
+PROCESS_RING_POLL_INTERVAL = 0.01  # сек, пауза главного процесса, если буферы пусты
+PROCESS_RING_FULL_DELAY = 0.01  # сек, пауза опроса, пока главный процесс не освободит место в буфере
+PROCESS_STOP_TIMEOUT = 5  # сек, после остановки процесс опроса завершается принудительно
+PROCESS_WATCH_INTERVAL = 0.5  # сек, как часто процесс опроса проверяет, что главный процесс работает
+QUALITY_PUBLISH_INTERVAL = 1  # сек, как часто процесс опроса передает статистику качества связи
+PROCESS_LOG_FILE = 'kl_poller.log'  # журнал процесса опроса в каталоге logs
+
+# гистограммы задержек обмена (modbus/histogram.py)
+HISTOGRAM_MIN_VALUE = 0.0001  # сек, нижняя граница первого интервала
+HISTOGRAM_MAX_VALUE = 10  # сек, значения больше попадают в последний интервал
+HISTOGRAM_SUB_BUCKETS = 16  # интервалов на каждое удвоение задержки, погрешность не больше 1/16
+
+# адаптивный таймаут ответа КЛ (modbus/timeouts.py), время обработки запроса в КЛ без передачи по линии
+RESPONSE_TIMEOUT_MIN = 0.01  # сек
+RESPONSE_TIMEOUT_MAX = SERIAL_SETTINGS['timeout']  # сек, до первых измерений таймаут равен максимальному
+RESPONSE_TIMEOUT_RESOLUTION = 0.005  # сек, шаг изменения таймаута порта
+CRC_ERROR_RETRIES = 2  # повторов после поврежденного ответа: КЛ на связи, помехи на линии
+TIMEOUT_RETRIES = 1  # повторов после таймаута КЛ, который раньше отвечал
+DEVICE_GONE_TIMEOUTS = 3  # таймаутов подряд, после которых КЛ считается отключенным
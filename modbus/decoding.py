@@ -0,0 +1,39 @@
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+EVENT_REGISTERS_COUNT = 2  # каждое событие журнала занимает 2 регистра (4 байта)
+NUMPY_MIN_EVENTS = 128  # на одном пакете (до 62 событий) struct быстрее numpy
+
+
+def split_register(value):
+    """Возвращает старший и младший байты регистра."""
+    return value >> 8, value & 0xFF
+
+
+def pack_registers(registers_values):
+    """Упаковывает значения регистров в байты в порядке передачи по Modbus."""
+    return struct.pack(f'>{len(registers_values)}H', *registers_values)
+
+
+def decode_events(registers_values):
+    """Разбирает значения регистров журнала на события.
+    Возвращает список кортежей (номер входа, адрес АУ, код события, доп. параметр).
+    Байты события: номер входа, адрес АУ, доп. параметр, код события."""
+    events_count = len(registers_values) // EVENT_REGISTERS_COUNT
+    if numpy is not None and events_count >= NUMPY_MIN_EVENTS:
+        return decode_events_numpy(registers_values[:events_count * EVENT_REGISTERS_COUNT])
+    data = pack_registers(registers_values[:events_count * EVENT_REGISTERS_COUNT])
+    return [
+        (entry_number, au_address, event_code, addit_param)
+        for entry_number, au_address, addit_param, event_code in struct.iter_unpack('4B', data)
+    ]
+
+
+def decode_events_numpy(registers_values):
+    """Векторный разбор событий журнала через numpy для длинных буферов."""
+    events_bytes = numpy.frombuffer(pack_registers(registers_values), dtype=numpy.uint8).reshape(-1, 4)
+    return list(zip(*events_bytes.T[[0, 1, 3, 2]].tolist()))
@@ -0,0 +1,62 @@
+from time import monotonic
+
+from modbus.constants import (DISCOVERY_MAX_DELAY, DISCOVERY_MIN_DELAY,
+                              DISCOVERY_PROBES_PER_CYCLE, KL_ADDRESSES)
+
+
+class DiscoveryScheduler:
+    """Планировщик фонового поиска КЛ.
+
+    За один цикл опроса проверяется не более probes_per_cycle отсутствующих
+    адресов. После каждой неудачной проверки интервал до следующей проверки
+    адреса удваивается, но не превышает max_delay. Поэтому новый КЛ будет
+    обнаружен не позже чем через max_delay плюс время, за которое очередь
+    дойдет до его адреса (len(addresses) / probes_per_cycle циклов).
+    """
+    def __init__(self, addresses=KL_ADDRESSES, probes_per_cycle=DISCOVERY_PROBES_PER_CYCLE,
+                 min_delay=DISCOVERY_MIN_DELAY, max_delay=DISCOVERY_MAX_DELAY):
+        self.probes_per_cycle = probes_per_cycle
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        now = monotonic()
+        self.delays = {address: min_delay for address in addresses}
+        self.next_probe_time = {address: now for address in addresses}
+
+    def get_addresses_to_probe(self, active_devices, now=None):
+        """Возвращает отсутствующие адреса, которые нужно проверить в текущем цикле."""
+        if now is None:
+            now = monotonic()
+        due_addresses = [
+            address for address, probe_time in self.next_probe_time.items()
+            if address not in active_devices and probe_time <= now
+        ]
+        due_addresses.sort(key=self.next_probe_time.get)
+        return due_addresses[:self.probes_per_cycle]
+
+    def get_next_probe_delay(self, active_devices, now=None):
+        """Возвращает время в секундах до ближайшей проверки отсутствующего адреса."""
+        if now is None:
+            now = monotonic()
+        probe_times = [
+            probe_time for address, probe_time in self.next_probe_time.items() if address not in active_devices]
+        if not probe_times:
+            return self.max_delay
+        return max(min(probe_times) - now, 0)
+
+    def mark_absent(self, address, now=None):
+        """Откладывает следующую проверку адреса, на котором КЛ не ответил."""
+        if now is None:
+            now = monotonic()
+        self.next_probe_time[address] = now + self.delays[address]
+        self.delays[address] = min(self.delays[address] * 2, self.max_delay)
+
+    def mark_found(self, address):
+        """Сбрасывает интервал проверки для найденного КЛ."""
+        self.delays[address] = self.min_delay
+
+    def mark_lost(self, address, now=None):
+        """КЛ перестал отвечать: его адрес снова проверяется с минимальным интервалом."""
+        if now is None:
+            now = monotonic()
+        self.delays[address] = self.min_delay
+        self.next_probe_time[address] = now + self.min_delay
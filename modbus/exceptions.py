@@ -0,0 +1,20 @@
+class ModbusTransportException(Exception):
+    """Базовое исключение транспорта Modbus RTU."""
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class NoResponseException(ModbusTransportException):
+    """КЛ не ответил за отведенное время."""
+
+
+class InvalidResponseException(ModbusTransportException):
+    """Ответ поврежден: неверная контрольная сумма, адрес или длина."""
+
+
+class IllegalResponseException(ModbusTransportException):
+    """КЛ вернул ответ-исключение Modbus (например, неверный адрес регистра)."""
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
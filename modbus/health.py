@@ -0,0 +1,110 @@
+from pymodbus.exceptions import ConnectionException
+
+from modbus.constants import CONNECTION_LOST_TIMEOUTS, PORT_RECONNECT_ATTEMPTS
+from modbus.link import get_error_kind
+from modbus.telemetry import TIMEOUT
+
+CONNECTED = 'connected'
+RECONNECTING = 'reconnecting'
+FAILED = 'failed'  # порт не удалось открыть за PORT_RECONNECT_ATTEMPTS попыток
+
+
+def is_connection_error(error):
+    """Определяет, связана ли ошибка с портом, а не с ответом КЛ."""
+    # SerialException и ConnectionError наследуются от OSError
+    return isinstance(error, (OSError, ConnectionException))
+
+
+class ConnectionHealth:
+    """Состояние соединения с портом по результатам обмена.
+
+    Ошибка ввода-вывода порта сразу переводит соединение в переподключение.
+    Потерей связи считаются и таймауты подряд от КЛ, которые отвечали после
+    подключения. Таймауты на адресах без КЛ (поиск новых КЛ) не учитываются,
+    иначе порт без КЛ переоткрывался бы постоянно. Любой ответ, даже
+    поврежденный, подтверждает, что порт работает. Сам порт при этом не
+    проверяется, поэтому в исправном состоянии отслеживание ничего не стоит.
+    """
+    def __init__(self, lost_timeouts=CONNECTION_LOST_TIMEOUTS, reconnect_attempts=PORT_RECONNECT_ATTEMPTS):
+        self.lost_timeouts = lost_timeouts
+        self.reconnect_attempts = reconnect_attempts
+        self.state = CONNECTED
+        self.consecutive_timeouts = 0
+        self.responsive_units = set()  # КЛ, ответившие после подключения
+        self.failed_attempts = 0
+
+    @property
+    def is_connected(self):
+        return self.state == CONNECTED
+
+    def record_response(self, unit):
+        self.consecutive_timeouts = 0
+        self.responsive_units.add(unit)
+
+    def record_timeout(self, unit):
+        if unit not in self.responsive_units:
+            return
+        self.consecutive_timeouts += 1
+        if self.consecutive_timeouts >= self.lost_timeouts:
+            self.mark_lost()
+
+    def record_connection_error(self):
+        self.mark_lost()
+
+    def record_outcome(self, unit, error):
+        """Учитывает результат запроса к КЛ unit: None, исключение или ответ-ошибку pymodbus."""
+        if error is None:
+            self.record_response(unit)
+        elif is_connection_error(error):
+            self.record_connection_error()
+        elif get_error_kind(error) == TIMEOUT:
+            self.record_timeout(unit)
+        else:
+            self.record_response(unit)
+
+    def mark_lost(self):
+        if self.state == CONNECTED:
+            self.state = RECONNECTING
+            self.failed_attempts = 0
+
+    def record_reconnect(self, is_connected):
+        """Учитывает попытку открыть порт заново."""
+        if is_connected:
+            self.state = CONNECTED
+            self.consecutive_timeouts = 0
+            self.responsive_units.clear()
+            return
+        self.failed_attempts += 1
+        if self.failed_attempts >= self.reconnect_attempts:
+            self.state = FAILED
+
+
+class MonitoredClient:
+    """Обертка клиента Modbus, передающая результаты запросов в ConnectionHealth."""
+    def __init__(self, client, health):
+        self.client = client
+        self.health = health
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        try:
+            response = self.client.read_holding_registers(address=address, count=count, unit=unit, **kwargs)
+        except Exception as error:
+            self.health.record_outcome(unit, error)
+            raise
+        self.health.record_outcome(unit, response if response.isError() else None)
+        return response
+
+
+class AsyncMonitoredClient(MonitoredClient):
+    """Асинхронный вариант MonitoredClient."""
+    async def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        try:
+            response = await self.client.read_holding_registers(address=address, count=count, unit=unit, **kwargs)
+        except Exception as error:
+            self.health.record_outcome(unit, error)
+            raise
+        self.health.record_outcome(unit, None)
+        return response
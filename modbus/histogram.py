@@ -0,0 +1,56 @@
+from math import ceil, frexp, log2
+
+from modbus.constants import (HISTOGRAM_MAX_VALUE, HISTOGRAM_MIN_VALUE,
+                              HISTOGRAM_SUB_BUCKETS)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с логарифмически-линейными интервалами (как HdrHistogram).
+
+    Диапазон от min_value до max_value делится на удвоения, каждое удвоение -
+    на sub_buckets равных интервалов. Относительная погрешность перцентилей
+    не больше 1/sub_buckets, память постоянна и не зависит от числа значений.
+    """
+    def __init__(self, min_value=HISTOGRAM_MIN_VALUE, max_value=HISTOGRAM_MAX_VALUE,
+                 sub_buckets=HISTOGRAM_SUB_BUCKETS):
+        self.min_value = min_value
+        self.sub_buckets = sub_buckets
+        self.counts = [0] * (ceil(log2(max_value / min_value)) * sub_buckets)
+        self.total_count = 0
+        self.total_sum = 0
+        self.max = 0
+
+    def get_index(self, value):
+        """Возвращает номер интервала для значения."""
+        if value < self.min_value:
+            return 0
+        mantissa, exponent = frexp(value / self.min_value)  # value / min_value = mantissa * 2**exponent
+        index = (exponent - 1) * self.sub_buckets + int((2 * mantissa - 1) * self.sub_buckets)
+        return min(index, len(self.counts) - 1)
+
+    def get_upper_bound(self, index):
+        """Возвращает верхнюю границу интервала."""
+        octave, sub_bucket = divmod(index, self.sub_buckets)
+        return self.min_value * 2 ** octave * (1 + (sub_bucket + 1) / self.sub_buckets)
+
+    def record(self, value):
+        self.counts[self.get_index(value)] += 1
+        self.total_count += 1
+        self.total_sum += value
+        if value > self.max:
+            self.max = value
+
+    def get_mean(self):
+        return self.total_sum / self.total_count if self.total_count else 0
+
+    def get_percentile(self, percentile):
+        """Возвращает значение, которое не превышают percentile процентов записанных значений."""
+        if not self.total_count:
+            return 0
+        threshold = percentile / 100 * self.total_count
+        cumulative_count = 0
+        for index, count in enumerate(self.counts):
+            cumulative_count += count
+            if count and cumulative_count >= threshold:
+                return min(self.get_upper_bound(index), self.max)
+        return self.max
@@ -0,0 +1,153 @@
+from math import ceil
+from time import perf_counter
+
+from pymodbus.exceptions import ModbusIOException
+from pymodbus.pdu import ExceptionResponse
+
+from modbus.constants import (JOURNAL_COUNT_REGISTER,
+                              RESPONSE_TIMEOUT_RESOLUTION)
+from modbus.exceptions import (IllegalResponseException,
+                               InvalidResponseException, NoResponseException)
+from modbus.rtu import REQUEST_LENGTH, get_response_length
+from modbus.telemetry import (CRC_ERROR, ILLEGAL_RESPONSE, OTHER_ERROR,
+                              TIMEOUT)
+
+
+def get_error_kind(error):
+    """Определяет вид ошибки по исключению или ответу-ошибке pymodbus."""
+    if isinstance(error, NoResponseException):
+        return TIMEOUT
+    if isinstance(error, InvalidResponseException):
+        return CRC_ERROR
+    if isinstance(error, (IllegalResponseException, ExceptionResponse)):
+        return ILLEGAL_RESPONSE
+    if isinstance(error, ModbusIOException):
+        # pymodbus не разделяет отсутствие ответа и поврежденный ответ
+        return TIMEOUT if 'no response' in str(error).lower() else CRC_ERROR
+    return OTHER_ERROR
+
+
+class InstrumentedClient:
+    """Обертка синхронного клиента Modbus, считающая обмен в LinkTelemetry.
+    on_request вызывается после каждого запроса, например для передачи сводки."""
+    def __init__(self, client, telemetry, on_request=None):
+        self.client = client
+        self.telemetry = telemetry
+        self.on_request = on_request
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        self.telemetry.record_request(REQUEST_LENGTH)
+        start = perf_counter()
+        try:
+            response = self.client.read_holding_registers(address=address, count=count, unit=unit, **kwargs)
+        except Exception as error:
+            self.telemetry.record_error(get_error_kind(error), unit, address)
+            raise
+        else:
+            if response.isError():
+                self.telemetry.record_error(get_error_kind(response), unit, address)
+            else:
+                self.telemetry.record_response(get_response_length(count), unit, address, perf_counter() - start)
+        finally:
+            if self.on_request is not None:
+                self.on_request()
+        return response
+
+
+class AsyncInstrumentedClient(InstrumentedClient):
+    """Обертка асинхронного клиента Modbus, считающая обмен в LinkTelemetry."""
+    async def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        self.telemetry.record_request(REQUEST_LENGTH)
+        start = perf_counter()
+        try:
+            response = await self.client.read_holding_registers(address=address, count=count, unit=unit, **kwargs)
+        except Exception as error:
+            self.telemetry.record_error(get_error_kind(error), unit, address)
+            raise
+        else:
+            self.telemetry.record_response(get_response_length(count), unit, address, perf_counter() - start)
+        finally:
+            if self.on_request is not None:
+                self.on_request()
+        return response
+
+
+def is_retryable_read(address, count):
+    """Можно ли повторить чтение после ошибки. Чтение количества записей вместе с пакетом
+    журнала не повторяется: КЛ мог передать пакет, ответ на который не получен, и повтор
+    подтвердил бы этот пакет. Ошибка передается опросу, который сообщает о потере (log_lost_batch)."""
+    return address != JOURNAL_COUNT_REGISTER or count == 1
+
+
+def set_client_timeout(client, timeout):
+    """Меняет таймаут ответа клиента, у клиента pymodbus - и таймаут открытого порта."""
+    while isinstance(client, InstrumentedClient):
+        client = client.client
+    timeout = ceil(timeout / RESPONSE_TIMEOUT_RESOLUTION) * RESPONSE_TIMEOUT_RESOLUTION
+    if client.timeout != timeout:
+        client.timeout = timeout
+        socket = getattr(client, 'socket', None)
+        # у сокета TCP таймаута чтения нет, клиент pymodbus ждет ответ по client.timeout
+        if socket is not None and not hasattr(socket, 'settimeout'):
+            socket.timeout = timeout
+
+
+class AdaptiveClient:
+    """Обертка клиента Modbus с таймаутом и повторами по AdaptiveTimeoutPolicy.
+    Оборачивает InstrumentedClient, чтобы каждая попытка учитывалась в телеметрии."""
+    def __init__(self, client, policy, quality=None):
+        self.client = client
+        self.policy = policy
+        self.quality = quality
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def finish_attempt(self, unit, address, count, start, kind, attempt):
+        """Учитывает результат попытки. Возвращает True, если запрос нужно повторить."""
+        if kind is None:
+            self.policy.record_response(unit, count, perf_counter() - start)
+            return False
+        self.policy.record_error(unit, kind)
+        if attempt >= self.policy.get_retries(unit, kind) or not is_retryable_read(address, count):
+            return False
+        if self.quality is not None:
+            self.quality.record_retry(unit, address)
+        return True
+
+    def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        attempt = 0
+        while True:
+            set_client_timeout(self.client, self.policy.get_timeout(unit, count))
+            start = perf_counter()
+            try:
+                response = self.client.read_holding_registers(address=address, count=count, unit=unit, **kwargs)
+            except Exception as error:
+                if not self.finish_attempt(unit, address, count, start, get_error_kind(error), attempt):
+                    raise
+            else:
+                kind = get_error_kind(response) if response.isError() else None
+                if not self.finish_attempt(unit, address, count, start, kind, attempt):
+                    return response
+            attempt += 1
+
+
+class AsyncAdaptiveClient(AdaptiveClient):
+    """Асинхронный вариант AdaptiveClient."""
+    async def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        attempt = 0
+        while True:
+            set_client_timeout(self.client, self.policy.get_timeout(unit, count))
+            start = perf_counter()
+            try:
+                response = await self.client.read_holding_registers(address=address, count=count, unit=unit, **kwargs)
+            except Exception as error:
+                if not self.finish_attempt(unit, address, count, start, get_error_kind(error), attempt):
+                    raise
+            else:
+                if not self.finish_attempt(unit, address, count, start, None, attempt):
+                    return response
+            attempt += 1
@@ -0,0 +1,516 @@
+"""Опрос КЛ без привязки к интерфейсу.
+
+Poller опрашивает КЛ одного порта в своем потоке, AsyncPoller - все порты в
+одном цикле событий asyncio. Результаты передаются сигналами: в программе это
+сигналы Qt воркеров чтения (gui/threads.py), вне интерфейса - Channel (channels.py) с
+обычными обработчиками, которые вызываются в потоке опроса.
+"""
+import asyncio
+import logging
+import traceback
+from time import monotonic, sleep
+
+from channels import Channel
+from modbus.constants import (COMBINED_DRAIN, JOURNAL_WINDOW_REGISTERS,
+                              KL_ADDRESSES, KL_IDENTIFIER,
+                              POLL_RATES_PUBLISH_INTERVAL,
+                              PORT_RECONNECT_ATTEMPTS, PORT_RECONNECT_DELAY,
+                              PYMODBUS_TRANSPORT,
+                              SEPARATE_DRAIN, TELEMETRY_PUBLISH_INTERVAL)
+from modbus.discovery import DiscoveryScheduler
+from modbus.exceptions import ModbusTransportException
+from modbus.health import (FAILED, AsyncMonitoredClient, ConnectionHealth,
+                           MonitoredClient)
+from modbus.link import (AdaptiveClient, AsyncAdaptiveClient,
+                         AsyncInstrumentedClient, InstrumentedClient)
+from modbus.scheduler import PollScheduler
+from modbus.telemetry import LinkTelemetry
+from modbus.timeouts import AdaptiveTimeoutPolicy
+from modbus.utils import (get_active_devices, get_async_client, get_client,
+                          get_count_of_log_entries, get_events_from_registers,
+                          get_journal_batch_size, get_journal_with_count,
+                          get_kl_version, get_registers_values,
+                          get_status_and_test_registers,
+                          get_status_from_register,
+                          get_test_results_from_registers, is_device_active,
+                          split_journal_registers)
+
+# сигналы опроса, у сигналов Qt те же имена (gui/threads.py)
+SIGNALS = (
+    'link_telemetry', 'manage_table_sortig', 'update_kl_graph_color', 'update_kl_tests_results',
+    'update_kl_version', 'update_timer', 'update_current_test', 'update_poll_rates',
+    'save_events', 'save_tests', 'exit_thread_after_cancel', 'port_connection_error')
+
+
+def log_lost_batch(port, address, expected_count):
+    """Предупреждает о возможной потере пакета при чтении журнала одним запросом.
+    Если потерян ответ, КЛ уже считает пакет переданным, и следующий запрос его подтвердит."""
+    logging.warning(
+        f'Нет ответа на чтение журнала КЛ по адресу {address} порта {port}, '
+        f'возможна потеря до {min(expected_count, JOURNAL_WINDOW_REGISTERS // 2)} событий')
+
+
+class BasePoller:
+    """Общая часть опроса. Сигналы, относящиеся к КЛ, передают порт и адрес КЛ.
+    Сигналы, не объявленные в подклассе (как сигналы Qt), создаются как Channel."""
+    def __init__(self, telemetry=None):
+        for name in SIGNALS:
+            if not hasattr(type(self), name):
+                setattr(self, name, Channel())
+        self.is_cancelled = False
+        self.poll_rates_publish_time = {}  # порт -> время последней передачи частот опроса
+        # порт -> LinkTelemetry, главное окно передает свой словарь, чтобы счетчики сохранялись между сеансами
+        self.telemetry = telemetry if telemetry is not None else {}
+
+    def get_telemetry(self, port):
+        if port not in self.telemetry:
+            self.telemetry[port] = LinkTelemetry()
+        return self.telemetry[port]
+
+    def publish_telemetry(self, port):
+        """Передает сводку обмена по порту в главное окно не чаще TELEMETRY_PUBLISH_INTERVAL."""
+        telemetry = self.get_telemetry(port)
+        if telemetry.is_snapshot_due():
+            self.link_telemetry.emit(port, telemetry.snapshot())
+
+    def publish_final_telemetry(self, port):
+        """Передает итоговую сводку после остановки опроса порта, индикаторы обмена гаснут."""
+        snapshot = self.get_telemetry(port).snapshot()
+        self.link_telemetry.emit(port, snapshot._replace(tx_active=False, rx_active=False))
+
+    def publish_poll_rates(self, port, scheduler):
+        """Раз в POLL_RATES_PUBLISH_INTERVAL передает частоты опроса КЛ в главное окно."""
+        now = monotonic()
+        if now - self.poll_rates_publish_time.get(port, 0) >= POLL_RATES_PUBLISH_INTERVAL:
+            self.poll_rates_publish_time[port] = now
+            self.update_poll_rates.emit(port, scheduler.get_rates())
+
+    def publish_events(self, port, address, registers, date_time=None):
+        """Разбирает пакет журнала КЛ и передает события для сохранения."""
+        self.save_events.emit(get_events_from_registers(registers, address, date_time))
+
+    def publish_status(self, port, address, registers, kl_version, date_time=None):
+        """Разбирает регистры 20000-20040 КЛ и передает состояние и результаты теста.
+        Возвращает код состояния КЛ."""
+        status_code, is_new_tests = get_status_from_register(registers[0])
+        test, total_statistic, current_test = get_test_results_from_registers(
+            registers[1:], address, kl_version, date_time)
+        self.show_tests_results(port, address, status_code, is_new_tests, test, total_statistic, current_test)
+        return status_code
+
+    def show_tests_results(self, port, address, status_code, is_new_tests, test, total_statistic, current_test):
+        """Передает в главное окно состояние и результаты теста КЛ."""
+        if status_code == 0:
+            head, body = 'lightGray', 'lightGray'
+        if status_code == 1:
+            head, body = 'lightGreen', 'lightGreen'
+        elif status_code == 2:
+            head, body = 'yellow', 'yellow'
+        elif status_code == 3:
+            head, body = 'lightGreen', 'yellow'
+        elif status_code == 4:
+            head, body = 'red', 'yellow'
+        elif status_code == 5:
+            head, body = 'purple', 'yellow'
+        self.update_kl_graph_color.emit(port, address, head, body)
+        if status_code == 1:
+            self.update_timer.emit(port, address, 'w')
+        elif status_code in [2, 3, 4, 5]:
+            self.update_timer.emit(port, address, 'p')
+        else:
+            self.update_timer.emit(port, address, 'd')
+
+        self.update_current_test.emit(port, address, current_test)
+        self.update_kl_tests_results.emit(port, address, total_statistic)
+
+        if is_new_tests:
+            self.save_tests.emit(test)
+
+    def show_disconnected(self, port, address):
+        """Отображает КЛ как отключенный."""
+        self.update_kl_graph_color.emit(port, address, 'lightGray', 'lightGray')
+        self.update_timer.emit(port, address, 'd')
+
+
+class Poller(BasePoller):
+    """Чтение журнала и результатов тестов из всех КЛ одного порта в потоке вызывающего."""
+    def __init__(self, port, telemetry=None, transport=PYMODBUS_TRANSPORT, journal_drain=SEPARATE_DRAIN):
+        super().__init__(telemetry)
+        self.port = port
+        self.transport = transport
+        self.journal_drain = journal_drain
+        self.active_devices = []
+        self.discovery = DiscoveryScheduler()
+        self.scheduler = PollScheduler()
+        self.kl_versions = {}  # версия КЛ читается один раз за сеанс связи с ним
+        self.timeout_policy = AdaptiveTimeoutPolicy()
+        self.health = ConnectionHealth()
+
+    def wait(self, delay):
+        """Ждет delay секунд, продолжая передавать сводку обмена с постоянной частотой."""
+        end_time = monotonic() + delay
+        while not self.is_cancelled:
+            remaining = end_time - monotonic()
+            if remaining <= 0:
+                return
+            sleep(min(remaining, TELEMETRY_PUBLISH_INTERVAL))
+            self.publish_telemetry(self.port)
+
+    def find_devices(self, client):
+        """Ищет КЛ по всем адресам порта. Найденные КЛ ставятся в очередь опроса,
+        остальные адреса проверяются позже по расписанию DiscoveryScheduler."""
+        self.active_devices.extend(get_active_devices(client))
+        for address in self.discovery.next_probe_time:
+            if address in self.active_devices:
+                self.scheduler.add(address)
+            else:
+                self.discovery.mark_absent(address)
+
+    def forget_devices(self):
+        """Отображает все КЛ порта как отключенные и забывает их состояние.
+        После переподключения версии КЛ читаются заново, как в AsyncPortReader."""
+        for address in self.active_devices:
+            self.show_disconnected(self.port, address)
+            self.scheduler.remove(address)
+            self.timeout_policy.forget(address)
+        self.active_devices = []
+        self.kl_versions = {}
+
+    def reconnect(self, client):
+        """Переоткрывает порт после потери соединения.
+        Возвращает False, если порт не удалось открыть или опрос остановлен."""
+        logging.warning(f'Потеряно соединение с портом {self.port}, переподключение')
+        self.forget_devices()
+        client.close()
+        while not self.is_cancelled:
+            self.health.record_reconnect(client.connect())
+            if self.health.is_connected:
+                logging.info(f'Соединение с портом {self.port} восстановлено')
+                self.find_devices(client)
+                return True
+            if self.health.state == FAILED:
+                self.port_connection_error.emit(self.port)
+                self.is_cancelled = True
+                return False
+            self.wait(PORT_RECONNECT_DELAY)
+        return False
+
+    def get_journal(self, address, client):
+        """Получает журнал событий КЛ. Возвращает количество записей в журнале на момент опроса."""
+        if self.journal_drain == COMBINED_DRAIN:
+            return self.drain_journal(address, client)
+        count_of_log_entries = get_count_of_log_entries(self.port, client, address)[0]
+        first_count_of_log_entries = count_of_log_entries
+
+        while count_of_log_entries != 0 and not self.is_cancelled:
+            registers_values = get_registers_values(client, address, get_journal_batch_size(count_of_log_entries))
+            self.publish_events(self.port, address, registers_values)
+            count_of_log_entries = get_count_of_log_entries(self.port, client, address)[0]
+        return first_count_of_log_entries
+
+    def drain_journal(self, address, client):
+        """Получает журнал событий КЛ, читая количество записей и следующий пакет одним запросом.
+        Чтение регистра 0 подтверждает прошлый пакет, поэтому при большом журнале на пакет
+        приходится один запрос вместо двух. Последний пакет подтверждается при следующем опросе.
+        Запрос с пакетом после ошибки не повторяется (is_retryable_read), возможная потеря
+        пакета записывается в журнал программы. Возвращает количество записей в журнале на момент опроса."""
+        expected_count = 0  # первый запрос читает только количество записей
+        first_count_of_log_entries = None
+        while True:
+            try:
+                count_of_log_entries, registers_values = get_journal_with_count(client, address, expected_count)
+            except Exception:
+                if expected_count:
+                    log_lost_batch(self.port, address, expected_count)
+                raise
+            if first_count_of_log_entries is None:
+                first_count_of_log_entries = count_of_log_entries
+            if registers_values:
+                self.publish_events(self.port, address, registers_values)
+            # записи, не попавшие в пакет, остаются в журнале и после его подтверждения
+            expected_count = count_of_log_entries - len(registers_values) // 2
+            if expected_count == 0 or self.is_cancelled:
+                return first_count_of_log_entries
+
+    def get_tests_results(self, address, client):
+        """Получает результаты теста КЛ и возвращает код состояния КЛ.
+        Регистр состояния и результаты теста читаются одним запросом,
+        версия КЛ - только при первом обращении после подключения."""
+        if address not in self.kl_versions:
+            self.kl_versions[address] = get_kl_version(client, address)
+            self.update_kl_version.emit(self.port, address, self.kl_versions[address])
+
+        registers = get_status_and_test_registers(client, address)
+        return self.publish_status(self.port, address, registers, self.kl_versions[address])
+
+    def read(self, address, client):
+        """Начинает чтение данных из одного КЛ.
+        Возвращает код состояния КЛ и признак наличия записей в журнале
+        или None, если во время чтения произошла ошибка."""
+        try:
+            count_of_log_entries = self.get_journal(address, client)
+        except Exception as error:
+            logging.error(
+                f'Ошибка во время чтения журнала КЛ по адресу {address}. Код ошибки: {error}\n{traceback.format_exc()}')
+            return None
+        try:
+            status_code = self.get_tests_results(address, client)
+        except Exception as error:
+            logging.error(
+                f'Ошибка во время чтения результатов тестов КЛ по адресу {address}. Код ошибки: {error}\n{traceback.format_exc()}')
+            return None
+        return status_code, count_of_log_entries > 0
+
+    def probe_device(self, address, client):
+        """Проверяет, отвечает ли КЛ по указанному адресу."""
+        return is_device_active(client, address)
+
+    def update_active_devices(self, client, failed_devices):
+        """Обновляет список подключенных КЛ.
+        Активные КЛ повторно проверяются, только если их чтение завершилось ошибкой,
+        отсутствующие адреса проверяются по несколько за цикл по расписанию DiscoveryScheduler."""
+        for device in failed_devices:  # Меняем цвет КЛ, если они были в прошлом списке, но перестали отвечать
+            # после поврежденных ответов КЛ остается на связи, отключенным он считается
+            # только после нескольких таймаутов подряд и неудачной проверки
+            if self.timeout_policy.is_device_gone(device) and not self.probe_device(device, client):
+                self.active_devices.remove(device)
+                self.scheduler.remove(device)
+                self.timeout_policy.forget(device)
+                self.kl_versions.pop(device, None)
+                self.discovery.mark_lost(device)
+                self.show_disconnected(self.port, device)
+
+        new_devices = []
+        for address in self.discovery.get_addresses_to_probe(self.active_devices):
+            if self.probe_device(address, client):
+                self.discovery.mark_found(address)
+                self.scheduler.add(address)
+                new_devices.append(address)
+            else:
+                self.discovery.mark_absent(address)
+
+        self.active_devices.extend(new_devices)
+        self.active_devices.sort()
+        return new_devices
+
+    def run(self):
+        """Опрашивает КЛ порта, пока опрос не остановлен."""
+        telemetry = self.get_telemetry(self.port)
+        client = MonitoredClient(AdaptiveClient(
+            InstrumentedClient(get_client(self.port, self.transport), telemetry, lambda: self.publish_telemetry(self.port)),
+            self.timeout_policy, telemetry.quality), self.health)
+        self.find_devices(client)
+
+        while not self.is_cancelled:
+            if not self.health.is_connected and not self.reconnect(client):
+                break
+            failed_devices = []
+            for address in self.scheduler.get_due_addresses():
+                if not self.health.is_connected:
+                    break  # остальные КЛ опрашиваются после переподключения
+                result = self.read(address, client)
+                if result is None:
+                    self.scheduler.mark_polled(address)
+                    failed_devices.append(address)
+                else:
+                    self.scheduler.mark_polled(address, *result)
+            if self.health.is_connected:
+                self.update_active_devices(client, failed_devices)
+            if not self.health.is_connected:
+                continue
+            self.publish_poll_rates(self.port, self.scheduler)
+            # ждем ближайшего опроса КЛ или проверки отсутствующих адресов
+            self.wait(min(self.scheduler.get_next_poll_delay(),
+                          self.discovery.get_next_probe_delay(self.active_devices)))
+        if self.is_cancelled:
+            self.publish_final_telemetry(self.port)
+            for address in self.active_devices:
+                self.show_disconnected(self.port, address)
+            client.close()
+            return
+
+
+class AsyncPortReader:
+    """Чтение КЛ одного порта для AsyncPoller.
+    Хранит состояние порта, сигналы отправляются через AsyncPoller."""
+    def __init__(self, port, worker):
+        self.port = port
+        self.worker = worker
+        telemetry = worker.get_telemetry(port)
+        self.timeout_policy = AdaptiveTimeoutPolicy()
+        self.health = ConnectionHealth()
+        self.client = AsyncMonitoredClient(AsyncAdaptiveClient(
+            AsyncInstrumentedClient(get_async_client(port), telemetry), self.timeout_policy, telemetry.quality),
+            self.health)
+        self.active_devices = []
+        self.discovery = DiscoveryScheduler()
+        self.scheduler = PollScheduler()
+        self.kl_versions = {}
+        self.is_finished = False
+
+    async def request(self, address, count, unit):
+        """Выполняет запрос к КЛ и возвращает значения регистров."""
+        response = await self.client.read_holding_registers(address=address, count=count, unit=unit)
+        return response.registers
+
+    async def probe_device(self, address):
+        """Проверяет, отвечает ли КЛ по указанному адресу."""
+        try:
+            return (await self.request(976, 1, address))[0] == KL_IDENTIFIER
+        except ModbusTransportException:
+            return False
+
+    async def get_journal(self, address):
+        """Получает журнал событий КЛ. Возвращает количество записей в журнале на момент опроса."""
+        if self.worker.journal_drain == COMBINED_DRAIN:
+            return await self.drain_journal(address)
+        count_of_log_entries = first_count_of_log_entries = (await self.request(0, 1, address))[0]
+        while count_of_log_entries != 0 and not self.worker.is_cancelled:
+            registers = await self.request(1, get_journal_batch_size(count_of_log_entries), address)
+            self.worker.publish_events(self.port, address, registers)
+            count_of_log_entries = (await self.request(0, 1, address))[0]
+        return first_count_of_log_entries
+
+    async def drain_journal(self, address):
+        """Получает журнал событий КЛ, читая количество записей и следующий пакет одним запросом
+        (см. Poller.drain_journal)."""
+        expected_count = 0
+        first_count_of_log_entries = None
+        while True:
+            try:
+                registers = await self.request(0, 1 + get_journal_batch_size(expected_count), address)
+            except Exception:
+                if expected_count:
+                    log_lost_batch(self.port, address, expected_count)
+                raise
+            count_of_log_entries, registers = split_journal_registers(registers, expected_count)
+            if first_count_of_log_entries is None:
+                first_count_of_log_entries = count_of_log_entries
+            if registers:
+                self.worker.publish_events(self.port, address, registers)
+            expected_count = count_of_log_entries - len(registers) // 2
+            if expected_count == 0 or self.worker.is_cancelled:
+                return first_count_of_log_entries
+
+    async def get_tests_results(self, address):
+        """Получает результаты теста КЛ и возвращает код состояния КЛ."""
+        if address not in self.kl_versions:
+            self.kl_versions[address] = (await self.request(977, 1, address))[0]
+            self.worker.update_kl_version.emit(self.port, address, self.kl_versions[address])
+        registers = await self.request(20000, 41, address)
+        return self.worker.publish_status(self.port, address, registers, self.kl_versions[address])
+
+    async def read(self, address):
+        """Читает данные из одного КЛ. Возвращает код состояния КЛ и признак
+        наличия записей в журнале или None при ошибке чтения.
+        Потеря соединения с портом передается выше для переподключения."""
+        try:
+            count_of_log_entries = await self.get_journal(address)
+            status_code = await self.get_tests_results(address)
+        except ConnectionError:
+            raise
+        except Exception as error:
+            logging.error(
+                f'Ошибка во время чтения КЛ по адресу {address} порта {self.port}. Код ошибки: {error}\n{traceback.format_exc()}')
+            return None
+        return status_code, count_of_log_entries > 0
+
+    async def connect(self):
+        """Открывает порт и ищет КЛ по всем адресам."""
+        for _ in range(PORT_RECONNECT_ATTEMPTS):
+            if self.worker.is_cancelled:
+                return False
+            if await self.client.connect():
+                self.health.record_reconnect(True)
+                for address in KL_ADDRESSES:
+                    if await self.probe_device(address):
+                        self.active_devices.append(address)
+                        self.scheduler.add(address)
+                    else:
+                        self.discovery.mark_absent(address)
+                return True
+            await asyncio.sleep(PORT_RECONNECT_DELAY)
+        self.worker.port_connection_error.emit(self.port)
+        self.worker.is_cancelled = True
+        return False
+
+    def disconnect(self):
+        """Закрывает порт и отображает все КЛ как отключенные."""
+        for address in self.active_devices:
+            self.worker.show_disconnected(self.port, address)
+            self.scheduler.remove(address)
+            self.timeout_policy.forget(address)
+        self.active_devices = []
+        self.kl_versions = {}
+        self.client.close()
+
+    async def poll(self):
+        """Цикл опроса КЛ порта."""
+        try:
+            while not self.worker.is_cancelled:
+                if not self.client.is_connected or not self.health.is_connected:
+                    self.disconnect()
+                    if not await self.connect():
+                        return
+                try:
+                    failed_devices = []
+                    for address in self.scheduler.get_due_addresses():
+                        if not self.health.is_connected:
+                            break
+                        result = await self.read(address)
+                        if result is None:
+                            self.scheduler.mark_polled(address)
+                            failed_devices.append(address)
+                        else:
+                            self.scheduler.mark_polled(address, *result)
+                    for address in failed_devices:
+                        if self.timeout_policy.is_device_gone(address) and not await self.probe_device(address):
+                            self.active_devices.remove(address)
+                            self.scheduler.remove(address)
+                            self.timeout_policy.forget(address)
+                            self.kl_versions.pop(address, None)
+                            self.discovery.mark_lost(address)
+                            self.worker.show_disconnected(self.port, address)
+                    for address in self.discovery.get_addresses_to_probe(self.active_devices):
+                        if await self.probe_device(address):
+                            self.discovery.mark_found(address)
+                            self.scheduler.add(address)
+                            self.active_devices.append(address)
+                            self.active_devices.sort()
+                        else:
+                            self.discovery.mark_absent(address)
+                    self.worker.publish_poll_rates(self.port, self.scheduler)
+                    await asyncio.sleep(min(self.scheduler.get_next_poll_delay(),
+                                            self.discovery.get_next_probe_delay(self.active_devices)))
+                except ConnectionError as error:
+                    logging.warning(f'Потеряно соединение с портом {self.port}: {error}')
+                    self.client.close()
+        finally:
+            self.disconnect()
+            self.is_finished = True
+
+
+class AsyncPoller(BasePoller):
+    """Опрос всех портов в одном цикле событий asyncio.
+    Каждый порт опрашивается своей корутиной, отдельный поток на порт не нужен."""
+    def __init__(self, ports, telemetry=None, journal_drain=SEPARATE_DRAIN):
+        super().__init__(telemetry)
+        self.ports = ports
+        self.journal_drain = journal_drain
+
+    async def publish_telemetry_periodically(self, readers):
+        """Передает сводки обмена всех портов с постоянной частотой, пока идет опрос."""
+        while not all(reader.is_finished for reader in readers):
+            for port in self.ports:
+                self.publish_telemetry(port)
+            await asyncio.sleep(TELEMETRY_PUBLISH_INTERVAL)
+        for port in self.ports:
+            self.publish_final_telemetry(port)
+
+    async def poll_ports(self):
+        readers = [AsyncPortReader(port, self) for port in self.ports]
+        await asyncio.gather(*(reader.poll() for reader in readers), self.publish_telemetry_periodically(readers))
+
+    def run(self):
+        """Опрашивает порты в потоке вызывающего, пока опрос не остановлен."""
+        asyncio.run(self.poll_ports())
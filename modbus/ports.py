@@ -0,0 +1,184 @@
+import logging
+import os
+import threading
+from time import monotonic
+
+import serial.tools.list_ports
+from serial import Serial
+
+from modbus.constants import (NETWORK_PORTS_ENV, PORT_AVAILABILITY_TTL,
+                              PORT_SCAN_INTERVAL, SIMULATOR_PORT_PREFIX,
+                              SIMULATOR_PORTS_ENV)
+from modbus.tcp import is_network_port
+
+
+def list_serial_ports():
+    """Возвращает имена COM-портов системы, не открывая их."""
+    return [port.name for port in serial.tools.list_ports.comports()]
+
+
+def is_simulated_port(port):
+    """Порт обслуживается имитатором КЛ внутри процесса (modbus/simulator.py)."""
+    return port.startswith(SIMULATOR_PORT_PREFIX)
+
+
+def get_configured_ports(variable):
+    """Возвращает порты, перечисленные через запятую в переменной окружения."""
+    return [port.strip() for port in os.environ.get(variable, '').split(',') if port.strip()]
+
+
+def is_port_free(port):
+    """Определяет, свободен ли порт: пробует открыть его и сразу закрывает."""
+    if is_simulated_port(port) or is_network_port(port):
+        return True
+    try:
+        Serial(port).close()
+        return True
+    except Exception:
+        return False
+
+
+class PortRegistry:
+    """Список COM-портов, обновляемый в фоновом потоке.
+
+    Порты перечисляются без открытия раз в scan_interval и сразу по refresh(),
+    например по уведомлению ОС о подключении устройства. Занятость порта
+    проверяется открытием только по запросу request_availability, результат
+    хранится availability_ttl секунд. Подписчики вызываются из фонового потока
+    с текущим списком портов при каждом изменении списка или занятости.
+    """
+    def __init__(self, scan_interval=PORT_SCAN_INTERVAL, availability_ttl=PORT_AVAILABILITY_TTL,
+                 list_ports=list_serial_ports, check_port=is_port_free):
+        self.scan_interval = scan_interval
+        self.availability_ttl = availability_ttl
+        self.list_ports = list_ports
+        self.check_port = check_port
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.ports = None  # None - порты еще не перечислялись
+        self.availability = {}  # порт -> (свободен, время проверки)
+        self.pending_checks = set()
+        self.subscribers = []
+        self.thread = None
+        self.is_running = False
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.is_running = True
+        self.thread = threading.Thread(target=self.run, name='port registry', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.is_running = False
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.thread = None
+
+    def subscribe(self, callback):
+        with self.lock:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def refresh(self):
+        """Запрашивает внеочередное перечисление портов."""
+        self.wakeup.set()
+
+    def get_ports(self):
+        """Возвращает имена портов, включая линии за шлюзами и имитируемые из переменных окружения.
+        При первом обращении до запуска фонового потока порты перечисляются сразу."""
+        with self.lock:
+            ports = self.ports
+        if ports is None:
+            self.scan()
+            with self.lock:
+                ports = self.ports or []
+        network_ports = [port for port in get_configured_ports(NETWORK_PORTS_ENV) if is_network_port(port)]
+        simulated_ports = [port for port in get_configured_ports(SIMULATOR_PORTS_ENV) if is_simulated_port(port)]
+        return ports + network_ports + simulated_ports
+
+    def is_busy(self, port):
+        """Возвращает True, если порт занят, по последней проверке. Непроверенный порт считается свободным."""
+        with self.lock:
+            is_free, _ = self.availability.get(port, (True, 0))
+        return not is_free
+
+    def request_availability(self, ports):
+        """Ставит в очередь фоновую проверку занятости портов, результат которой устарел."""
+        now = monotonic()
+        with self.lock:
+            for port in ports:
+                _, checked_at = self.availability.get(port, (None, None))
+                if checked_at is None or now - checked_at >= self.availability_ttl:
+                    self.pending_checks.add(port)
+            has_pending = bool(self.pending_checks)
+        if has_pending:
+            self.wakeup.set()
+
+    def get_free_ports(self, ports):
+        """Проверяет занятость портов сразу, в вызывающем потоке, и возвращает свободные.
+        Результат сохраняется, как у фоновой проверки."""
+        free_ports = []
+        for port in ports:
+            is_free = self.check_port(port)
+            with self.lock:
+                self.availability[port] = (is_free, monotonic())
+            if is_free:
+                free_ports.append(port)
+        return free_ports
+
+    def scan(self):
+        """Перечисляет порты. Возвращает True, если список изменился."""
+        try:
+            ports = self.list_ports()
+        except Exception as error:
+            logging.error(f'Ошибка при получении списка портов. Код ошибки: {error}')
+            return False
+        with self.lock:
+            is_changed = ports != self.ports
+            if is_changed:
+                for port in set(self.availability) - set(ports):
+                    del self.availability[port]
+                self.ports = ports
+        return is_changed
+
+    def check_pending(self):
+        """Проверяет занятость портов из очереди. Возвращает True, если занятость изменилась."""
+        with self.lock:
+            ports = [port for port in self.pending_checks if self.ports is None or port in self.ports]
+            self.pending_checks.clear()
+        is_changed = False
+        for port in ports:
+            is_free = self.check_port(port)
+            with self.lock:
+                previous = self.availability.get(port)
+                self.availability[port] = (is_free, monotonic())
+            is_changed = is_changed or previous is None or previous[0] != is_free
+        return is_changed
+
+    def notify(self):
+        ports = self.get_ports()
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            try:
+                callback(ports)
+            except Exception as error:
+                logging.error(f'Ошибка в подписчике списка портов. Код ошибки: {error}')
+
+    def run(self):
+        while self.is_running:
+            self.wakeup.clear()  # запросы, пришедшие во время обработки, разбудят следующую итерацию
+            is_changed = self.scan()
+            is_changed = self.check_pending() or is_changed
+            if is_changed:
+                self.notify()
+            self.wakeup.wait(self.scan_interval)
+
+
+port_registry = PortRegistry()
@@ -0,0 +1,262 @@
+"""Опрос КЛ в отдельном процессе (движок process).
+
+Процесс опроса не делит GIL с интерфейсом: отрисовка таблиц, выгрузка в Excel
+и запись в БД не задерживают обмен по линии. В процессе опроса каждый порт
+опрашивается RingPoller в своем потоке и передает результаты в главный процесс
+через свой кольцевой буфер в разделяемой памяти (modbus/ring.py) записями
+фиксированного размера. Журнал и результаты тестов передаются значениями
+регистров и разбираются в главном процессе тем же кодом, что и в других движках.
+
+Запись - заголовок RECORD_HEADER (вид записи, адрес КЛ, количество, время
+чтения) и данные, формат которых определяется видом записи.
+"""
+import logging
+import signal
+import struct
+import threading
+from datetime import datetime
+from multiprocessing import get_context, parent_process
+from time import monotonic, sleep, time
+
+from logs_config import config_logs
+from modbus.constants import (PROCESS_LOG_FILE, PROCESS_RING_CAPACITY,
+                              PROCESS_RING_FULL_DELAY,
+                              PROCESS_RING_POLL_INTERVAL, PROCESS_STOP_TIMEOUT,
+                              PROCESS_WATCH_INTERVAL, PYMODBUS_TRANSPORT,
+                              QUALITY_PUBLISH_INTERVAL, SEPARATE_DRAIN)
+from modbus.poller import BasePoller, Poller
+from modbus.ring import SharedRingBuffer
+from modbus.telemetry import (OUTCOMES, PERCENTILES, REGISTER_BLOCKS,
+                              TelemetrySnapshot)
+from modbus.utils import get_status_from_register
+
+RECORD_HEADER = struct.Struct('<BBHd')  # вид записи, адрес КЛ, количество, время чтения time()
+RECORD_SIZE = RECORD_HEADER.size + 2 * 126  # пакет журнала - до 124 регистров
+STATUS_REGISTERS = 41  # регистры 20000-20040
+TELEMETRY_FORMAT = struct.Struct(f'<{len(TelemetrySnapshot._fields) - 2}Q2?')
+POLL_RATE_FORMAT = struct.Struct('<Bff')  # адрес КЛ, целевая и фактическая частота опроса
+# исходы запросов и повторы; среднее, максимальное время ответа и перцентили, мс
+QUALITY_FORMAT = struct.Struct(f'<{len(OUTCOMES) + 1}I{2 + len(PERCENTILES)}f')
+
+# виды записей
+EVENTS_RECORD = 1  # количество - число регистров, данные - регистры пакета журнала
+STATUS_RECORD = 2  # количество - версия КЛ, данные - регистры 20000-20040
+KL_VERSION_RECORD = 3  # количество - версия КЛ
+DISCONNECTED_RECORD = 4
+TELEMETRY_RECORD = 5  # данные - TelemetrySnapshot
+POLL_RATES_RECORD = 6  # количество - число КЛ, данные - POLL_RATE_FORMAT для каждого КЛ
+QUALITY_RECORD = 7  # количество - номер блока регистров в REGISTER_BLOCKS, данные - QUALITY_FORMAT
+CONNECTION_ERROR_RECORD = 8
+
+
+def pack_registers(registers):
+    return struct.pack(f'<{len(registers)}H', *registers)
+
+
+class RingPoller(Poller):
+    """Poller процесса опроса, передающий результаты в кольцевой буфер порта."""
+    def __init__(self, port, ring, transport=PYMODBUS_TRANSPORT, journal_drain=SEPARATE_DRAIN):
+        super().__init__(port, transport=transport, journal_drain=journal_drain)
+        self.ring = ring
+        self.quality_publish_time = 0
+        self.link_telemetry.connect(self.push_telemetry)
+        self.update_kl_version.connect(self.push_kl_version)
+        self.update_poll_rates.connect(self.push_poll_rates)
+        self.port_connection_error.connect(lambda port: self.push(CONNECTION_ERROR_RECORD))
+
+    def push(self, kind, address=0, count=0, payload=b'', timestamp=0):
+        """Записывает запись в буфер. Пока буфер заполнен, опрос ждет:
+        пакет журнала, подтвержденный следующим запросом, в КЛ уже не вернуть."""
+        record = RECORD_HEADER.pack(kind, address, count, timestamp) + payload
+        while not self.ring.push(record):
+            sleep(PROCESS_RING_FULL_DELAY)
+
+    def publish_events(self, port, address, registers, date_time=None):
+        self.push(EVENTS_RECORD, address, len(registers), pack_registers(registers), time())
+
+    def publish_status(self, port, address, registers, kl_version, date_time=None):
+        self.push(STATUS_RECORD, address, kl_version, pack_registers(registers), time())
+        status_code, _ = get_status_from_register(registers[0])
+        return status_code
+
+    def show_disconnected(self, port, address):
+        self.push(DISCONNECTED_RECORD, address)
+
+    def push_kl_version(self, port, address, version):
+        self.push(KL_VERSION_RECORD, address, version)
+
+    def push_poll_rates(self, port, rates):
+        payload = b''.join(POLL_RATE_FORMAT.pack(address, *rate) for address, rate in rates.items())
+        self.push(POLL_RATES_RECORD, count=len(rates), payload=payload)
+
+    def push_telemetry(self, port, snapshot):
+        """Передает сводку обмена, а раз в QUALITY_PUBLISH_INTERVAL - и статистику качества связи."""
+        self.push(TELEMETRY_RECORD, payload=TELEMETRY_FORMAT.pack(*snapshot))
+        now = monotonic()
+        if now - self.quality_publish_time >= QUALITY_PUBLISH_INTERVAL:
+            self.quality_publish_time = now
+            for row in self.get_telemetry(port).quality.get_rows():
+                values = [row[outcome] for outcome in OUTCOMES] + [row['retries'], row['mean_ms'], row['max_ms']]
+                values.extend(row[f'p{percentile}_ms'] for percentile in PERCENTILES)
+                self.push(QUALITY_RECORD, row['kl'], REGISTER_BLOCKS.index(row['block']), QUALITY_FORMAT.pack(*values))
+
+    def publish_final_telemetry(self, port):
+        self.quality_publish_time = 0  # итоговая статистика передается всегда
+        super().publish_final_telemetry(port)
+
+
+def run_polling_process(ports, ring_names, stop_event, transport, journal_drain):
+    """Точка входа процесса опроса: опрашивает порты, пока главный процесс не установит stop_event."""
+    # Ctrl+C в консоли сборщика приходит всей группе процессов; процесс опроса останавливает
+    # только главный процесс, иначе буферы закрываются до того, как он дочитает результаты
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    config_logs(PROCESS_LOG_FILE)
+    rings = [SharedRingBuffer(RECORD_SIZE, PROCESS_RING_CAPACITY, name) for name in ring_names]
+    pollers = [RingPoller(port, ring, transport, journal_drain) for port, ring in zip(ports, rings)]
+    threads = [threading.Thread(target=poller.run, name=f'poller {poller.port}', daemon=True) for poller in pollers]
+    for thread in threads:
+        thread.start()
+    while not stop_event.wait(PROCESS_WATCH_INTERVAL):
+        if not parent_process().is_alive():
+            return  # главный процесс завершился аварийно, читать буферы некому
+        if not any(thread.is_alive() for thread in threads):
+            break  # все порты потеряны
+    for poller in pollers:
+        poller.is_cancelled = True
+    for thread in threads:
+        thread.join()
+    for ring in rings:
+        ring.close()
+
+
+class PollingProcess:
+    """Процесс опроса и кольцевые буферы его результатов на стороне главного процесса."""
+    def __init__(self, ports, transport=PYMODBUS_TRANSPORT, journal_drain=SEPARATE_DRAIN):
+        self.rings = {port: SharedRingBuffer(RECORD_SIZE, PROCESS_RING_CAPACITY) for port in ports}
+        context = get_context('spawn')  # fork копирует потоки и состояние Qt главного процесса
+        self.stop_event = context.Event()
+        self.process = context.Process(
+            target=run_polling_process, name='poller', daemon=True,
+            args=(list(self.rings), [ring.name for ring in self.rings.values()], self.stop_event,
+                  transport, journal_drain))
+
+    @property
+    def exitcode(self):
+        return self.process.exitcode
+
+    def start(self):
+        self.process.start()
+
+    def stop(self):
+        """Просит процесс опроса остановиться. Записи читаются до его завершения."""
+        self.stop_event.set()
+
+    def terminate(self):
+        self.process.terminate()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def read_records(self):
+        """Забирает записи из буферов всех портов. Возвращает список (порт, запись)."""
+        return [(port, record) for port, ring in self.rings.items() for record in ring.pop_all()]
+
+    def close(self):
+        self.stop()
+        self.process.join(PROCESS_STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        for ring in self.rings.values():
+            ring.close()
+
+
+class RemoteQualityStats:
+    """Статистика качества связи, полученная от процесса опроса, с интерфейсом LinkQualityStats."""
+    def __init__(self):
+        self.rows = {}  # (адрес КЛ, блок регистров) -> строка статистики
+        self.lock = threading.Lock()
+
+    def update(self, unit, block, values):
+        row = {'kl': unit, 'block': block, **dict(zip(OUTCOMES, values))}
+        retries, mean_ms, max_ms, *percentiles = values[len(OUTCOMES):]
+        row.update(retries=retries, mean_ms=mean_ms, max_ms=max_ms)
+        for percentile, value in zip(PERCENTILES, percentiles):
+            row[f'p{percentile}_ms'] = value
+        with self.lock:
+            self.rows[(unit, block)] = row
+
+    def get_rows(self):
+        with self.lock:
+            return [self.rows[key] for key in sorted(self.rows)]
+
+    def clear(self):
+        with self.lock:
+            self.rows = {}
+
+
+class ProcessPoller(BasePoller):
+    """Опрос портов в отдельном процессе. Результаты передаются теми же сигналами,
+    что и у Poller, из потока, вызвавшего run(). Счетчики обмена и статистика качества
+    связи считаются процессом опроса с начала сеанса."""
+    def __init__(self, ports, telemetry=None, transport=PYMODBUS_TRANSPORT, journal_drain=SEPARATE_DRAIN):
+        super().__init__(telemetry)
+        self.ports = ports
+        self.transport = transport
+        self.journal_drain = journal_drain
+        for port in ports:
+            self.get_telemetry(port).quality = RemoteQualityStats()
+
+    def dispatch(self, port, record):
+        """Передает сигналом запись из буфера порта."""
+        kind, address, count, timestamp = RECORD_HEADER.unpack_from(record)
+        offset = RECORD_HEADER.size
+        if kind == EVENTS_RECORD:
+            registers = list(struct.unpack_from(f'<{count}H', record, offset))
+            self.publish_events(port, address, registers, datetime.fromtimestamp(timestamp))
+        elif kind == STATUS_RECORD:
+            registers = struct.unpack_from(f'<{STATUS_REGISTERS}H', record, offset)
+            self.publish_status(port, address, registers, count, datetime.fromtimestamp(timestamp))
+        elif kind == KL_VERSION_RECORD:
+            self.update_kl_version.emit(port, address, count)
+        elif kind == DISCONNECTED_RECORD:
+            self.show_disconnected(port, address)
+        elif kind == TELEMETRY_RECORD:
+            self.link_telemetry.emit(port, TelemetrySnapshot(*TELEMETRY_FORMAT.unpack_from(record, offset)))
+        elif kind == POLL_RATES_RECORD:
+            rates = {}
+            for i in range(count):
+                kl, *rate = POLL_RATE_FORMAT.unpack_from(record, offset + i * POLL_RATE_FORMAT.size)
+                rates[kl] = tuple(rate)
+            self.update_poll_rates.emit(port, rates)
+        elif kind == QUALITY_RECORD:
+            self.get_telemetry(port).quality.update(
+                address, REGISTER_BLOCKS[count], QUALITY_FORMAT.unpack_from(record, offset))
+        elif kind == CONNECTION_ERROR_RECORD:
+            self.port_connection_error.emit(port)
+
+    def run(self):
+        """Запускает процесс опроса и передает его результаты, пока процесс не завершится."""
+        process = PollingProcess(self.ports, self.transport, self.journal_drain)
+        process.start()
+        stop_time = None
+        try:
+            while True:
+                is_alive = process.is_alive()  # записи, сделанные до завершения процесса, читаются в этом проходе
+                records = process.read_records()
+                for port, record in records:
+                    self.dispatch(port, record)
+                if not is_alive:
+                    break
+                if self.is_cancelled and stop_time is None:
+                    process.stop()
+                    stop_time = monotonic()
+                elif stop_time is not None and monotonic() - stop_time > PROCESS_STOP_TIMEOUT:
+                    logging.error('Процесс опроса не завершился после остановки, завершение принудительно')
+                    process.terminate()
+                if not records:
+                    sleep(PROCESS_RING_POLL_INTERVAL)
+        finally:
+            process.close()
+        if process.exitcode:
+            logging.error(f'Процесс опроса завершился с ошибкой, код {process.exitcode}')
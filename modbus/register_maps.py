@@ -0,0 +1,137 @@
+from collections import namedtuple
+
+# куда записывается значение поля
+TEST = 'test'  # поле модели Test
+REPORT = 'report'  # поле модели Report
+CURRENT_TEST = 'current_test'  # номер выполняемого теста
+
+# какая часть регистра содержит значение
+WORD = 'word'
+HIGH_BYTE = 'high'
+LOW_BYTE = 'low'
+
+RegisterField = namedtuple(
+    'RegisterField', ['name', 'offset', 'width', 'divisor', 'target', 'values'], defaults=(1, TEST, None))
+RegisterField.__doc__ = """Описание поля в блоке результатов теста.
+offset - смещение регистра от 20001, divisor - делитель значения,
+values - словарь для замены кода значением (например, тип устройства)."""
+
+device_type_dict = {
+    0: '',
+    1: 'ИПР',
+    2: 'ИПТ',
+    3: 'ИПТ-С',
+    4: 'ИПД',
+    5: 'ИПП',
+    6: 'ИПП-С',
+    7: 'УДП',
+    8: 'МКВ-2',
+    9: 'МКВ-4',
+    10: 'МКР-2',
+    11: 'МКР-4',
+    12: 'ИПР-В',
+    13: 'МКВ2Р2',
+    14: 'МКВ2А',
+    15: 'МКО-В',
+    16: 'МКО-С',
+    17: 'МКС'
+}
+
+TEST_RESULTS_MAP_V1 = (
+    RegisterField('success_all', 0, WORD, target=REPORT),
+    RegisterField('interrupted_all', 1, WORD, target=REPORT),
+    RegisterField('error_all', 2, WORD, target=REPORT),
+    RegisterField('exit_code_1', 3, LOW_BYTE),
+    RegisterField('exit_code_2', 3, HIGH_BYTE),
+    RegisterField('exit_code_3', 4, LOW_BYTE),
+    RegisterField('ready_time', 5, WORD),
+    RegisterField('device_type', 6, LOW_BYTE, values=device_type_dict),
+    RegisterField('device_version', 6, HIGH_BYTE),
+    RegisterField('sb_duration', 7, WORD),
+    RegisterField('electricity_sb', 8, WORD),
+    RegisterField('average_electricity', 9, WORD, 10),
+    RegisterField('temperature', 10, WORD),
+    RegisterField('Uv', 11, WORD, 100),
+    RegisterField('Us', 12, WORD, 100),
+    RegisterField('Un', 13, WORD, 100),
+    RegisterField('Cv', 14, WORD, 100),
+    RegisterField('Cs', 15, WORD, 100),
+    RegisterField('Cn', 16, WORD, 100),
+    RegisterField('charge_electricity_current', 17, WORD, 10),
+    RegisterField('discharge_rate_upper_ionistor', 18, WORD, 100),
+    RegisterField('discharge_rate_middle_ionistor', 19, WORD, 100),
+    RegisterField('discharge_rate_lower_ionistor', 20, WORD, 100),
+    RegisterField('success_ipr', 21, WORD, target=REPORT),
+    RegisterField('success_ipt', 22, WORD, target=REPORT),
+    RegisterField('success_ipt_s', 23, WORD, target=REPORT),
+    RegisterField('success_ipd', 24, WORD, target=REPORT),
+    RegisterField('success_ipp', 25, WORD, target=REPORT),
+    RegisterField('success_ipp_s', 26, WORD, target=REPORT),
+    RegisterField('success_udp', 27, WORD, target=REPORT),
+    RegisterField('success_mks', 28, WORD, target=REPORT),
+    RegisterField('error_ipr', 29, WORD, target=REPORT),
+    RegisterField('error_ipt', 30, WORD, target=REPORT),
+    RegisterField('error_ipt_s', 31, WORD, target=REPORT),
+    RegisterField('error_ipd', 32, WORD, target=REPORT),
+    RegisterField('error_ipp', 33, WORD, target=REPORT),
+    RegisterField('error_ipp_s', 34, WORD, target=REPORT),
+    RegisterField('error_udp', 35, WORD, target=REPORT),
+    RegisterField('error_mks', 36, WORD, target=REPORT),
+    RegisterField('current_test', 37, WORD, target=CURRENT_TEST),
+    RegisterField('reserve_1', 38, WORD),
+    RegisterField('reserve_2', 39, WORD),
+)
+
+DEFAULT_REGISTER_MAP = TEST_RESULTS_MAP_V1
+# версия КЛ (регистр 977) -> карта регистров; версии, которых нет в словаре, разбираются по DEFAULT_REGISTER_MAP
+REGISTER_MAPS = {}
+
+compiled_decoders = {}  # id карты регистров -> функция разбора
+
+
+def compile_register_map(register_map):
+    """Компилирует карту регистров в функцию разбора.
+    Функция принимает значения регистров 20001-20040 и возвращает словари
+    полей Test и Report и номер выполняемого теста."""
+    namespace = {}
+    fields = {TEST: [], REPORT: []}
+    current_test = 'None'
+    for i, field in enumerate(register_map):
+        value = f'registers[{field.offset}]'
+        if field.width == HIGH_BYTE:
+            value = f'({value} >> 8)'
+        elif field.width == LOW_BYTE:
+            value = f'({value} & 0xFF)'
+        if field.divisor != 1:
+            value = f'{value} / {field.divisor}'
+        if field.values is not None:
+            namespace[f'values_{i}'] = field.values
+            value = f'values_{i}[{value}]'
+        if field.target == CURRENT_TEST:
+            current_test = value
+        else:
+            fields[field.target].append(f'{field.name!r}: {value}')
+    source = (
+        'def decode(registers):\n'
+        f'    return {{{", ".join(fields[TEST])}}}, {{{", ".join(fields[REPORT])}}}, {current_test}\n'
+    )
+    exec(source, namespace)
+    return namespace['decode']
+
+
+def get_test_results_decoder(kl_version):
+    """Возвращает функцию разбора результатов теста для версии КЛ."""
+    register_map = REGISTER_MAPS.get(kl_version, DEFAULT_REGISTER_MAP)
+    decoder = compiled_decoders.get(id(register_map))
+    if decoder is None:
+        decoder = compiled_decoders[id(register_map)] = compile_register_map(register_map)
+    return decoder
+
+
+def format_exit_code_3(exit_code_1, exit_code_2, exit_code_3):
+    """Возвращает код 3 для отображения.
+    Если код 1.2 == 7.3 или 7.4 или 9.2 или 9.3, то к значению кода 3
+    нужно дописать нули, если его длина меньше 3 символов."""
+    if f'{exit_code_1}{exit_code_2}' in ('73', '74', '92', '93'):
+        return '0' * (3 - len(str(exit_code_3))) + str(exit_code_3)
+    return exit_code_3
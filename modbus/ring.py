@@ -0,0 +1,67 @@
+"""Кольцевой буфер записей фиксированного размера в разделяемой памяти.
+
+Буфер связывает ровно одного писателя и одного читателя в разных процессах,
+поэтому обходится без блокировок. Номер следующей записи для записи (head)
+меняет только писатель, номер следующей записи для чтения (tail) - только
+читатель. Номера растут без ограничения, место записи в буфере - номер по
+модулю емкости. Писатель сдвигает head после того, как запись заполнена,
+поэтому читатель видит только полностью записанные записи. head и tail
+выровнены по 8 байтам и меняются одной записью слова.
+"""
+from multiprocessing import shared_memory
+
+HEADER_SIZE = 16  # head и tail по 8 байт
+
+
+class SharedRingBuffer:
+    """Кольцевой буфер на capacity записей по record_size байт.
+    Без name создает новый блок разделяемой памяти, с name - подключается к созданному."""
+    def __init__(self, record_size, capacity, name=None):
+        self.record_size = record_size
+        self.capacity = capacity
+        size = HEADER_SIZE + record_size * capacity
+        self.is_owner = name is None
+        if self.is_owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            # процесс опроса запускается через spawn и делит с создателем трекер ресурсов,
+            # поэтому блок удаляется один раз - создателем в close()
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.indexes = self.memory.buf[:HEADER_SIZE].cast('Q')  # head, tail
+        self.records = self.memory.buf[HEADER_SIZE:size]
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def __len__(self):
+        """Количество записанных, но еще не прочитанных записей."""
+        return self.indexes[0] - self.indexes[1]
+
+    def push(self, record):
+        """Добавляет запись (не длиннее record_size). Возвращает False, если буфер заполнен."""
+        head = self.indexes[0]
+        if head - self.indexes[1] >= self.capacity:
+            return False
+        offset = head % self.capacity * self.record_size
+        self.records[offset:offset + len(record)] = record
+        self.indexes[0] = head + 1
+        return True
+
+    def pop_all(self):
+        """Забирает все записанные записи. Возвращает список bytes длиной record_size."""
+        head, tail = self.indexes[0], self.indexes[1]
+        records = []
+        for number in range(tail, head):
+            offset = number % self.capacity * self.record_size
+            records.append(bytes(self.records[offset:offset + self.record_size]))
+        self.indexes[1] = head
+        return records
+
+    def close(self):
+        """Отключается от разделяемой памяти, создатель буфера удаляет ее."""
+        self.indexes.release()
+        self.records.release()
+        self.memory.close()
+        if self.is_owner:
+            self.memory.unlink()
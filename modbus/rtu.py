@@ -0,0 +1,110 @@
+import struct
+
+from modbus.exceptions import (IllegalResponseException,
+                               InvalidResponseException)
+
+READ_HOLDING_REGISTERS = 0x03
+EXCEPTION_RESPONSE_LENGTH = 5  # адрес, функция, код исключения, CRC
+REQUEST_LENGTH = 8  # адрес, функция, регистр, количество, CRC
+MIN_SILENT_INTERVAL = 0.00175  # сек, пауза между кадрами для скоростей выше 19200 по спецификации Modbus
+
+
+def get_char_time(baudrate, bytesize=8, parity='N', stopbits=1):
+    """Возвращает время передачи одного символа: старт-бит, данные, бит четности и стоп-биты."""
+    return (1 + bytesize + (parity != 'N') + stopbits) / baudrate
+
+
+def get_silent_interval(baudrate, bytesize=8, parity='N', stopbits=1):
+    """Возвращает паузу, отделяющую кадры RTU друг от друга (3.5 символа)."""
+    if baudrate > 19200:
+        return MIN_SILENT_INTERVAL
+    return 3.5 * get_char_time(baudrate, bytesize, parity, stopbits)
+
+
+def _build_crc_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+        table.append(crc)
+    return table
+
+
+CRC_TABLE = _build_crc_table()
+
+
+def crc16(data):
+    """Возвращает контрольную сумму CRC-16/MODBUS."""
+    crc = 0xFFFF
+    for byte in data:
+        crc = (crc >> 8) ^ CRC_TABLE[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def add_crc(frame):
+    """Дописывает к кадру контрольную сумму (младший байт вперед)."""
+    return frame + struct.pack('<H', crc16(frame))
+
+
+def build_read_registers_request(unit, address, count):
+    """Формирует кадр запроса чтения holding-регистров."""
+    return add_crc(struct.pack('>BBHH', unit, READ_HOLDING_REGISTERS, address, count))
+
+
+def get_response_length(count):
+    """Возвращает длину кадра ответа на чтение count регистров."""
+    return 5 + 2 * count
+
+
+def get_expected_length(head, count):
+    """Возвращает ожидаемую длину ответа по первым двум байтам кадра."""
+    if head[1] & 0x80:
+        return EXCEPTION_RESPONSE_LENGTH
+    return get_response_length(count)
+
+
+def parse_read_registers_response(frame, unit, count):
+    """Проверяет кадр ответа и возвращает значения регистров."""
+    if len(frame) < EXCEPTION_RESPONSE_LENGTH or crc16(frame[:-2]) != struct.unpack('<H', frame[-2:])[0]:
+        raise InvalidResponseException(f'Неверная контрольная сумма ответа КЛ {unit}')
+    if frame[0] != unit:
+        raise InvalidResponseException(f'Ответ от адреса {frame[0]} вместо {unit}')
+    if frame[1] == READ_HOLDING_REGISTERS | 0x80:
+        raise IllegalResponseException(f'КЛ {unit} вернул исключение {frame[2]}', frame[2])
+    if frame[1] != READ_HOLDING_REGISTERS or frame[2] != 2 * count or len(frame) != get_response_length(count):
+        raise InvalidResponseException(f'Неверная длина ответа КЛ {unit}')
+    return list(struct.unpack(f'>{count}H', frame[3:-2]))
+
+
+def parse_read_registers_request(frame):
+    """Проверяет кадр запроса чтения регистров и возвращает (адрес КЛ, регистр, количество)."""
+    if len(frame) != 8 or crc16(frame[:-2]) != struct.unpack('<H', frame[-2:])[0]:
+        raise InvalidResponseException('Неверная контрольная сумма запроса')
+    unit, function, address, count = struct.unpack('>BBHH', frame[:-2])
+    if function != READ_HOLDING_REGISTERS:
+        raise IllegalResponseException(f'Неподдерживаемая функция {function}', 1)
+    return unit, address, count
+
+
+def build_read_registers_response(unit, registers):
+    """Формирует кадр ответа на чтение holding-регистров."""
+    count = len(registers)
+    return add_crc(struct.pack(f'>BBB{count}H', unit, READ_HOLDING_REGISTERS, 2 * count, *registers))
+
+
+def build_exception_response(unit, code):
+    """Формирует кадр ответа-исключения на чтение регистров."""
+    return add_crc(struct.pack('>BBB', unit, READ_HOLDING_REGISTERS | 0x80, code))
+
+
+class ReadRegistersResponse:
+    """Ответ на чтение регистров, совместимый с ответами pymodbus."""
+    def __init__(self, registers):
+        self.registers = registers
+
+    def isError(self):
+        return False
@@ -0,0 +1,88 @@
+from time import monotonic, sleep
+
+from serial import Serial, SerialException
+
+from modbus.constants import RTU_FRAME_GAP_MIN
+from modbus.exceptions import ModbusTransportException, NoResponseException
+from modbus.rtu import (ReadRegistersResponse, build_read_registers_request,
+                        get_expected_length, get_silent_interval, parse_read_registers_response)
+
+
+class RtuSerialClient:
+    """Синхронный клиент Modbus RTU с разбором кадров по длине и паузам на линии.
+
+    Клиент pymodbus ждет ответ до истечения таймаута, если не смог определить
+    конец кадра. Здесь конец ответа на чтение регистров известен заранее по его
+    длине, поэтому чтение заканчивается сразу после последнего байта. Пауза
+    длиннее 3.5 символов внутри ответа означает оборванный кадр. timeout - время
+    ожидания первого байта ответа.
+    """
+    def __init__(self, port, baudrate, bytesize, parity, stopbits, timeout):
+        self.port = port
+        self.serial_settings = dict(baudrate=baudrate, bytesize=bytesize, parity=parity, stopbits=stopbits)
+        self.timeout = timeout
+        self.silent_interval = get_silent_interval(baudrate, bytesize, parity, stopbits)
+        self.frame_gap = max(self.silent_interval, RTU_FRAME_GAP_MIN)
+        self.serial = None
+        self.last_frame_end = 0
+
+    def connect(self):
+        """Открывает порт. Возвращает True при успешном подключении."""
+        if self.is_socket_open():
+            return True
+        try:
+            self.serial = Serial(self.port, timeout=self.timeout, **self.serial_settings)
+        except SerialException:
+            self.serial = None
+            return False
+        return True
+
+    def close(self):
+        if self.serial is not None:
+            self.serial.close()
+        self.serial = None
+
+    def is_socket_open(self):
+        return self.serial is not None and self.serial.is_open
+
+    def read_frame(self, count):
+        """Читает кадр ответа на чтение count регистров."""
+        self.serial.timeout = self.timeout
+        head = self.serial.read(2)
+        if len(head) < 2:
+            raise NoResponseException(f'Нет ответа за {self.timeout} с')
+        frame = bytearray(head)
+        expected_length = get_expected_length(head, count)
+        self.serial.timeout = self.frame_gap
+        while len(frame) < expected_length:
+            # читаем все, что уже пришло, или ждем следующий байт не дольше паузы между кадрами
+            size = min(max(self.serial.in_waiting, 1), expected_length - len(frame))
+            chunk = self.serial.read(size)
+            if not chunk:
+                break  # кадр оборвался, CRC не сойдется
+            frame.extend(chunk)
+        return bytes(frame)
+
+    def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        """Читает count регистров начиная с address из КЛ с адресом unit."""
+        if not self.connect():
+            raise ConnectionError(f'Не удалось открыть порт {self.port}')
+        pause = self.last_frame_end + self.silent_interval - monotonic()
+        if pause > 0:
+            sleep(pause)
+        try:
+            self.serial.reset_input_buffer()  # опоздавшие ответы на прошлые запросы
+            self.serial.write(build_read_registers_request(unit, address, count))
+            self.serial.flush()
+            try:
+                frame = self.read_frame(count)
+            except NoResponseException:
+                raise NoResponseException(f'КЛ {unit} не ответил за {self.timeout} с')
+        except ModbusTransportException:
+            raise
+        except Exception as error:  # SerialException, а в Linux и termios.error при пропавшем порте
+            self.close()
+            raise ConnectionError(f'Ошибка порта {self.port}: {error}')
+        finally:
+            self.last_frame_end = monotonic()
+        return ReadRegistersResponse(parse_read_registers_response(frame, unit, count))
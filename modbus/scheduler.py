@@ -0,0 +1,96 @@
+from time import monotonic
+
+from modbus.constants import (POLL_INTERVAL_IDLE, POLL_INTERVAL_PAUSED,
+                              POLL_INTERVAL_RUNNING, POLL_MAX_INTERVAL)
+
+RATE_SMOOTHING = 0.2  # вес нового интервала в скользящем среднем фактической частоты
+
+
+class PollScheduler:
+    """Планировщик опроса КЛ по их состоянию.
+
+    КЛ, на котором идет тест или в журнале которого есть записи, опрашивается
+    чаще, простаивающий - реже. Очередь упорядочена по сроку следующего опроса,
+    а КЛ, ожидающие дольше max_interval, опрашиваются в первую очередь,
+    поэтому при перегрузке линии ни один КЛ не остается без опроса.
+    """
+    def __init__(self, running_interval=POLL_INTERVAL_RUNNING, paused_interval=POLL_INTERVAL_PAUSED,
+                 idle_interval=POLL_INTERVAL_IDLE, max_interval=POLL_MAX_INTERVAL):
+        self.running_interval = running_interval
+        self.paused_interval = paused_interval
+        self.idle_interval = idle_interval
+        self.max_interval = max_interval
+        self.intervals = {}  # адрес КЛ -> целевой интервал опроса
+        self.last_poll_time = {}  # адрес КЛ -> время последнего опроса
+        self.average_intervals = {}  # адрес КЛ -> сглаженный фактический интервал опроса
+
+    def add(self, address):
+        """Добавляет КЛ в очередь, первый опрос - немедленно."""
+        self.intervals[address] = self.running_interval
+        self.last_poll_time[address] = None
+        self.average_intervals[address] = None
+
+    def remove(self, address):
+        self.intervals.pop(address, None)
+        self.last_poll_time.pop(address, None)
+        self.average_intervals.pop(address, None)
+
+    def get_interval(self, status_code, has_journal_entries):
+        """Возвращает целевой интервал опроса для состояния КЛ."""
+        if status_code == 1 or has_journal_entries:
+            return self.running_interval
+        if status_code in (2, 3, 4, 5):
+            return self.paused_interval
+        return self.idle_interval
+
+    def mark_polled(self, address, status_code=None, has_journal_entries=False, now=None):
+        """Отмечает опрос КЛ. Если опрос не удался (status_code=None), интервал не меняется."""
+        if now is None:
+            now = monotonic()
+        if status_code is not None:
+            self.intervals[address] = self.get_interval(status_code, has_journal_entries)
+        last_poll_time = self.last_poll_time[address]
+        if last_poll_time is not None:
+            interval = now - last_poll_time
+            average = self.average_intervals[address]
+            if average is None:
+                self.average_intervals[address] = interval
+            else:
+                self.average_intervals[address] = average + RATE_SMOOTHING * (interval - average)
+        self.last_poll_time[address] = now
+
+    def get_deadline(self, address):
+        last_poll_time = self.last_poll_time[address]
+        if last_poll_time is None:
+            return float('-inf')
+        return last_poll_time + min(self.intervals[address], self.max_interval)
+
+    def get_due_addresses(self, now=None):
+        """Возвращает КЛ, которые пора опросить: сначала ожидающие дольше max_interval,
+        затем по сроку опроса."""
+        if now is None:
+            now = monotonic()
+        due_addresses = [address for address in self.intervals if self.get_deadline(address) <= now]
+        due_addresses.sort(key=lambda address: (
+            not self.is_starving(address, now), self.get_deadline(address)))
+        return due_addresses
+
+    def is_starving(self, address, now):
+        last_poll_time = self.last_poll_time[address]
+        return last_poll_time is None or now - last_poll_time >= self.max_interval
+
+    def get_next_poll_delay(self, now=None):
+        """Возвращает время в секундах до ближайшего опроса."""
+        if now is None:
+            now = monotonic()
+        if not self.intervals:
+            return self.max_interval
+        return max(min(self.get_deadline(address) for address in self.intervals) - now, 0)
+
+    def get_rates(self):
+        """Возвращает целевую и фактическую частоту опроса (Гц) каждого КЛ."""
+        rates = {}
+        for address, interval in self.intervals.items():
+            average = self.average_intervals[address]
+            rates[address] = (1 / interval, 1 / average if average else 0)
+        return rates
@@ -0,0 +1,487 @@
+"""Имитатор КЛ для проверки опроса без стенда.
+
+Линия RS-485 с несколькими КЛ моделируется классом SimulatedLine. К ней
+можно подключиться внутри процесса (SimulatedClient, порты с префиксом SIM)
+или через псевдотерминал (RtuSlaveServer), как к настоящему COM-порту.
+TcpSlaveServer изображает преобразователь RS-485 - Ethernet:
+
+    python -m modbus.simulator --kl 16 --event-rate 5 --test-rate 0.2
+    python -m modbus.simulator --lines 4 --gateway tcp
+"""
+import argparse
+import asyncio
+import os
+import random
+import socketserver
+import struct
+import threading
+from time import monotonic, sleep
+
+from modbus.constants import (JOURNAL_CAPACITY, JOURNAL_WINDOW_REGISTERS,
+                              KL_ADDRESSES, KL_IDENTIFIER, MODBUS_TCP_SCHEME,
+                              RTU_OVER_TCP_SCHEME, SIMULATOR_ERROR_RATIO,
+                              SIMULATOR_EVENT_RATE, SIMULATOR_LATENCY,
+                              SIMULATOR_TEST_RATE, SERIAL_SETTINGS)
+from modbus.exceptions import (IllegalResponseException,
+                               InvalidResponseException, NoResponseException)
+from modbus.rtu import (READ_HOLDING_REGISTERS, REQUEST_LENGTH,
+                        ReadRegistersResponse, add_crc,
+                        build_exception_response,
+                        build_read_registers_response, get_char_time,
+                        parse_read_registers_request,
+                        parse_read_registers_response)
+
+MAX_READ_COUNT = 125  # ограничение Modbus на количество регистров в одном запросе
+ILLEGAL_FUNCTION = 1
+ILLEGAL_DATA_ADDRESS = 2
+ILLEGAL_DATA_VALUE = 3
+TRANSMIT_CHUNK = 2  # байт, ответ на псевдотерминал передается частями с темпом линии
+
+# индексы счетчиков успешных тестов по кодам типов устройств, ошибочные - со сдвигом 8
+REPORT_INDEXES = {1: 0, 2: 1, 3: 2, 4: 3, 5: 4, 6: 5, 7: 6, 17: 7}
+
+simulated_lines = {}
+
+
+def load_event_codes(txt_file='messages/KL_Messages.txt'):
+    """Возвращает коды событий КЛ из файла сообщений."""
+    try:
+        with open(txt_file, encoding='utf-8') as file:
+            codes = [int(line.split()[0]) for line in file if line.split() and line.split()[0].isdigit()]
+    except OSError:
+        codes = []
+    return codes or list(range(1, 224))
+
+
+def load_error_codes(txt_file='messages/Stend_IP_error_codes.txt'):
+    """Возвращает коды ошибок стенда (код 1, код 2, код 3 или None, если код 3 произвольный)."""
+    codes = []
+    try:
+        with open(txt_file, encoding='utf-8') as file:
+            for line in file:
+                parts = line.strip().split('%')
+                if len(parts) >= 3 and parts[0].isdigit() and parts[1].isdigit():
+                    codes.append((int(parts[0]), int(parts[1]), int(parts[2]) if parts[2].isdigit() else None))
+    except OSError:
+        pass
+    return codes or [(1, 1, None)]
+
+
+class SimulatedKL:
+    """Модель регистров одного КЛ.
+
+    Журнал: регистр 0 - количество непрочитанных событий, регистры 1-124 -
+    пакет событий по 2 регистра. Чтение регистра 0 подтверждает пакет,
+    переданный при прошлом чтении журнала. Регистр 20000 - признак новых
+    результатов и код состояния, признак сбрасывается после чтения.
+    """
+    def __init__(self, address, version=1, event_rate=SIMULATOR_EVENT_RATE, test_rate=SIMULATOR_TEST_RATE,
+                 error_ratio=SIMULATOR_ERROR_RATIO, journal_capacity=JOURNAL_CAPACITY, rng=None):
+        self.address = address
+        self.version = version
+        self.event_rate = event_rate
+        self.test_rate = test_rate
+        self.error_ratio = error_ratio
+        self.journal_capacity = journal_capacity
+        self.rng = rng or random.Random(address)
+        self.event_codes = load_event_codes()
+        self.error_codes = load_error_codes()
+        self.journal = []
+        self.sent_count = 0  # событий передано в последнем пакете и ждут подтверждения
+        self.status_code = 1 if test_rate else 0
+        self.is_new_results = False
+        self.results = [0] * 40
+        self.results[37] = 1  # номер выполняемого теста
+        self.events_generated = 0
+        self.events_lost = 0
+        self.events_acknowledged = 0
+        self.tests_completed = 0
+        self.pending_events = 0.0
+        self.pending_tests = 0.0
+        self.last_update = monotonic()
+
+    def update(self, now=None):
+        """Добавляет события и результаты тестов, накопившиеся с прошлого вызова."""
+        if now is None:
+            now = monotonic()
+        elapsed = max(now - self.last_update, 0)
+        self.pending_events += self.event_rate * elapsed
+        self.pending_tests += self.test_rate * elapsed
+        if self.pending_events >= 1:
+            self.add_events(int(self.pending_events))
+            self.pending_events -= int(self.pending_events)
+        while self.pending_tests >= 1:
+            self.complete_test(self.rng.random() >= self.error_ratio)
+            self.pending_tests -= 1
+        self.last_update = now
+
+    def add_events(self, count):
+        """Записывает в журнал count случайных событий."""
+        for _ in range(count):
+            self.journal.append((
+                self.rng.randint(1, 8), self.rng.randint(1, 127),
+                self.rng.randint(0, 255), self.rng.choice(self.event_codes)))
+        self.events_generated += count
+        overflow = len(self.journal) - self.journal_capacity
+        if overflow > 0:
+            # пропадают только неотправленные записи, отправленный пакет ждет подтверждения
+            del self.journal[self.sent_count:self.sent_count + overflow]
+            self.events_lost += overflow
+
+    def complete_test(self, success=True):
+        """Завершает текущий тест и выставляет признак новых результатов."""
+        device_type = self.rng.choice(list(REPORT_INDEXES))
+        if success:
+            exit_codes = (0, 0, 0)
+            self.results[0] += 1
+            self.results[21 + REPORT_INDEXES[device_type]] += 1
+        else:
+            code_1, code_2, code_3 = self.rng.choice(self.error_codes)
+            exit_codes = (code_1, code_2, self.rng.randint(0, 99) if code_3 is None else code_3)
+            self.results[2] += 1
+            self.results[29 + REPORT_INDEXES[device_type]] += 1
+        self.results[3] = (exit_codes[1] << 8) | exit_codes[0]
+        self.results[4] = exit_codes[2]
+        self.results[5] = self.rng.randint(5, 60)
+        self.results[6] = (self.rng.randint(1, 5) << 8) | device_type
+        for offset in range(7, 21):
+            self.results[offset] = self.rng.randint(0, 1000)
+        self.results[37] = self.results[37] % 0xFFFF + 1
+        self.is_new_results = True
+        self.tests_completed += 1
+
+    def get_journal_registers(self):
+        """Возвращает регистры пакета событий, начиная с регистра 1."""
+        window = self.journal[:JOURNAL_WINDOW_REGISTERS // 2]
+        data = bytes(value for event in window for value in event)
+        return struct.unpack(f'>{len(data) // 2}H', data)
+
+    def read_registers(self, address, count):
+        """Возвращает значения count регистров начиная с address."""
+        end = address + count
+        if address == 0:
+            self.journal = self.journal[self.sent_count:]
+            self.events_acknowledged += self.sent_count
+            self.sent_count = 0
+        values = {0: len(self.journal), 976: KL_IDENTIFIER, 977: self.version,
+                  20000: (int(self.is_new_results) << 8) | self.status_code}
+        if address <= JOURNAL_WINDOW_REGISTERS and end > 1:
+            values.update(enumerate(self.get_journal_registers(), start=1))
+            if address <= 1:
+                sent_count = min(len(self.journal), (min(end, JOURNAL_WINDOW_REGISTERS + 1) - 1) // 2)
+                self.sent_count = max(self.sent_count, sent_count)
+        if address <= 20040 and end > 20001:
+            values.update(enumerate(self.results, start=20001))
+        if address <= 20000 < end:
+            self.is_new_results = False
+        return [values.get(register, 0) for register in range(address, end)]
+
+
+class SimulatedLine:
+    """Линия RS-485 с имитируемыми КЛ.
+
+    latency - время обработки запроса в КЛ, timeout_rate и crc_error_rate -
+    вероятность потерянного и поврежденного ответа. Если realtime=False,
+    запросы выполняются без задержек (для измерения накладных расходов опроса).
+    """
+    def __init__(self, devices, latency=SIMULATOR_LATENCY, timeout_rate=0, crc_error_rate=0,
+                 realtime=True, baudrate=SERIAL_SETTINGS['baudrate'], rng=None):
+        self.devices = {device.address: device for device in devices}
+        self.latency = latency
+        self.timeout_rate = timeout_rate
+        self.crc_error_rate = crc_error_rate
+        self.realtime = realtime
+        self.char_time = get_char_time(
+            baudrate, SERIAL_SETTINGS['bytesize'], SERIAL_SETTINGS['parity'], SERIAL_SETTINGS['stopbits'])
+        self.rng = rng or random.Random(0)
+        self.lock = threading.Lock()
+
+    def handle_request(self, unit, address, count):
+        """Возвращает кадр ответа на запрос чтения регистров или None, если ответа не будет."""
+        with self.lock:
+            device = self.devices.get(unit)
+            if device is None or self.rng.random() < self.timeout_rate:
+                return None
+            if not 1 <= count <= MAX_READ_COUNT:
+                return build_exception_response(unit, ILLEGAL_DATA_VALUE)
+            if address + count > 0x10000:
+                return build_exception_response(unit, ILLEGAL_DATA_ADDRESS)
+            device.update()
+            frame = build_read_registers_response(unit, device.read_registers(address, count))
+            if self.rng.random() < self.crc_error_rate:
+                frame = frame[:-1] + bytes([frame[-1] ^ 0xFF])
+            return frame
+
+    def get_transaction_time(self, count, frame):
+        """Возвращает время передачи запроса и ответа по линии."""
+        return self.latency + (8 + len(frame)) * self.char_time
+
+    def wait(self, duration):
+        if self.realtime and duration > 0:
+            sleep(duration)
+
+
+class SimulatedClient:
+    """Клиент имитируемой линии с интерфейсом синхронного клиента pymodbus."""
+    def __init__(self, line, timeout=SERIAL_SETTINGS['timeout']):
+        self.line = line
+        self.timeout = timeout
+        self.is_connected = False
+
+    def connect(self):
+        self.is_connected = True
+        return True
+
+    def close(self):
+        self.is_connected = False
+
+    def is_socket_open(self):
+        return self.is_connected
+
+    def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        """Читает count регистров начиная с address из КЛ с адресом unit."""
+        frame = self.line.handle_request(unit, address, count)
+        if frame is None:
+            self.line.wait(self.timeout)
+            raise NoResponseException(f'КЛ {unit} не ответил за {self.timeout} с')
+        self.line.wait(self.line.get_transaction_time(count, frame))
+        return ReadRegistersResponse(parse_read_registers_response(frame, unit, count))
+
+
+class AsyncSimulatedClient:
+    """Клиент имитируемой линии с интерфейсом AsyncRtuClient."""
+    def __init__(self, line, timeout=SERIAL_SETTINGS['timeout']):
+        self.line = line
+        self.timeout = timeout
+        self.is_connected = False
+        self.lock = asyncio.Lock()
+
+    async def connect(self):
+        self.is_connected = True
+        return True
+
+    def close(self):
+        self.is_connected = False
+
+    async def read_holding_registers(self, address, count, unit):
+        """Читает count регистров начиная с address из КЛ с адресом unit."""
+        async with self.lock:
+            frame = self.line.handle_request(unit, address, count)
+            duration = self.timeout if frame is None else self.line.get_transaction_time(count, frame)
+            if self.line.realtime:
+                await asyncio.sleep(duration)
+        if frame is None:
+            raise NoResponseException(f'КЛ {unit} не ответил за {self.timeout} с')
+        return ReadRegistersResponse(parse_read_registers_response(frame, unit, count))
+
+
+class RtuSlaveServer:
+    """Ведомое устройство Modbus RTU на псевдотерминале.
+    Путь к порту (например, /dev/pts/3) передается стенду вместо COM-порта."""
+    def __init__(self, line):
+        self.line = line
+        self.master_fd = None
+        self.slave_fd = None
+        self.port = None
+        self.thread = None
+        self.is_running = False
+
+    def start(self):
+        """Создает псевдотерминал и запускает обработку запросов. Возвращает путь к порту.
+        Псевдотерминалы есть только в Unix, поэтому модули терминала импортируются здесь."""
+        import tty
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+        self.is_running = True
+        self.thread = threading.Thread(target=self.serve, name=f'simulator {self.port}', daemon=True)
+        self.thread.start()
+        return self.port
+
+    def stop(self):
+        self.is_running = False
+        if self.thread is not None:
+            self.thread.join()
+        for fd in (self.master_fd, self.slave_fd):
+            if fd is not None:
+                os.close(fd)
+        self.master_fd = self.slave_fd = None
+
+    def serve(self):
+        import select
+        buffer = bytearray()
+        while self.is_running:
+            readable, _, _ = select.select([self.master_fd], [], [], 0.1)
+            if not readable:
+                buffer.clear()  # пауза на линии - начало нового кадра
+                continue
+            buffer.extend(os.read(self.master_fd, 256))
+            while len(buffer) >= 8:
+                try:
+                    unit, address, count = parse_read_registers_request(bytes(buffer[:8]))
+                except InvalidResponseException:
+                    del buffer[0]  # поиск начала кадра
+                    continue
+                except IllegalResponseException as exception:
+                    os.write(self.master_fd, build_exception_response(buffer[0], exception.code))
+                    del buffer[:8]
+                    continue
+                del buffer[:8]
+                frame = self.line.handle_request(unit, address, count)
+                if frame is not None:
+                    self.line.wait(self.line.latency + REQUEST_LENGTH * self.line.char_time)
+                    self.transmit(frame)
+
+    def transmit(self, frame):
+        """Передает кадр частями так, чтобы байты приходили не раньше, чем по линии с заданной скоростью."""
+        if not self.line.realtime:
+            os.write(self.master_fd, frame)
+            return
+        start = monotonic()
+        for offset in range(0, len(frame), TRANSMIT_CHUNK):
+            chunk = frame[offset:offset + TRANSMIT_CHUNK]
+            sleep(max(start + (offset + len(chunk)) * self.line.char_time - monotonic(), 0))
+            os.write(self.master_fd, chunk)
+
+
+class TcpSlaveServer:
+    """Преобразователь RS-485 - Ethernet с имитируемой линией за ним.
+    Принимает запросы Modbus TCP или кадры RTU поверх TCP (scheme), запросы
+    всех соединений выполняются на линии по очереди. Поврежденный ответ КЛ
+    шлюз Modbus TCP не передает, как и настоящий."""
+    def __init__(self, line, scheme=MODBUS_TCP_SCHEME, host='127.0.0.1', port=0):
+        self.line = line
+        self.scheme = scheme
+        self.address = (host, port)
+        self.lock = threading.Lock()  # линия RS-485 за шлюзом одна
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """Запускает обработку соединений. Возвращает адрес линии для стенда (tcp://хост:порт)."""
+        slave = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                if slave.scheme == MODBUS_TCP_SCHEME:
+                    slave.serve_mbap(self.rfile, self.wfile)
+                else:
+                    slave.serve_rtu(self.rfile, self.wfile)
+
+        self.server = socketserver.ThreadingTCPServer(self.address, Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name='simulator tcp', daemon=True)
+        self.thread.start()
+        host, port = self.server.server_address
+        return f'{self.scheme}://{host}:{port}'
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+        self.server = None
+
+    def transact(self, unit, address, count):
+        """Выполняет запрос на линии и возвращает кадр ответа RTU или None."""
+        with self.lock:
+            frame = self.line.handle_request(unit, address, count)
+            self.line.wait(self.line.get_transaction_time(count, frame or b''))
+        return frame
+
+    def serve_mbap(self, rfile, wfile):
+        while True:
+            header = rfile.read(7)
+            if len(header) < 7:
+                return
+            transaction_id, _, length, unit = struct.unpack('>HHHB', header)
+            pdu = rfile.read(length - 1)
+            if len(pdu) < length - 1:
+                return
+            if len(pdu) != 5 or pdu[0] != READ_HOLDING_REGISTERS:
+                frame = add_crc(struct.pack('>BBB', unit, pdu[0] | 0x80 if pdu else 0x80, ILLEGAL_FUNCTION))
+            else:
+                _, address, count = struct.unpack('>BHH', pdu)
+                frame = self.transact(unit, address, count)
+            if frame is None or frame != add_crc(frame[:-2]):
+                continue  # шлюз не передает поврежденные ответы
+            wfile.write(struct.pack('>HHH', transaction_id, 0, len(frame) - 2) + frame[:-2])
+
+    def serve_rtu(self, rfile, wfile):
+        while True:
+            request = rfile.read(REQUEST_LENGTH)
+            if len(request) < REQUEST_LENGTH:
+                return
+            try:
+                unit, address, count = parse_read_registers_request(request)
+            except InvalidResponseException:
+                continue
+            except IllegalResponseException as exception:
+                wfile.write(build_exception_response(request[0], exception.code))
+                continue
+            frame = self.transact(unit, address, count)
+            if frame is not None:
+                wfile.write(frame)
+
+
+def create_line(kl_count=len(KL_ADDRESSES), first_address=KL_ADDRESSES[0], version=1,
+                event_rate=SIMULATOR_EVENT_RATE, test_rate=SIMULATOR_TEST_RATE,
+                error_ratio=SIMULATOR_ERROR_RATIO, journal_capacity=JOURNAL_CAPACITY, **line_settings):
+    """Создает линию с kl_count КЛ с последовательными адресами."""
+    devices = [
+        SimulatedKL(address, version, event_rate, test_rate, error_ratio, journal_capacity)
+        for address in range(first_address, first_address + kl_count)
+    ]
+    return SimulatedLine(devices, **line_settings)
+
+
+def register_line(port, line):
+    """Связывает имя порта с имитируемой линией."""
+    simulated_lines[port] = line
+
+
+def get_simulated_line(port):
+    """Возвращает линию для имени порта, при первом обращении создает линию по умолчанию."""
+    if port not in simulated_lines:
+        simulated_lines[port] = create_line()
+    return simulated_lines[port]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Имитатор КЛ на псевдотерминалах или за шлюзами TCP')
+    parser.add_argument('--lines', type=int, default=1, help='количество линий (портов)')
+    parser.add_argument('--kl', type=int, default=len(KL_ADDRESSES), help='количество КЛ на линии')
+    parser.add_argument('--version', type=int, default=1, help='версия ПО КЛ (регистр 977)')
+    parser.add_argument('--event-rate', type=float, default=SIMULATOR_EVENT_RATE, help='событий в секунду на КЛ')
+    parser.add_argument('--test-rate', type=float, default=SIMULATOR_TEST_RATE, help='тестов в секунду на КЛ')
+    parser.add_argument('--error-ratio', type=float, default=SIMULATOR_ERROR_RATIO, help='доля тестов с ошибкой')
+    parser.add_argument('--latency', type=float, default=SIMULATOR_LATENCY, help='сек, время ответа КЛ')
+    parser.add_argument('--timeout-rate', type=float, default=0, help='вероятность потери ответа')
+    parser.add_argument('--crc-error-rate', type=float, default=0, help='вероятность поврежденного ответа')
+    parser.add_argument('--gateway', choices=(MODBUS_TCP_SCHEME, RTU_OVER_TCP_SCHEME),
+                        help='линии за шлюзами Modbus TCP или RTU поверх TCP вместо псевдотерминалов')
+    parser.add_argument('--tcp-port', type=int, default=0, help='порт TCP первой линии, по умолчанию любой свободный')
+    args = parser.parse_args()
+
+    servers = []
+    for i in range(args.lines):
+        line = create_line(
+            args.kl, version=args.version, event_rate=args.event_rate, test_rate=args.test_rate,
+            error_ratio=args.error_ratio, latency=args.latency, timeout_rate=args.timeout_rate,
+            crc_error_rate=args.crc_error_rate)
+        if args.gateway:
+            server = TcpSlaveServer(line, args.gateway, port=args.tcp_port + i if args.tcp_port else 0)
+        else:
+            server = RtuSlaveServer(line)
+        print(f'{server.start()}: КЛ {", ".join(map(str, line.devices))}')
+        servers.append(server)
+    try:
+        while True:
+            sleep(1)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
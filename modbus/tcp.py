@@ -0,0 +1,246 @@
+"""Опрос КЛ через преобразователи RS-485 - Ethernet.
+
+Линия за шлюзом задается вместо COM-порта адресом вида
+tcp://192.168.0.10:502 (Modbus TCP) или rtu+tcp://192.168.0.10:4001 (кадры
+Modbus RTU поверх TCP). Линии одного шлюза используют общее постоянное
+соединение из пула, запросы к разным шлюзам выполняются одновременно.
+"""
+import asyncio
+import struct
+import threading
+from itertools import count as count_from
+from urllib.parse import urlsplit
+
+from pymodbus.client.sync import ModbusTcpClient
+from pymodbus.framer.rtu_framer import ModbusRtuFramer
+from pymodbus.framer.socket_framer import ModbusSocketFramer
+
+from modbus.async_client import RtuClientProtocol
+from modbus.constants import (MODBUS_TCP_PORT, MODBUS_TCP_SCHEME,
+                              RTU_OVER_TCP_SCHEME, TCP_CONNECT_TIMEOUT)
+from modbus.exceptions import NoResponseException
+from modbus.rtu import (READ_HOLDING_REGISTERS, ReadRegistersResponse,
+                        add_crc, build_read_registers_request,
+                        parse_read_registers_response)
+
+MBAP_HEADER_LENGTH = 7  # номер транзакции, протокол, длина, адрес КЛ
+PYMODBUS_FRAMERS = {MODBUS_TCP_SCHEME: ModbusSocketFramer, RTU_OVER_TCP_SCHEME: ModbusRtuFramer}
+
+
+def parse_network_port(port):
+    """Возвращает (схема, хост, порт TCP) для адреса линии за шлюзом или None для COM-порта."""
+    url = urlsplit(port)
+    if url.scheme not in PYMODBUS_FRAMERS or not url.hostname:
+        return None
+    return url.scheme, url.hostname, url.port or MODBUS_TCP_PORT
+
+
+def is_network_port(port):
+    return parse_network_port(port) is not None
+
+
+def build_mbap_request(transaction_id, unit, address, count):
+    """Формирует запрос Modbus TCP на чтение holding-регистров."""
+    return struct.pack('>HHHBBHH', transaction_id, 0, 6, unit, READ_HOLDING_REGISTERS, address, count)
+
+
+def parse_mbap_response(frame, unit, count):
+    """Проверяет ответ Modbus TCP и возвращает значения регистров.
+    Без заголовка MBAP ответ совпадает с кадром RTU без контрольной суммы."""
+    return parse_read_registers_response(add_crc(frame[MBAP_HEADER_LENGTH - 1:]), unit, count)
+
+
+class PooledConnection:
+    """Соединение со шлюзом, общее для всех линий, обращающихся к нему."""
+    def __init__(self, client, lock):
+        self.client = client
+        self.lock = lock
+        self.users = 0
+
+
+class ConnectionPool:
+    """Постоянные соединения со шлюзами. Соединение закрывается, когда его освобождает последняя линия."""
+    def __init__(self, lock_factory):
+        self.lock_factory = lock_factory  # блокировка запросов через одно соединение
+        self.lock = threading.Lock()
+        self.connections = {}  # (схема, хост, порт) -> PooledConnection
+
+    def acquire(self, key, client_factory):
+        with self.lock:
+            connection = self.connections.get(key)
+            if connection is None:
+                connection = self.connections[key] = PooledConnection(client_factory(), self.lock_factory())
+            connection.users += 1
+            return connection
+
+    def release(self, key):
+        with self.lock:
+            connection = self.connections[key]
+            connection.users -= 1
+            if connection.users == 0:
+                del self.connections[key]
+                connection.client.close()
+
+
+tcp_pool = ConnectionPool(threading.Lock)
+async_tcp_pool = ConnectionPool(asyncio.Lock)
+
+
+class PooledClient:
+    """Синхронный клиент линии за шлюзом с интерфейсом клиента pymodbus.
+    Запросы линий одного шлюза выполняются по очереди, у каждой линии свой таймаут."""
+    def __init__(self, port, timeout, pool=tcp_pool):
+        self.port = port
+        self.key = parse_network_port(port)
+        self.timeout = timeout
+        self.pool = pool
+        self.connection = None
+
+    def create_client(self):
+        scheme, host, tcp_port = self.key
+        return ModbusTcpClient(host, tcp_port, framer=PYMODBUS_FRAMERS[scheme], timeout=TCP_CONNECT_TIMEOUT)
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = self.pool.acquire(self.key, self.create_client)
+        with self.connection.lock:
+            return self.connection.client.connect()
+
+    def close(self):
+        if self.connection is not None:
+            self.pool.release(self.key)
+            self.connection = None
+
+    def is_socket_open(self):
+        return self.connection is not None and self.connection.client.is_socket_open()
+
+    def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        """Читает count регистров начиная с address из КЛ с адресом unit."""
+        if not self.connect():
+            raise ConnectionError(f'Нет соединения со шлюзом {self.port}')
+        with self.connection.lock:
+            self.connection.client.timeout = self.timeout
+            return self.connection.client.read_holding_registers(address, count, unit=unit, **kwargs)
+
+
+class MbapClientProtocol(asyncio.Protocol):
+    """Протокол asyncio, выделяющий из потока TCP ответы Modbus TCP.
+    Ответы с чужим номером транзакции (опоздавшие после таймаута) отбрасываются."""
+    def __init__(self):
+        self.transport = None
+        self.buffer = bytearray()
+        self.waiter = None
+        self.transaction_id = None
+        self.is_connected = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.is_connected = True
+
+    def connection_lost(self, exc):
+        self.is_connected = False
+        if self.waiter and not self.waiter.done():
+            self.waiter.set_exception(ConnectionError(f'Соединение со шлюзом потеряно: {exc}'))
+
+    def data_received(self, data):
+        # буфер разбирается всегда, иначе после опоздавшего ответа нарушится разбивка потока на кадры
+        self.buffer.extend(data)
+        while len(self.buffer) >= MBAP_HEADER_LENGTH:
+            transaction_id, _, length = struct.unpack('>HHH', self.buffer[:6])
+            end = 6 + length
+            if len(self.buffer) < end:
+                return
+            frame = bytes(self.buffer[:end])
+            del self.buffer[:end]
+            if transaction_id == self.transaction_id and self.waiter and not self.waiter.done():
+                self.waiter.set_result(frame)
+
+    def expect_response(self, transaction_id):
+        self.transaction_id = transaction_id
+        self.waiter = asyncio.get_running_loop().create_future()
+        return self.waiter
+
+
+class AsyncTcpClient:
+    """Асинхронный клиент одного соединения со шлюзом с интерфейсом AsyncRtuClient."""
+    def __init__(self, scheme, host, port, timeout):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.protocol = None
+        self.transaction_ids = count_from(1)
+
+    @property
+    def is_connected(self):
+        return self.protocol is not None and self.protocol.is_connected
+
+    async def connect(self):
+        """Открывает соединение. Возвращает True при успешном подключении."""
+        if self.is_connected:
+            return True
+        protocol_factory = MbapClientProtocol if self.scheme == MODBUS_TCP_SCHEME else RtuClientProtocol
+        try:
+            _, self.protocol = await asyncio.wait_for(
+                asyncio.get_running_loop().create_connection(protocol_factory, self.host, self.port),
+                TCP_CONNECT_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            self.protocol = None
+            return False
+        return True
+
+    def close(self):
+        if self.is_connected:
+            self.protocol.transport.close()
+        self.protocol = None
+
+    async def read_holding_registers(self, address, count, unit):
+        if not self.is_connected:
+            raise ConnectionError(f'Нет соединения со шлюзом {self.host}:{self.port}')
+        if self.scheme == MODBUS_TCP_SCHEME:
+            transaction_id = next(self.transaction_ids) % 0x10000
+            waiter = self.protocol.expect_response(transaction_id)
+            self.protocol.transport.write(build_mbap_request(transaction_id, unit, address, count))
+        else:
+            waiter = self.protocol.expect_response(count)
+            self.protocol.transport.write(build_read_registers_request(unit, address, count))
+        try:
+            frame = await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            raise NoResponseException(f'КЛ {unit} не ответил за {self.timeout} с')
+        if self.scheme == MODBUS_TCP_SCHEME:
+            return ReadRegistersResponse(parse_mbap_response(frame, unit, count))
+        return ReadRegistersResponse(parse_read_registers_response(frame, unit, count))
+
+
+class AsyncPooledClient:
+    """Асинхронный клиент линии за шлюзом с интерфейсом AsyncRtuClient."""
+    def __init__(self, port, timeout, pool=async_tcp_pool):
+        self.port = port
+        self.key = parse_network_port(port)
+        self.timeout = timeout
+        self.pool = pool
+        self.connection = None
+
+    @property
+    def is_connected(self):
+        return self.connection is not None and self.connection.client.is_connected
+
+    async def connect(self):
+        if self.connection is None:
+            self.connection = self.pool.acquire(self.key, lambda: AsyncTcpClient(*self.key, self.timeout))
+        async with self.connection.lock:
+            return await self.connection.client.connect()
+
+    def close(self):
+        if self.connection is not None:
+            self.pool.release(self.key)
+            self.connection = None
+
+    async def read_holding_registers(self, address, count, unit):
+        """Читает count регистров начиная с address из КЛ с адресом unit."""
+        if not await self.connect():
+            raise ConnectionError(f'Нет соединения со шлюзом {self.port}')
+        async with self.connection.lock:
+            self.connection.client.timeout = self.timeout
+            return await self.connection.client.read_holding_registers(address, count, unit)
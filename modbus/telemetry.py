@@ -0,0 +1,146 @@
+import threading
+from collections import namedtuple
+from time import monotonic
+
+from modbus.constants import TELEMETRY_PUBLISH_INTERVAL
+from modbus.histogram import LatencyHistogram
+
+# виды ошибок обмена
+TIMEOUT = 'timeouts'  # КЛ не ответил
+CRC_ERROR = 'crc_errors'  # ответ поврежден (контрольная сумма, длина, адрес)
+ILLEGAL_RESPONSE = 'illegal_responses'  # ответ-исключение Modbus
+OTHER_ERROR = 'errors'  # ошибки порта и прочие
+ERROR_KINDS = (TIMEOUT, CRC_ERROR, ILLEGAL_RESPONSE, OTHER_ERROR)
+SUCCESS = 'successes'  # получен правильный ответ
+OUTCOMES = (SUCCESS,) + ERROR_KINDS
+
+PERCENTILES = (50, 95, 99)  # перцентили задержки в статистике качества связи
+
+# блоки регистров КЛ
+JOURNAL_COUNT_BLOCK = 'Журнал: количество'  # регистр 0
+JOURNAL_BLOCK = 'Журнал: события'  # регистры 1-124
+IDENTIFICATION_BLOCK = 'Идентификация'  # регистры 976-977
+TEST_RESULTS_BLOCK = 'Результаты тестов'  # регистры 20000-20040
+OTHER_BLOCK = 'Прочие регистры'
+REGISTER_BLOCKS = (JOURNAL_COUNT_BLOCK, JOURNAL_BLOCK, IDENTIFICATION_BLOCK, TEST_RESULTS_BLOCK, OTHER_BLOCK)
+
+
+def get_register_block(address):
+    """Возвращает блок регистров, к которому относится запрос с начального регистра address."""
+    if address == 0:
+        return JOURNAL_COUNT_BLOCK
+    if address <= 124:
+        return JOURNAL_BLOCK
+    if 976 <= address <= 977:
+        return IDENTIFICATION_BLOCK
+    if 20000 <= address <= 20040:
+        return TEST_RESULTS_BLOCK
+    return OTHER_BLOCK
+
+
+class BlockStats:
+    """Счетчики исходов запросов к одному блоку регистров КЛ
+    и гистограмма задержек успешных запросов."""
+    def __init__(self):
+        self.counts = dict.fromkeys(OUTCOMES, 0)
+        self.retries = 0
+        self.latency = LatencyHistogram()
+
+
+class LinkQualityStats:
+    """Качество связи с КЛ одной линии по адресам и блокам регистров.
+    Пишется потоком опроса, читается главным окном, поэтому доступ под блокировкой."""
+    def __init__(self):
+        self.blocks = {}  # (адрес КЛ, блок регистров) -> BlockStats
+        self.lock = threading.Lock()
+
+    def get_block_stats(self, unit, address):
+        key = (unit, get_register_block(address))
+        if key not in self.blocks:
+            self.blocks[key] = BlockStats()
+        return self.blocks[key]
+
+    def record(self, unit, address, outcome, latency=None):
+        """Учитывает исход запроса, для успешных запросов - и время ответа в секундах."""
+        with self.lock:
+            stats = self.get_block_stats(unit, address)
+            stats.counts[outcome] += 1
+            if outcome == SUCCESS and latency is not None:
+                stats.latency.record(latency)
+
+    def record_retry(self, unit, address):
+        with self.lock:
+            self.get_block_stats(unit, address).retries += 1
+
+    def get_rows(self):
+        """Возвращает статистику в виде списка словарей, отсортированного по адресу КЛ и блоку."""
+        rows = []
+        with self.lock:
+            for (unit, block), stats in sorted(self.blocks.items()):
+                row = {'kl': unit, 'block': block, **stats.counts, 'retries': stats.retries,
+                       'mean_ms': stats.latency.get_mean() * 1000, 'max_ms': stats.latency.max * 1000}
+                for percentile in PERCENTILES:
+                    row[f'p{percentile}_ms'] = stats.latency.get_percentile(percentile) * 1000
+                rows.append(row)
+        return rows
+
+    def clear(self):
+        with self.lock:
+            self.blocks = {}
+
+
+TelemetrySnapshot = namedtuple('TelemetrySnapshot', [
+    'requests', 'responses', 'bytes_sent', 'bytes_received',
+    'timeouts', 'crc_errors', 'illegal_responses', 'errors', 'tx_active', 'rx_active'])
+TelemetrySnapshot.__doc__ = """Сводка обмена по линии с начала опроса.
+tx_active, rx_active - были ли запросы и ответы с прошлой сводки."""
+
+
+class LinkTelemetry:
+    """Счетчики обмена по одной линии RS-485.
+    Обновляются в потоке опроса, в главное окно передается только сводка."""
+    def __init__(self, publish_interval=TELEMETRY_PUBLISH_INTERVAL):
+        self.publish_interval = publish_interval
+        self.requests = 0
+        self.responses = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.error_counts = dict.fromkeys(ERROR_KINDS, 0)
+        self.tx_since_snapshot = False
+        self.rx_since_snapshot = False
+        self.last_snapshot_time = 0
+        self.quality = LinkQualityStats()
+
+    def record_request(self, size):
+        self.requests += 1
+        self.bytes_sent += size
+        self.tx_since_snapshot = True
+
+    def record_response(self, size, unit, address, latency):
+        self.responses += 1
+        self.bytes_received += size
+        self.rx_since_snapshot = True
+        self.quality.record(unit, address, SUCCESS, latency)
+
+    def record_error(self, kind, unit, address):
+        self.error_counts[kind] += 1
+        self.quality.record(unit, address, kind)
+
+    @property
+    def errors_count(self):
+        return sum(self.error_counts.values())
+
+    def is_snapshot_due(self, now=None):
+        """Проверяет, прошел ли интервал передачи сводки."""
+        if now is None:
+            now = monotonic()
+        return now - self.last_snapshot_time >= self.publish_interval
+
+    def snapshot(self, now=None):
+        """Возвращает сводку и сбрасывает признаки активности."""
+        self.last_snapshot_time = monotonic() if now is None else now
+        snapshot = TelemetrySnapshot(
+            self.requests, self.responses, self.bytes_sent, self.bytes_received,
+            *(self.error_counts[kind] for kind in ERROR_KINDS), self.tx_since_snapshot, self.rx_since_snapshot)
+        self.tx_since_snapshot = self.rx_since_snapshot = False
+        return snapshot
@@ -0,0 +1,99 @@
+from modbus.constants import (CRC_ERROR_RETRIES, DEVICE_GONE_TIMEOUTS,
+                              RESPONSE_TIMEOUT_MAX, RESPONSE_TIMEOUT_MIN,
+                              SERIAL_SETTINGS, TIMEOUT_RETRIES)
+from modbus.rtu import REQUEST_LENGTH, get_char_time, get_response_length
+from modbus.telemetry import CRC_ERROR, TIMEOUT
+
+RTT_ALPHA = 1 / 8  # вес нового измерения в сглаженном времени ответа
+RTT_BETA = 1 / 4  # вес нового отклонения в сглаженном разбросе
+RTT_K = 4  # таймаут = сглаженное время + RTT_K разбросов
+
+
+class RttEstimator:
+    """Оценка времени ответа по Джекобсону-Карелсу (как RTO в TCP).
+    После таймаута значение удваивается, пока не придет ответ (алгоритм Карна)."""
+    def __init__(self, min_timeout=RESPONSE_TIMEOUT_MIN, max_timeout=RESPONSE_TIMEOUT_MAX):
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt = None
+        self.rttvar = None
+        self.timeout = max_timeout
+        self.consecutive_timeouts = 0
+
+    def update(self, sample):
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2
+        else:
+            self.rttvar = (1 - RTT_BETA) * self.rttvar + RTT_BETA * abs(self.srtt - sample)
+            self.srtt = (1 - RTT_ALPHA) * self.srtt + RTT_ALPHA * sample
+        self.timeout = min(max(self.srtt + RTT_K * self.rttvar, self.min_timeout), self.max_timeout)
+        self.consecutive_timeouts = 0
+
+    def back_off(self):
+        self.consecutive_timeouts += 1
+        self.timeout = min(self.timeout * 2, self.max_timeout)
+
+
+class AdaptiveTimeoutPolicy:
+    """Таймауты и повторы запросов к КЛ одной линии.
+
+    Оценивается время обработки запроса в КЛ (время ответа за вычетом передачи
+    кадров по линии), поэтому длинные пакеты журнала не приводят к таймаутам.
+    Для адресов без измерений используется оценка по всей линии.
+    Поврежденный ответ означает помехи - запрос повторяется, КЛ остается на связи.
+    Таймаут КЛ, который раньше отвечал, повторяется один раз, отключенным
+    КЛ считается после DEVICE_GONE_TIMEOUTS таймаутов подряд.
+    """
+    def __init__(self, min_timeout=RESPONSE_TIMEOUT_MIN, max_timeout=RESPONSE_TIMEOUT_MAX,
+                 char_time=None):
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        if char_time is None:
+            char_time = get_char_time(SERIAL_SETTINGS['baudrate'], SERIAL_SETTINGS['bytesize'],
+                                      SERIAL_SETTINGS['parity'], SERIAL_SETTINGS['stopbits'])
+        self.char_time = char_time
+        self.estimators = {}  # адрес КЛ -> RttEstimator
+        self.line_estimator = RttEstimator(min_timeout, max_timeout)
+
+    def get_transfer_time(self, count):
+        """Возвращает время передачи запроса и ответа на чтение count регистров."""
+        return (REQUEST_LENGTH + get_response_length(count)) * self.char_time
+
+    def get_timeout(self, unit, count):
+        estimator = self.estimators.get(unit, self.line_estimator)
+        return self.get_transfer_time(count) + estimator.timeout
+
+    def record_response(self, unit, count, elapsed):
+        sample = max(elapsed - self.get_transfer_time(count), 0)
+        if unit not in self.estimators:
+            self.estimators[unit] = RttEstimator(self.min_timeout, self.max_timeout)
+        self.estimators[unit].update(sample)
+        self.line_estimator.update(sample)
+
+    def record_error(self, unit, kind):
+        estimator = self.estimators.get(unit)
+        if estimator is None:
+            return
+        if kind == TIMEOUT:
+            estimator.back_off()
+        elif kind == CRC_ERROR:
+            estimator.consecutive_timeouts = 0  # ответ пришел, КЛ на связи
+
+    def get_retries(self, unit, kind):
+        """Возвращает количество повторов запроса после ошибки вида kind."""
+        if unit not in self.estimators:
+            return 0  # адрес еще не отвечал, например поиск новых КЛ
+        if kind == CRC_ERROR:
+            return CRC_ERROR_RETRIES
+        if kind == TIMEOUT:
+            return TIMEOUT_RETRIES
+        return 0
+
+    def is_device_gone(self, unit):
+        estimator = self.estimators.get(unit)
+        return estimator is None or estimator.consecutive_timeouts >= DEVICE_GONE_TIMEOUTS
+
+    def forget(self, unit):
+        """Сбрасывает измерения КЛ, который отключился."""
+        self.estimators.pop(unit, None)